@@ -1,11 +1,677 @@
 import os
+import sys
 import glob
-from src.preprocessing import split_images, split_images_and_generate_masks, split_train_val
-from src.train import train_unet
-from src.predict import predict_images, binary_to_georeferenced_shapefile
-from src.config import DIRS, IMG_SIZE, PART_SIZE, THRESHOLD_PREDICTION
+import time
+import argparse
+import importlib
+from src.config import DIRS, IMG_SIZE, PART_SIZE, EPOCHS, THRESHOLD_PREDICTION, TILE_OVERLAP, BLEND_MODE, PREDICTION_OUTPUT_MODE, PREDICTION_BATCH_SIZE, NUM_WORKERS, TILING_BACKEND, USE_TILE_STORE, USE_TILE_CACHE
+from src.config import MIN_VALID_FRACTION, TILE_AUGMENTATIONS
+from src.manifest import AUGMENTATIONS
+from src.benchmark import BENCHMARK_STAGES
+from src.scheduler import BACKENDS as SCHEDULER_BACKENDS
+from src.config import MERGE_TILE_POLYGONS, SIMPLIFY_TOLERANCE, MIN_POLYGON_AREA
+from src.config import JIT_COMPILE, MIXED_PRECISION, INTRA_OP_THREADS, INTER_OP_THREADS, ONEDNN_OPTS
+from src.config import PREDICTION_MODEL_FORMAT, EXPORT_FORMAT, EXPORT_INT8, BENCHMARK_TOLERANCE
+from src.config import MODEL_SELECTION_METRIC, MODEL_SELECTION_TAG, ENSEMBLE_SIZE
+from src.config import CATALOG_BLOCK_SIZE, CATALOG_WORKERS, CATALOG_BACKEND, CATALOG_VECTOR_FORMAT
+from src.config import SHOW_PROGRESS, PROGRESS_INTERVAL, WRITE_METRICS, METRICS_INTERVAL, PROFILE_STAGES
+from src.instrumentation import configure_instrumentation
+
+# Tempo da primeira importação de cada módulo carregado sob demanda (s)
+IMPORT_TIMES = {}
+
+def _import(*module_names):
+    """
+    Importa módulos sob demanda, registrando o tempo da primeira importação de cada um.
+
+    As dependências pesadas são listadas antes do módulo do projeto, para que o tempo
+    de cada biblioteca apareça separado no relatório de --profile-import.
+
+    Returns:
+        module: O último módulo importado.
+    """
+    module = None
+    for name in module_names:
+        if name in sys.modules:
+            module = sys.modules[name]
+            continue
+        start_time = time.perf_counter()
+        module = importlib.import_module(name)
+        IMPORT_TIMES[name] = time.perf_counter() - start_time
+    return module
+
+def _print_import_times():
+    """
+    Mostra o tempo de importação de cada módulo carregado pelo comando.
+    """
+    print("\nTempo de importação dos módulos:")
+    for name, elapsed in sorted(IMPORT_TIMES.items(), key=lambda item: -item[1]):
+        print(f"  {name:<20} {elapsed:7.3f} s")
+    print(f"  {'total':<20} {sum(IMPORT_TIMES.values()):7.3f} s")
+
+def _import_tensorflow():
+    """
+    Aplica as configurações de threads e oneDNN e importa o TensorFlow.
+    """
+    from src.performance import configure_runtime
+
+    # configure_runtime importa o TensorFlow depois de definir TF_ENABLE_ONEDNN_OPTS
+    imported = 'tensorflow' in sys.modules
+    start_time = time.perf_counter()
+    configure_runtime(INTRA_OP_THREADS, INTER_OP_THREADS, ONEDNN_OPTS)
+    if not imported:
+        IMPORT_TIMES['tensorflow'] = time.perf_counter() - start_time
+
+def _mixed_precision(value):
+    """
+    Converte a opção --mixed-precision ('on', 'off', 'auto' ou None = config.py) em booleano.
+    """
+    from src.performance import resolve_mixed_precision
+
+    if value is None:
+        value = MIXED_PRECISION
+    return resolve_mixed_precision({'on': True, 'off': False}.get(value, value))
+
+def _latest_model(extension):
+    """
+    Retorna o modelo mais recente da pasta de modelos com a extensão informada (ou None).
+
+    Os checkpoints intermediários do treino (*_best.keras) são ignorados.
+    """
+    model_files = [f for f in glob.glob(os.path.join(DIRS['models'], f"*{extension}"))
+                   if not f.endswith(f"_best{extension}")]
+    return max(model_files, key=os.path.getctime) if model_files else None
+
+def _select_models(models, extension, tag=None, metric=None, count=1):
+    """
+    Escolhe os modelos usados na predição ou exportação.
+
+    Modelos informados (caminhos ou nomes do registro) têm prioridade; senão, os melhores
+    do registro pela métrica de validação (ou os mais recentes, sem métrica). Modelos
+    treinados antes do registro são encontrados pelo arquivo mais recente da pasta.
+
+    Returns:
+        list: Entradas do registro (com o caminho em 'file' e, se registrados, 'img_size'
+        e 'threshold'); vazia se nenhum modelo for encontrado.
+    """
+    registry = _import('src.registry')
+    if models:
+        entries = []
+        for model in models:
+            entry = registry.get_model(DIRS['model_registry'], os.path.splitext(os.path.basename(model))[0])
+            if os.path.exists(model):
+                entries.append(dict(entry or {}, file=model))
+            elif entry:
+                entries.append(entry)
+            else:
+                print(f"Modelo não encontrado: {model}")
+                return []
+        return entries
+
+    entries = registry.select_models(DIRS['model_registry'], tag=tag, metric=metric, model_format=extension,
+                                     count=count)
+    if entries or tag:
+        return entries
+    latest = _latest_model(extension)
+    return [{'file': latest}] if latest else []
+
+def cmd_tile(args):
+    print("\n--- Etapa 1: Recortando imagens em tiles ---")
+    preprocessing = _import('numpy', 'cv2', 'rasterio', 'src.preprocessing')
+    preprocessing.split_images(
+        args.input,                    # Diretório com imagens originais
+        args.output,                   # Diretório de saída para imagens recortadas
+        args.tile_size,                # Tamanho dos tiles
+        workers=args.workers,          # Processos para recorte em paralelo
+        backend=args.backend,          # Leitura em janelas georreferenciadas
+        georef_path=args.georef,       # Georreferenciamento de cada tile
+        cache_path=DIRS['tile_cache'] if args.cache else None,  # Recorte incremental
+        min_valid_fraction=args.min_valid_fraction  # Descartar tiles sem dados
+    )
+    print("Recorte concluído!")
+
+def cmd_samples(args):
+    print("\n--- Etapa 2: Gerando amostras para treinamento (com máscaras binárias) ---")
+    preprocessing = _import('numpy', 'cv2', 'rasterio', 'src.preprocessing')
+    preprocessing.split_images_and_generate_masks(
+        args.input,                    # Diretório com imagens originais
+        args.output_images,            # Diretório de saída para imagens recortadas
+        args.output_masks,             # Diretório de saída para máscaras recortadas
+        args.tile_size,                # Tamanho dos tiles
+        binarize_threshold=args.threshold,  # Limiar para binarização
+        workers=args.workers,          # Processos para recorte em paralelo
+        backend=args.backend,          # Leitura em janelas georreferenciadas
+        georef_path=args.georef,       # Georreferenciamento de cada tile
+        store_path=args.store,         # Arquivo HDF5 único (opcional)
+        cache_path=DIRS['tile_cache'] if args.cache else None,  # Recorte incremental
+        manifest_path=DIRS['tile_manifest'],  # Tiles já divididos (remoção de tiles obsoletos)
+        min_valid_fraction=args.min_valid_fraction,  # Descartar tiles sem dados
+        augmentations=args.augment     # Amostras aumentadas (flips e rotações)
+    )
+    print("Amostras geradas com sucesso!")
+
+def cmd_split(args):
+    if not 0.0 < args.ratio < 1.0:
+        print("A proporção de treino deve estar entre 0.0 e 1.0.")
+        return 1
+
+    print(f"\n--- Dividindo dados: {args.ratio * 100:.0f}% treino e {(1 - args.ratio) * 100:.0f}% validação ---")
+    preprocessing = _import('numpy', 'cv2', 'src.preprocessing')
+    if args.store:
+        preprocessing.split_tile_store(args.store, train_val_split=args.ratio)
+    else:
+        preprocessing.split_train_val(
+            args.images,               # Diretório de imagens recortadas
+            args.masks,                # Diretório de máscaras recortadas
+            DIRS['train_images'],      # Diretório de treino (imagens)
+            DIRS['train_masks'],       # Diretório de treino (máscaras)
+            DIRS['val_images'],        # Diretório de validação (imagens)
+            DIRS['val_masks'],         # Diretório de validação (máscaras)
+            train_val_split=args.ratio,  # Proporção de treino/validação
+            manifest_path=DIRS['tile_manifest']  # Índice de tiles reutilizado no treinamento
+        )
+    print("Dados divididos entre treino e validação com sucesso!")
+
+def cmd_train(args):
+    if args.epochs <= 0:
+        print("O número de épocas deve ser positivo.")
+        return 1
+
+    if args.resume and not os.path.isdir(os.path.join(args.models_dir, 'backup', args.resume)):
+        print(f"Nenhum backup de treinamento encontrado para a execução {args.resume}.")
+        return 1
+
+    print("\n--- Etapa 3: Treinando o modelo U-Net ---")
+    _import('numpy', 'cv2')
+    _import_tensorflow()
+    train = _import('src.train')
+    train.train_unet(
+        DIRS['train_images'],          # Diretório com imagens de treino
+        DIRS['train_masks'],           # Diretório com máscaras de treino
+        DIRS['val_images'],            # Diretório com imagens de validação
+        DIRS['val_masks'],             # Diretório com máscaras de validação
+        args.img_size,                 # Tamanho das imagens para treinamento
+        args.epochs,                   # Número de épocas
+        manifest_path=DIRS['tile_manifest'],  # Índice de tiles gerado na divisão
+        store_path=args.store,         # Arquivo HDF5 de tiles (opcional)
+        models_dir=args.models_dir,    # Pasta de saída dos modelos
+        jit_compile=args.jit_compile,  # Compilação XLA
+        mixed_precision=_mixed_precision(args.mixed_precision),  # Precisão mista (bfloat16)
+        registry_path=DIRS['model_registry'],  # Registro do modelo com as métricas de validação
+        threshold=THRESHOLD_PREDICTION,  # Limiar recomendado gravado no registro
+        tags=args.tag,                 # Rótulos para a seleção do modelo
+        resume=args.resume             # Timestamp da execução interrompida a retomar
+    )
+
+def _prediction_models(args):
+    """
+    Resolve os modelos, o tamanho de entrada e o limiar de predict e catalog.
+
+    O tamanho de entrada e o limiar vêm do registro, salvo quando informados na linha de comando.
+
+    Returns:
+        tuple: (caminho do modelo ou lista do ensemble, img_size, limiar), ou None se nenhum
+        modelo for encontrado ou os tamanhos de entrada do ensemble forem diferentes.
+    """
+    entries = _select_models(args.model, PREDICTION_MODEL_FORMAT, tag=args.tag, metric=args.select_metric,
+                             count=args.ensemble)
+    if not entries:
+        print("Nenhum modelo encontrado na pasta 'models'. Treine o modelo antes de realizar predições.")
+        return None
+    model_paths = [entry['file'] for entry in entries]
+    print(f"Usando o modelo: {', '.join(model_paths)}")
+
+    img_sizes = {entry.get('img_size', IMG_SIZE) for entry in entries}
+    if args.img_size is None and len(img_sizes) > 1:
+        print("Os modelos do ensemble têm tamanhos de entrada diferentes; informe --img-size.")
+        return None
+    img_size = args.img_size or img_sizes.pop()
+    threshold = args.threshold
+    if threshold is None:
+        threshold = sum(entry.get('threshold', THRESHOLD_PREDICTION) for entry in entries) / len(entries)
+    return (model_paths[0] if len(model_paths) == 1 else model_paths), img_size, threshold
+
+def cmd_predict(args):
+    print("\n--- Etapa 4: Fazendo predições ---")
+    models = _prediction_models(args)
+    if models is None:
+        return 1
+    model_path, img_size, threshold = models
+    model_paths = [model_path] if isinstance(model_path, str) else model_path
+
+    predict = _import('numpy', 'cv2', 'rasterio', 'shapely', 'src.predict')
+    # Modelos ONNX/TFLite rodam sem o TensorFlow
+    if not all(predict.is_runtime_model(path) for path in model_paths):
+        _import_tensorflow()
+
+    # Realizar predições em janelas deslizantes sobre o ortomosaico
+    predict.predict_geotiff_tiled(
+        args.input,                    # Caminho da imagem base para predição
+        args.output,                   # GeoTIFF de saída com a máscara predita
+        model_path,                    # Caminho do modelo (ou lista, para o ensemble)
+        img_size,                      # Tamanho das janelas (entrada do modelo)
+        overlap=args.overlap,          # Sobreposição entre janelas
+        blend=args.blend,              # Pesos nas emendas entre janelas
+        threshold=threshold,           # Limiar para binarizar as predições
+        output_mode=args.output_mode,  # Probabilidade uint8, máscara binária ou float32
+        batch_size=args.batch_size,    # Janelas por chamada ao modelo
+        jit_compile=args.jit_compile,  # Compilação XLA
+        mixed_precision=_mixed_precision(args.mixed_precision),  # Precisão mista (bfloat16)
+        min_valid_fraction=args.min_valid_fraction  # Ignorar janelas sem dados
+    )
+    print("Predições concluídas!")
+
+def cmd_predict_images(args):
+    print("\n--- Fazendo predições nas imagens do diretório de entrada ---")
+    models = _prediction_models(args)
+    if models is None:
+        return 1
+    model_path, img_size, threshold = models
+    model_paths = [model_path] if isinstance(model_path, str) else model_path
+
+    predict = _import('numpy', 'cv2', 'rasterio', 'shapely', 'src.predict')
+    # Modelos ONNX/TFLite rodam sem o TensorFlow
+    if not all(predict.is_runtime_model(path) for path in model_paths):
+        _import_tensorflow()
+
+    predict.predict_images(
+        args.input,                    # Imagem ou diretório de imagens
+        args.output,                   # Diretório das predições
+        model_path,                    # Caminho do modelo (ou lista, para o ensemble)
+        img_size,                      # Tamanho das imagens (entrada do modelo)
+        threshold=threshold,           # Limiar registrado nas tags das predições
+        batch_size=args.batch_size,    # Imagens por chamada ao modelo
+        num_workers=args.workers,      # Threads de leitura e gravação
+        jit_compile=args.jit_compile,  # Compilação XLA
+        mixed_precision=_mixed_precision(args.mixed_precision),  # Precisão mista (bfloat16)
+        georef_path=args.georef if os.path.exists(args.georef) else None  # Georreferenciamento dos tiles
+    )
+    print("Predições concluídas!")
+
+def cmd_catalog(args):
+    print("\n--- Predição e vetorização de um catálogo de ortomosaicos ---")
+    models = _prediction_models(args)
+    if models is None:
+        return 1
+    model_path, img_size, threshold = models
+
+    # O TensorFlow é importado apenas nos processos que executam os jobs
+    scheduler = _import('numpy', 'rasterio', 'src.scheduler')
+    results = scheduler.run_catalog(
+        args.input,                    # Diretórios, rasters ou listas .txt
+        args.output,                   # Pasta das predições e arquivos vetoriais
+        args.state,                    # Estado dos jobs (SQLite), para retomar execuções
+        model_path,                    # Caminho do modelo (ou lista, para o ensemble)
+        img_size,                      # Tamanho das janelas (entrada do modelo)
+        overlap=args.overlap,          # Sobreposição entre janelas
+        blend=args.blend,              # Pesos nas emendas entre janelas
+        threshold=threshold,           # Limiar de binarização e vetorização
+        output_mode=args.output_mode,  # Probabilidade uint8, máscara binária ou float32
+        batch_size=args.batch_size,    # Janelas por chamada ao modelo
+        jit_compile=args.jit_compile,  # Compilação XLA
+        mixed_precision=_mixed_precision(args.mixed_precision),  # Precisão mista (bfloat16)
+        min_valid_fraction=args.min_valid_fraction,  # Ignorar janelas sem dados
+        block_size=args.block_size,    # Lado dos blocos de cada job
+        workers=args.workers,          # Jobs em paralelo
+        backend=args.backend,          # Execução dos jobs
+        vectorize=args.vectorize,      # Vetorizar cada raster concluído
+        vector_format=args.vector_format,  # Formato dos arquivos vetoriais
+        simplify_tolerance=SIMPLIFY_TOLERANCE,  # Simplificação das geometrias
+        min_area=MIN_POLYGON_AREA,     # Área mínima das feições
+        keep_parts=args.keep_parts,    # Manter as predições parciais
+        runtime=(INTRA_OP_THREADS, INTER_OP_THREADS, ONEDNN_OPTS)  # Threads do TensorFlow por processo
+    )
+    # Jobs com falha: código de saída 1, e uma nova execução retoma de onde parou
+    if results['failed']:
+        return 1
+
+def cmd_threshold(args):
+    print("\n--- Binarizando a probabilidade predita com um novo limiar ---")
+    predict = _import('numpy', 'cv2', 'rasterio', 'shapely', 'src.predict')
+    predict.threshold_prediction(
+        args.input,                    # COG de probabilidade gerado na predição
+        args.output,                   # COG binário de saída
+        threshold=args.threshold       # Novo limiar (0 a 1)
+    )
+
+def cmd_vectorize(args):
+    print("\n--- Etapa 5: Gerando shapefile georreferenciado ---")
+    predict = _import('numpy', 'cv2', 'rasterio', 'shapely', 'geopandas', 'src.predict')
+    predict.binary_to_georeferenced_shapefile(
+        args.input,                    # Predição (COG) ou diretório com máscaras preditas
+        args.geo_image,                # Imagem base, só para máscaras sem georreferenciamento
+        args.output,                   # Caminho do arquivo vetorial gerado
+        threshold=round(args.threshold * 255),  # Limiar de probabilidade na escala 0-255
+        georef_path=args.georef,       # Georreferenciamento de cada tile (se houver)
+        merge_tiles=args.merge_tiles,  # Unir polígonos cortados pelas bordas dos tiles
+        simplify_tolerance=args.simplify,  # Simplificação das geometrias
+        min_area=args.min_area         # Área mínima das feições
+    )
+    print("Shapefile gerado com sucesso!")
+
+def cmd_export(args):
+    print("\n--- Etapa 6: Exportando o modelo para inferência leve ---")
+    entries = _select_models([args.model] if args.model else None, '.keras', metric=MODEL_SELECTION_METRIC)
+    if not entries:
+        print("Nenhum modelo encontrado na pasta 'models'. Treine o modelo antes de exportar.")
+        return 1
+    model_path = entries[0]['file']
+
+    _import('numpy', 'cv2')
+    _import_tensorflow()
+    export = _import('src.export')
+
+    # Quantização int8 calibrada com os tiles de validação
+    suffix = '_int8' if args.int8 else ''
+    exported_path = f"{os.path.splitext(model_path)[0]}{suffix}.{args.format}"
+    export_fn = export.export_onnx if args.format == 'onnx' else export.export_tflite
+    export_fn(
+        model_path,                    # Modelo Keras treinado
+        exported_path,                 # Arquivo exportado
+        args.img_size,                 # Tamanho das imagens de entrada
+        calibration_dir=DIRS['val_images'] if args.int8 else None  # Tiles de calibração
+    )
+    if args.compare:
+        export.compare_exported_model(model_path, exported_path, DIRS['val_images'], DIRS['val_masks'],
+                                      args.img_size, THRESHOLD_PREDICTION)
+
+    # O modelo exportado herda as métricas e os rótulos do modelo de origem
+    registry = _import('src.registry')
+    registry.register_model(DIRS['model_registry'], exported_path, args.img_size,
+                            entries[0].get('threshold', THRESHOLD_PREDICTION), tags=entries[0].get('tags', ()),
+                            parent=entries[0].get('name'), int8=args.int8)
+
+def cmd_benchmark_modes(args):
+    print("\n--- Comparando float32, XLA e XLA + bfloat16 nos tiles de validação ---")
+    entries = _select_models([args.model] if args.model else None, '.keras', metric=MODEL_SELECTION_METRIC)
+    if not entries:
+        print("Nenhum modelo encontrado na pasta 'models'. Treine o modelo antes do benchmark.")
+        return 1
+
+    _import('numpy', 'cv2')
+    _import_tensorflow()
+    performance = _import('src.performance')
+    performance.benchmark_performance_modes(
+        entries[0]['file'],            # Modelo Keras treinado
+        DIRS['val_images'],            # Imagens de validação
+        DIRS['val_masks'],             # Máscaras de validação
+        args.img_size or entries[0].get('img_size', IMG_SIZE),  # Tamanho de entrada (padrão: registro)
+        batch_size=args.batch_size,    # Tamanho do lote
+        max_batches=args.max_batches,  # Lotes medidos
+        threshold=args.threshold or entries[0].get('threshold', THRESHOLD_PREDICTION)  # Limiar da IoU
+    )
+
+def cmd_models(args):
+    registry = _import('src.registry')
+    if args.add_tag or args.remove_tag:
+        if not args.name:
+            print("Informe o modelo com --name para alterar os rótulos.")
+            return 1
+        try:
+            if args.add_tag:
+                registry.tag_model(DIRS['model_registry'], args.name, args.add_tag)
+            if args.remove_tag:
+                registry.tag_model(DIRS['model_registry'], args.name, args.remove_tag, remove=True)
+        except ValueError as error:
+            print(error)
+            return 1
+    registry.print_registry(DIRS['model_registry'])
+
+def cmd_benchmark(args):
+    print("\n--- Benchmark do pipeline com dados sintéticos ---")
+    # Cada etapa importa suas dependências no próprio processo
+    benchmark = _import('src.benchmark')
+    results = benchmark.run_benchmark(
+        args.work_dir,                 # Dados sintéticos e saídas intermediárias
+        output_path=args.output,       # Resultados em JSON
+        baseline_path=args.baseline,   # Referência para a comparação
+        stages=args.stages,            # Etapas medidas
+        image_size=args.image_size,    # Lado do ortomosaico sintético
+        tile_size=args.tile_size,      # Tamanho dos tiles
+        img_size=args.img_size,        # Entrada do modelo
+        batch_size=args.batch_size,    # Lote de treino e predição
+        train_steps=args.train_steps,  # Passos de treino medidos
+        workers=args.workers,          # Processos/threads
+        jit_compile=args.jit_compile,  # Compilação XLA
+        repeats=args.repeats,          # Execuções por etapa (menor tempo)
+        tolerance=args.tolerance,      # Tolerância de regressão
+        save_baseline=args.save_baseline  # Gravar como novo baseline
+    )
+    # Código de saída 2 quando alguma etapa regride, para uso em integração contínua
+    if any(change['regression'] for change in results.get('comparison', {}).values()):
+        return 2
+
+def build_parser():
+    """
+    Monta o parser da linha de comando, com um subcomando por etapa do pipeline.
+    Os valores padrão vêm do config.py.
+
+    Returns:
+        argparse.ArgumentParser: Parser configurado.
+    """
+    parser = argparse.ArgumentParser(
+        description="Pipeline AgriSeg U-Net. Sem subcomando, abre o menu interativo.")
+    parser.add_argument('--profile-import', action='store_true',
+                        help="Mostra o tempo de importação de cada módulo carregado.")
+    parser.add_argument('--metrics', action=argparse.BooleanOptionalAction, default=WRITE_METRICS,
+                        help="Grava as métricas de cada etapa em JSON lines.")
+    parser.add_argument('--metrics-path', default=DIRS['metrics'], help="Arquivo JSON lines das métricas.")
+    parser.add_argument('--profile', action=argparse.BooleanOptionalAction, default=PROFILE_STAGES,
+                        help="Grava um perfil cProfile de cada etapa.")
+    parser.add_argument('--progress', action=argparse.BooleanOptionalAction, default=SHOW_PROGRESS,
+                        help="Barras de progresso com vazão e ETA.")
+    subparsers = parser.add_subparsers(dest='command', metavar='comando')
+
+    def add_tiling_options(subparser):
+        subparser.add_argument('--input', default=DIRS['raw'], help="Diretório com as imagens originais.")
+        subparser.add_argument('--tile-size', type=int, default=PART_SIZE, help="Tamanho dos tiles (pixels).")
+        subparser.add_argument('--workers', type=int, default=NUM_WORKERS, help="Processos para recorte em paralelo.")
+        subparser.add_argument('--backend', choices=['cv2', 'rasterio'], default=TILING_BACKEND, help="Leitura das imagens.")
+        subparser.add_argument('--georef', default=DIRS['tile_georef'], help="CSV com o georreferenciamento dos tiles.")
+        subparser.add_argument('--cache', action=argparse.BooleanOptionalAction, default=USE_TILE_CACHE,
+                               help="Recortar apenas imagens novas ou alteradas.")
+        subparser.add_argument('--min-valid-fraction', type=float, default=MIN_VALID_FRACTION,
+                               help="Fração mínima de pixels com dados para manter um tile.")
+
+    def add_performance_options(subparser):
+        subparser.add_argument('--img-size', type=int, default=IMG_SIZE, help="Tamanho da entrada do modelo.")
+        subparser.add_argument('--jit-compile', action=argparse.BooleanOptionalAction, default=JIT_COMPILE,
+                               help="Compilação XLA.")
+        subparser.add_argument('--mixed-precision', choices=['on', 'off', 'auto'], default=None,
+                               help="Precisão mista mixed_bfloat16 (padrão: config.py).")
+
+    tile = subparsers.add_parser('tile', help="Recortar imagens em tiles.")
+    add_tiling_options(tile)
+    tile.add_argument('--output', default=DIRS['processed_images'], help="Diretório de saída dos tiles.")
+    tile.set_defaults(func=cmd_tile)
+
+    samples = subparsers.add_parser('samples', help="Gerar tiles e máscaras binárias para treinamento.")
+    add_tiling_options(samples)
+    samples.add_argument('--output-images', default=DIRS['processed_images'], help="Diretório de saída dos tiles de imagem.")
+    samples.add_argument('--output-masks', default=DIRS['processed_masks'], help="Diretório de saída das máscaras.")
+    samples.add_argument('--threshold', type=int, default=128, help="Limiar para binarização das máscaras.")
+    samples.add_argument('--augment', nargs='*', choices=AUGMENTATIONS, default=list(TILE_AUGMENTATIONS),
+                         help="Transformações gravadas como amostras extras.")
+    samples.add_argument('--store', default=DIRS['tile_store'] if USE_TILE_STORE else None,
+                         help="Arquivo HDF5 único de tiles (opcional).")
+    samples.set_defaults(func=cmd_samples)
+
+    split = subparsers.add_parser('split', help="Dividir os tiles em treino e validação.")
+    split.add_argument('--ratio', type=float, default=0.8, help="Proporção para treino (0.0 a 1.0).")
+    split.add_argument('--images', default=DIRS['processed_images'], help="Diretório de tiles de imagem.")
+    split.add_argument('--masks', default=DIRS['processed_masks'], help="Diretório de tiles de máscara.")
+    split.add_argument('--store', default=DIRS['tile_store'] if USE_TILE_STORE else None,
+                       help="Arquivo HDF5 de tiles a dividir (opcional).")
+    split.set_defaults(func=cmd_split)
+
+    train = subparsers.add_parser('train', help="Treinar o modelo U-Net.")
+    add_performance_options(train)
+    train.add_argument('--epochs', type=int, default=EPOCHS, help="Número de épocas.")
+    train.add_argument('--store', default=DIRS['tile_store'] if USE_TILE_STORE else None,
+                       help="Arquivo HDF5 de tiles (opcional).")
+    train.add_argument('--models-dir', default=DIRS['models'], help="Pasta de saída dos modelos.")
+    train.add_argument('--tag', action='append', default=[], help="Rótulo do modelo no registro (repetível).")
+    train.add_argument('--resume', default=None, metavar='TIMESTAMP',
+                       help="Retomar a execução interrompida com este timestamp (ex.: 20250101_120000).")
+    train.set_defaults(func=cmd_train)
+
+    def add_model_options(subparser):
+        add_performance_options(subparser)
+        subparser.set_defaults(img_size=None)  # Padrão: o tamanho gravado no registro do modelo
+        subparser.add_argument('--model', nargs='+', default=None,
+                               help="Caminhos ou nomes de modelos do registro; mais de um forma um ensemble "
+                                    "(padrão: o melhor do registro).")
+        subparser.add_argument('--tag', default=MODEL_SELECTION_TAG, help="Rótulo exigido na escolha do modelo.")
+        subparser.add_argument('--select-metric', default=MODEL_SELECTION_METRIC,
+                               help="Métrica de validação usada para escolher o modelo (ex.: val_loss, val_accuracy).")
+        subparser.add_argument('--ensemble', type=int, default=ENSEMBLE_SIZE,
+                               help="Número de modelos do registro promediados em uma única passada por lote.")
+        subparser.add_argument('--threshold', type=float, default=None,
+                               help="Limiar de binarização (padrão: o do registro do modelo ou do config.py).")
+        subparser.add_argument('--batch-size', type=int, default=PREDICTION_BATCH_SIZE,
+                               help="Janelas ou imagens por chamada ao modelo.")
+
+    def add_prediction_options(subparser):
+        add_model_options(subparser)
+        subparser.add_argument('--overlap', type=int, default=TILE_OVERLAP, help="Sobreposição entre janelas (pixels).")
+        subparser.add_argument('--blend', choices=['gaussian', 'cosine', 'mean'], default=BLEND_MODE,
+                               help="Pesos nas emendas.")
+        subparser.add_argument('--output-mode', choices=['probability', 'binary', 'float32'],
+                               default=PREDICTION_OUTPUT_MODE,
+                               help="Probabilidade uint8 (0-255), máscara binária ou probabilidade float32.")
+        subparser.add_argument('--min-valid-fraction', type=float, default=MIN_VALID_FRACTION,
+                               help="Fração mínima de pixels com dados para predizer uma janela.")
+
+    predict = subparsers.add_parser('predict', help="Predizer a máscara de um ortomosaico GeoTIFF.")
+    add_prediction_options(predict)
+    predict.add_argument('--input', default=DIRS['geo_image'], help="GeoTIFF de entrada.")
+    predict.add_argument('--output', default=DIRS['pred_geotiff'], help="Cloud-Optimized GeoTIFF de saída.")
+    predict.set_defaults(func=cmd_predict)
+
+    predict_images = subparsers.add_parser('predict-images', help="Predizer as imagens de um diretório.")
+    add_model_options(predict_images)
+    predict_images.add_argument('--input', default=DIRS['pred_input'], help="Imagem ou diretório de imagens.")
+    predict_images.add_argument('--output', default=DIRS['pred_output'], help="Diretório das predições.")
+    predict_images.add_argument('--workers', type=int, default=NUM_WORKERS, help="Threads de leitura e gravação.")
+    predict_images.add_argument('--georef', default=DIRS['tile_georef'],
+                                help="CSV com o georreferenciamento dos tiles (entradas sem georreferenciamento).")
+    predict_images.set_defaults(func=cmd_predict_images)
+
+    catalog = subparsers.add_parser('catalog', help="Predizer e vetorizar um catálogo de ortomosaicos em jobs retomáveis.")
+    add_prediction_options(catalog)
+    catalog.add_argument('--input', nargs='+', default=[DIRS['catalog_input']],
+                         help="Diretórios, rasters ou listas .txt com um raster por linha.")
+    catalog.add_argument('--output', default=DIRS['catalog_output'], help="Pasta das predições e arquivos vetoriais.")
+    catalog.add_argument('--state', default=DIRS['catalog_state'], help="Arquivo SQLite com o estado dos jobs.")
+    catalog.add_argument('--block-size', type=int, default=CATALOG_BLOCK_SIZE, help="Lado dos blocos de cada job (pixels).")
+    catalog.add_argument('--workers', type=int, default=CATALOG_WORKERS, help="Jobs executados em paralelo.")
+    catalog.add_argument('--backend', choices=sorted(SCHEDULER_BACKENDS), default=CATALOG_BACKEND,
+                         help="Execução dos jobs.")
+    catalog.add_argument('--vectorize', action=argparse.BooleanOptionalAction, default=True,
+                         help="Vetorizar cada raster concluído.")
+    catalog.add_argument('--vector-format', choices=['.shp', '.gpkg', '.fgb', '.parquet'], default=CATALOG_VECTOR_FORMAT,
+                         help="Formato dos arquivos vetoriais.")
+    catalog.add_argument('--keep-parts', action='store_true', help="Manter as predições parciais após a união.")
+    catalog.set_defaults(func=cmd_catalog)
+
+    threshold = subparsers.add_parser('threshold', help="Binarizar a probabilidade predita com outro limiar.")
+    threshold.add_argument('--input', default=DIRS['pred_geotiff'], help="COG de probabilidade.")
+    threshold.add_argument('--output', default=DIRS['pred_binary'], help="COG binário de saída.")
+    threshold.add_argument('--threshold', type=float, default=THRESHOLD_PREDICTION, help="Limiar de probabilidade (0 a 1).")
+    threshold.set_defaults(func=cmd_threshold)
+
+    vectorize = subparsers.add_parser('vectorize', help="Converter as máscaras preditas em polígonos.")
+    vectorize.add_argument('--input', default=DIRS['pred_geotiff'],
+                           help="Predição (COG) ou diretório com as máscaras preditas.")
+    vectorize.add_argument('--geo-image', default=None,
+                           help="Imagem base georreferenciada, para máscaras sem georreferenciamento próprio.")
+    vectorize.add_argument('--threshold', type=float, default=THRESHOLD_PREDICTION, help="Limiar de probabilidade (0 a 1).")
+    vectorize.add_argument('--output', default=DIRS['shapefile_output'],
+                           help="Arquivo de saída (.shp, .gpkg, .fgb ou .parquet).")
+    vectorize.add_argument('--georef', default=DIRS['tile_georef'], help="CSV com o georreferenciamento dos tiles.")
+    vectorize.add_argument('--merge-tiles', action=argparse.BooleanOptionalAction, default=MERGE_TILE_POLYGONS,
+                           help="Unir polígonos cortados pelas bordas dos tiles.")
+    vectorize.add_argument('--simplify', type=float, default=SIMPLIFY_TOLERANCE, help="Tolerância de simplificação.")
+    vectorize.add_argument('--min-area', type=float, default=MIN_POLYGON_AREA, help="Área mínima das feições.")
+    vectorize.set_defaults(func=cmd_vectorize)
+
+    export = subparsers.add_parser('export', help="Exportar o modelo para ONNX ou TFLite.")
+    export.add_argument('--model', default=None, help="Modelo .keras ou nome no registro (padrão: o melhor do registro).")
+    export.add_argument('--img-size', type=int, default=IMG_SIZE, help="Tamanho da entrada do modelo.")
+    export.add_argument('--format', choices=['onnx', 'tflite'], default=EXPORT_FORMAT, help="Formato de exportação.")
+    export.add_argument('--int8', action=argparse.BooleanOptionalAction, default=EXPORT_INT8,
+                        help="Quantização int8 calibrada com os tiles de validação.")
+    export.add_argument('--compare', action=argparse.BooleanOptionalAction, default=True,
+                        help="Comparar o modelo exportado com o original.")
+    export.set_defaults(func=cmd_export)
+
+    models = subparsers.add_parser('models', help="Listar e rotular os modelos registrados.")
+    models.add_argument('--name', default=None, help="Modelo cujos rótulos serão alterados.")
+    models.add_argument('--add-tag', nargs='+', default=None, help="Rótulos a adicionar.")
+    models.add_argument('--remove-tag', nargs='+', default=None, help="Rótulos a remover.")
+    models.set_defaults(func=cmd_models)
+
+    benchmark_modes = subparsers.add_parser('benchmark-modes',
+                                            help="Comparar float32, XLA e XLA + bfloat16 nos tiles de validação.")
+    benchmark_modes.add_argument('--model', default=None,
+                                 help="Modelo .keras ou nome no registro (padrão: o melhor do registro).")
+    benchmark_modes.add_argument('--img-size', type=int, default=None,
+                                 help="Tamanho da entrada do modelo (padrão: o do registro).")
+    benchmark_modes.add_argument('--batch-size', type=int, default=PREDICTION_BATCH_SIZE, help="Tamanho do lote.")
+    benchmark_modes.add_argument('--max-batches', type=int, default=20, help="Número máximo de lotes medidos.")
+    benchmark_modes.add_argument('--threshold', type=float, default=None,
+                                 help="Limiar de probabilidade da IoU (padrão: o do registro).")
+    benchmark_modes.set_defaults(func=cmd_benchmark_modes)
+
+    benchmark = subparsers.add_parser('benchmark', help="Medir o desempenho de cada etapa com dados sintéticos.")
+    benchmark.add_argument('--work-dir', default=DIRS['benchmark'], help="Diretório dos dados sintéticos.")
+    benchmark.add_argument('--output', default=DIRS['benchmark_results'], help="JSON com os resultados.")
+    benchmark.add_argument('--baseline', default=DIRS['benchmark_baseline'], help="JSON de referência.")
+    benchmark.add_argument('--save-baseline', action='store_true', help="Gravar os resultados como novo baseline.")
+    benchmark.add_argument('--stages', nargs='+', choices=BENCHMARK_STAGES, default=None,
+                           help="Etapas medidas (padrão: todas).")
+    benchmark.add_argument('--image-size', type=int, default=2048, help="Lado do ortomosaico sintético (pixels).")
+    benchmark.add_argument('--tile-size', type=int, default=PART_SIZE, help="Tamanho dos tiles (pixels).")
+    benchmark.add_argument('--img-size', type=int, default=IMG_SIZE, help="Tamanho da entrada do modelo.")
+    benchmark.add_argument('--batch-size', type=int, default=PREDICTION_BATCH_SIZE, help="Tamanho do lote.")
+    benchmark.add_argument('--train-steps', type=int, default=10, help="Passos de treino medidos.")
+    benchmark.add_argument('--workers', type=int, default=NUM_WORKERS, help="Processos/threads de recorte e predição.")
+    benchmark.add_argument('--jit-compile', action=argparse.BooleanOptionalAction, default=JIT_COMPILE,
+                           help="Compilação XLA.")
+    benchmark.add_argument('--repeats', type=int, default=1, help="Execuções por etapa (mantém o menor tempo).")
+    benchmark.add_argument('--tolerance', type=float, default=BENCHMARK_TOLERANCE,
+                           help="Variação relativa tolerada antes de sinalizar regressão.")
+    benchmark.set_defaults(func=cmd_benchmark)
+
+    return parser
+
+def run_command(parser, argv):
+    """
+    Executa um subcomando a partir da lista de argumentos.
+
+    Returns:
+        int: Código de saída (0 = sucesso).
+    """
+    args = parser.parse_args(argv)
+    configure_instrumentation(metrics_path=args.metrics_path if args.metrics else None, metrics_interval=METRICS_INTERVAL,
+                              profile_dir=DIRS['profiles'] if args.profile else None,
+                              progress=args.progress, progress_interval=PROGRESS_INTERVAL)
+    try:
+        return args.func(args) or 0
+    finally:
+        if args.profile_import:
+            _print_import_times()
+
+def interactive_menu(parser, prefix=()):
+    """
+    Menu interativo, que monta os argumentos de cada subcomando a partir das respostas.
+
+    Args:
+        parser (argparse.ArgumentParser): Parser da linha de comando.
+        prefix (list): Opções globais repassadas a cada subcomando (ex.: --profile-import).
+    """
+    prefix = list(prefix)
 
-def main():
     print("\nBem-vindo ao pipeline de processamento!")
     print("Escolha uma das opções abaixo:")
     print("1 - Recortar imagens em tiles")
@@ -13,31 +679,19 @@ def main():
     print("3 - Iniciar treinamento do modelo")
     print("4 - Realizar predição")
     print("5 - Gerar shapefile")
+    print("6 - Exportar modelo para inferência leve (ONNX/TFLite)")
+    print("7 - Realizar predição nas imagens da pasta de entrada (predict/input)")
     print("0 - Sair")
 
     while True:
         try:
             choice = int(input("\nDigite a opção desejada: "))
-            
+
             if choice == 1:
-                print("\n--- Etapa 1: Recortando imagens em tiles ---")
-                split_images(
-                    DIRS['raw'],               # Diretório com imagens originais
-                    DIRS['processed_images'],  # Diretório de saída para imagens recortadas
-                    PART_SIZE                  # Tamanho dos tiles
-                )
-                print("Recorte concluído!")
+                run_command(parser, prefix + ['tile'])
 
             elif choice == 2:
-                print("\n--- Etapa 2: Gerando amostras para treinamento (com máscaras binárias) ---")
-                split_images_and_generate_masks(
-                    DIRS['raw'],               # Diretório com imagens originais
-                    DIRS['processed_images'],  # Diretório de saída para imagens recortadas
-                    DIRS['processed_masks'],   # Diretório de saída para máscaras recortadas
-                    PART_SIZE,                 # Tamanho dos tiles
-                    binarize_threshold=128     # Limiar para binarização
-                )
-                print("Amostras geradas com sucesso!")
+                run_command(parser, prefix + ['samples'])
 
                 while True:
                     try:
@@ -49,21 +703,9 @@ def main():
                     except ValueError:
                         print("Por favor, insira um número válido.")
 
-                print(f"\n--- Dividindo dados: {train_val_split * 100:.0f}% treino e {(1 - train_val_split) * 100:.0f}% validação ---")
-                split_train_val(
-                    DIRS['processed_images'],  # Diretório de imagens recortadas
-                    DIRS['processed_masks'],   # Diretório de máscaras recortadas
-                    DIRS['train_images'],      # Diretório de treino (imagens)
-                    DIRS['train_masks'],       # Diretório de treino (máscaras)
-                    DIRS['val_images'],        # Diretório de validação (imagens)
-                    DIRS['val_masks'],         # Diretório de validação (máscaras)
-                    train_val_split=train_val_split  # Proporção de treino/validação
-                )
-                print("Dados divididos entre treino e validação com sucesso!")
+                run_command(parser, prefix + ['split', '--ratio', str(train_val_split)])
 
             elif choice == 3:
-                print("\n--- Etapa 3: Treinando o modelo U-Net ---")
-
                 # Solicitar o número de épocas ao usuário
                 while True:
                     try:
@@ -75,48 +717,19 @@ def main():
                     except ValueError:
                         print("Por favor, insira um número válido.")
 
-                # Iniciar o treinamento
-                train_unet(
-                    DIRS['train_images'],      # Diretório com imagens de treino
-                    DIRS['train_masks'],       # Diretório com máscaras de treino
-                    DIRS['val_images'],        # Diretório com imagens de validação
-                    DIRS['val_masks'],         # Diretório com máscaras de validação
-                    IMG_SIZE,                  # Tamanho das imagens para treinamento
-                    epochs                     # Número de épocas definido pelo usuário
-                )
+                run_command(parser, prefix + ['train', '--epochs', str(epochs)])
 
             elif choice == 4:
-                print("\n--- Etapa 4: Fazendo predições ---")
-                
-                # Procurar o modelo mais recente na pasta models
-                models_dir = os.path.join("D:/Projetos/bemagro/gihub", "models")
-                model_files = glob.glob(os.path.join(models_dir, "*.keras"))
-                if not model_files:
-                    print("Nenhum modelo encontrado na pasta 'models'. Treine o modelo antes de realizar predições.")
-                    continue
-                
-                # Selecionar o modelo mais recente
-                latest_model = max(model_files, key=os.path.getctime)
-                print(f"Usando o modelo mais recente: {latest_model}")
-
-                # Realizar predições
-                predict_images(
-                    DIRS['geo_image'],         # Caminho da imagem base para predição
-                    DIRS['pred_output'],       # Diretório de saída para máscaras preditas
-                    latest_model,              # Caminho para o modelo mais recente
-                    IMG_SIZE,                  # Tamanho das imagens para predição
-                    THRESHOLD_PREDICTION       # Limiar para binarizar as predições
-                )
-                print("Predições concluídas!")
+                run_command(parser, prefix + ['predict'])
 
             elif choice == 5:
-                print("\n--- Etapa 5: Gerando shapefile georreferenciado ---")
-                binary_to_georeferenced_shapefile(
-                    DIRS['pred_output'],       # Diretório com máscaras preditas
-                    DIRS['geo_image'],         # Imagem base georreferenciada
-                    DIRS['shapefile_output']   # Caminho para o shapefile gerado
-                )
-                print("Shapefile gerado com sucesso!")
+                run_command(parser, prefix + ['vectorize'])
+
+            elif choice == 6:
+                run_command(parser, prefix + ['export'])
+
+            elif choice == 7:
+                run_command(parser, prefix + ['predict-images'])
 
             elif choice == 0:
                 print("Saindo do programa. Até mais!")
@@ -128,5 +741,14 @@ def main():
         except ValueError:
             print("Por favor, digite um número válido.")
 
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        # As opções globais valem para todos os comandos do menu
+        interactive_menu(parser, argv if argv is not None else sys.argv[1:])
+        return 0
+    return run_command(parser, argv)
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
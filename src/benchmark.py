@@ -0,0 +1,324 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# Etapas do benchmark, na ordem em que dependem umas das outras
+BENCHMARK_STAGES = ('tiling', 'load_dataset', 'train_step', 'predict_images', 'predict_tiled', 'vectorize')
+
+class _PeakMemory:
+    """
+    Mede o pico de memória residente (RSS) do processo durante um bloco with,
+    amostrando com psutil em uma thread. Sem psutil, usa o pico do processo
+    informado por resource (apenas Unix).
+    """
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+
+    def _sample(self):
+        import psutil
+
+        process = psutil.Process()
+        while not self._stop.is_set():
+            self.peak = max(self.peak, process.memory_info().rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._stop = threading.Event()
+        self._thread = None
+        try:
+            import psutil  # noqa: F401
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        except ImportError:
+            pass
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        else:
+            try:
+                import resource
+                # ru_maxrss em kB no Linux e em bytes no macOS
+                scale = 1 if sys.platform == 'darwin' else 1024
+                self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+            except ImportError:
+                self.peak = 0
+        return False
+
+def make_synthetic_orthomosaic(path, height=2048, width=2048, seed=0, n_fields=None, pixel_size=0.1, crs='EPSG:31983'):
+    """
+    Gera um ortomosaico GeoTIFF sintético: solo escuro com ruído e manchas claras de
+    vegetação (elipses) que a binarização por limiar transforma em máscaras e polígonos.
+
+    Args:
+        path (str): Caminho do GeoTIFF de saída.
+        height (int): Altura em pixels.
+        width (int): Largura em pixels.
+        seed (int): Semente do gerador aleatório (dados reprodutíveis).
+        n_fields (int): Número de manchas de vegetação (padrão: proporcional à área).
+        pixel_size (float): Tamanho do pixel em unidades do CRS.
+        crs (str): Sistema de referência.
+
+    Returns:
+        str: Caminho do GeoTIFF gerado.
+    """
+    import cv2
+    import numpy as np
+    import rasterio
+    from rasterio.transform import from_origin
+
+    rng = np.random.default_rng(seed)
+    image = rng.integers(30, 90, size=(height, width, 3), dtype=np.uint8)
+    n_fields = n_fields or max(1, height * width // 40000)
+    for _ in range(n_fields):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        axes = (int(rng.integers(8, 80)), int(rng.integers(8, 80)))
+        color = (int(rng.integers(40, 90)), int(rng.integers(170, 240)), int(rng.integers(60, 120)))  # BGR
+        cv2.ellipse(image, center, axes, float(rng.uniform(0, 180)), 0, 360, color, -1)
+
+    output_dir = os.path.dirname(path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    profile = {
+        'driver': 'GTiff', 'height': height, 'width': width, 'count': 3, 'dtype': 'uint8',
+        'crs': crs, 'transform': from_origin(500000.0, 7500000.0, pixel_size, pixel_size),
+        'tiled': True, 'blockxsize': 256, 'blockysize': 256,
+    }
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(np.transpose(image[:, :, ::-1], (2, 0, 1)))  # BGR -> bandas RGB
+    return path
+
+def _paths(work_dir):
+    """
+    Caminhos dos arquivos intermediários compartilhados entre as etapas.
+    """
+    return {
+        'raw': os.path.join(work_dir, 'raw'),
+        'ortho': os.path.join(work_dir, 'raw', 'ortho.tif'),
+        'images': os.path.join(work_dir, 'tiles', 'image'),
+        'masks': os.path.join(work_dir, 'tiles', 'mask'),
+        'georef': os.path.join(work_dir, 'tiles', 'tile_georef.csv'),
+        'model': os.path.join(work_dir, 'model.keras'),
+        'predictions': os.path.join(work_dir, 'predictions'),
+        'pred_geotiff': os.path.join(work_dir, 'predicted.tif'),
+        'vector': os.path.join(work_dir, 'vector.gpkg'),
+    }
+
+def _stage_tiling(paths, params):
+    from src.preprocessing import split_images_and_generate_masks
+
+    for directory in (paths['images'], paths['masks']):
+        shutil.rmtree(directory, ignore_errors=True)
+    start_time = time.perf_counter()
+    summary = split_images_and_generate_masks(paths['raw'], paths['images'], paths['masks'], params['tile_size'],
+                                              workers=params['workers'], backend='rasterio',
+                                              georef_path=paths['georef'])
+    return summary['tiles'], 'tiles', time.perf_counter() - start_time
+
+def _stage_load_dataset(paths, params):
+    from src.utils import load_dataset
+
+    # Mede uma época completa do pipeline tf.data usado no treino (leitura, decodificação e lotes)
+    start_time = time.perf_counter()
+    dataset, _ = load_dataset(paths['images'], paths['masks'], params['img_size'], params['batch_size'])
+    tiles = sum(int(images.shape[0]) for images, _ in dataset)
+    return tiles, 'tiles', time.perf_counter() - start_time
+
+def _stage_train_step(paths, params):
+    import numpy as np
+    import tensorflow as tf
+    from src.train import unet_model
+
+    img_size, batch_size = params['img_size'], params['batch_size']
+    model = unet_model((img_size, img_size, 3))
+    model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'], jit_compile=params['jit_compile'])
+
+    rng = np.random.default_rng(0)
+    images = rng.random((batch_size, img_size, img_size, 3), dtype=np.float32)
+    masks = (rng.random((batch_size, img_size, img_size, 1)) > 0.5).astype(np.float32)
+    batch = (tf.constant(images), tf.constant(masks))
+    for _ in range(2):  # Aquecimento (traçado e compilação)
+        model.train_on_batch(*batch)
+
+    start_time = time.perf_counter()
+    for _ in range(params['train_steps']):
+        model.train_on_batch(*batch)
+    elapsed = time.perf_counter() - start_time
+
+    model.save(paths['model'])  # Reaproveitado nas etapas de predição
+    return params['train_steps'] * batch_size, 'samples', elapsed
+
+def _stage_predict_images(paths, params):
+    from src.predict import predict_images
+
+    shutil.rmtree(paths['predictions'], ignore_errors=True)
+    start_time = time.perf_counter()
+    processed = predict_images(paths['images'], paths['predictions'], paths['model'], params['img_size'],
+                               batch_size=params['batch_size'], num_workers=params['workers'],
+                               jit_compile=params['jit_compile'])
+    return processed, 'tiles', time.perf_counter() - start_time
+
+def _stage_predict_tiled(paths, params):
+    from src.predict import predict_geotiff_tiled
+
+    start_time = time.perf_counter()
+    stats = predict_geotiff_tiled(paths['ortho'], paths['pred_geotiff'], paths['model'], params['img_size'],
+                                  overlap=params['img_size'] // 4, batch_size=params['batch_size'],
+                                  jit_compile=params['jit_compile'])
+    return stats['windows'], 'windows', time.perf_counter() - start_time
+
+def _stage_vectorize(paths, params):
+    from src.predict import binary_to_georeferenced_shapefile
+
+    # As máscaras do recorte têm formas realistas, ao contrário das predições de um modelo não treinado
+    start_time = time.perf_counter()
+    stats = binary_to_georeferenced_shapefile(paths['masks'], paths['ortho'], paths['vector'],
+                                              georef_path=paths['georef'])
+    return stats['features'], 'features', time.perf_counter() - start_time
+
+_STAGE_FUNCTIONS = {
+    'tiling': _stage_tiling,
+    'load_dataset': _stage_load_dataset,
+    'train_step': _stage_train_step,
+    'predict_images': _stage_predict_images,
+    'predict_tiled': _stage_predict_tiled,
+    'vectorize': _stage_vectorize,
+}
+
+def _run_stage(name, work_dir, params):
+    """
+    Executa uma etapa medindo tempo e pico de memória. Roda em um processo próprio para
+    que o pico de RSS (incluindo as importações) não seja afetado pelas etapas anteriores.
+    Com repetições, mantém o menor tempo, menos sensível a ruído do sistema.
+    """
+    from src.instrumentation import configure_instrumentation
+
+    configure_instrumentation(progress=False)
+    with _PeakMemory() as memory:
+        runs = [_STAGE_FUNCTIONS[name](_paths(work_dir), params) for _ in range(max(1, params['repeats']))]
+    items, unit, elapsed = min(runs, key=lambda run: run[2])
+    return {
+        'items': int(items),
+        'unit': unit,
+        'wall_s': round(elapsed, 4),
+        'throughput': round(items / elapsed, 3) if elapsed > 0 else 0.0,
+        'peak_rss_mb': round(memory.peak / 2 ** 20, 1),
+    }
+
+def compare_with_baseline(results, baseline, tolerance=0.15):
+    """
+    Compara os resultados com um baseline e sinaliza regressões.
+
+    Uma etapa regride se a vazão cair ou o pico de memória subir mais que a tolerância.
+
+    Args:
+        results (dict): Resultados de run_benchmark.
+        baseline (dict): Resultados de referência no mesmo formato.
+        tolerance (float): Variação relativa tolerada (0.15 = 15%).
+
+    Returns:
+        dict: Etapa -> {'throughput_change', 'rss_change', 'regression'} (variações relativas).
+    """
+    comparison = {}
+    for name, stage in results['stages'].items():
+        reference = baseline.get('stages', {}).get(name)
+        if not reference:
+            continue
+        throughput_change = (stage['throughput'] / reference['throughput'] - 1) if reference['throughput'] else 0.0
+        rss_change = (stage['peak_rss_mb'] / reference['peak_rss_mb'] - 1) if reference['peak_rss_mb'] else 0.0
+        comparison[name] = {
+            'throughput_change': round(throughput_change, 4),
+            'rss_change': round(rss_change, 4),
+            'regression': throughput_change < -tolerance or rss_change > tolerance,
+        }
+    if baseline.get('params') != results['params']:
+        print("Aviso: o baseline foi gerado com parâmetros diferentes; a comparação pode não ser válida.")
+    return comparison
+
+def run_benchmark(work_dir, output_path=None, baseline_path=None, stages=None, image_size=2048, tile_size=256,
+                  img_size=256, batch_size=16, train_steps=10, workers=4, jit_compile=False, repeats=1,
+                  tolerance=0.15, save_baseline=False, seed=0):
+    """
+    Executa o benchmark do pipeline sobre um ortomosaico sintético.
+
+    Cada etapa (recorte, uma época de load_dataset, passo de treino, predict_images, predição em janelas e
+    vetorização) roda em um processo separado, na ordem de BENCHMARK_STAGES, e registra
+    tempo, vazão e pico de memória. Os resultados são gravados em JSON e comparados
+    com o baseline, se houver.
+
+    Args:
+        work_dir (str): Diretório de trabalho para os dados sintéticos e saídas intermediárias.
+        output_path (str): Arquivo JSON com os resultados (opcional).
+        baseline_path (str): Arquivo JSON de referência para a comparação (opcional).
+        stages (list): Etapas a executar (padrão: todas). As etapas dependem das saídas das anteriores.
+        image_size (int): Lado do ortomosaico sintético, em pixels.
+        tile_size (int): Tamanho dos tiles do recorte.
+        img_size (int): Tamanho da entrada do modelo.
+        batch_size (int): Tamanho do lote de treino e predição.
+        train_steps (int): Passos de treino medidos.
+        workers (int): Processos/threads de recorte e predição.
+        jit_compile (bool): Compilar treino e inferência com XLA.
+        repeats (int): Execuções de cada etapa; o resultado é o de menor tempo.
+        tolerance (float): Variação relativa tolerada antes de sinalizar uma regressão.
+        save_baseline (bool): Gravar os resultados como novo baseline em baseline_path.
+        seed (int): Semente dos dados sintéticos.
+
+    Returns:
+        dict: Resultados com parâmetros, ambiente, etapas e, se houver baseline, a comparação.
+    """
+    stages = list(stages or BENCHMARK_STAGES)
+    unknown = set(stages) - set(BENCHMARK_STAGES)
+    if unknown:
+        raise ValueError(f"Etapa de benchmark desconhecida: {', '.join(sorted(unknown))}")
+
+    params = {
+        'image_size': image_size, 'tile_size': tile_size, 'img_size': img_size, 'batch_size': batch_size,
+        'train_steps': train_steps, 'workers': workers, 'jit_compile': jit_compile, 'repeats': repeats, 'seed': seed,
+    }
+    paths = _paths(work_dir)
+    if not os.path.exists(paths['ortho']) or 'tiling' in stages:
+        make_synthetic_orthomosaic(paths['ortho'], image_size, image_size, seed=seed)
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'params': params,
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        'stages': {},
+    }
+    context = multiprocessing.get_context('spawn')
+    for name in (stage for stage in BENCHMARK_STAGES if stage in stages):
+        print(f"\n--- Benchmark: {name} ---")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            stage = executor.submit(_run_stage, name, work_dir, params).result()
+        results['stages'][name] = stage
+        print(f"{name}: {stage['items']} {stage['unit']} em {stage['wall_s']:.2f} s "
+              f"({stage['throughput']:.1f} {stage['unit']}/s), pico de RSS {stage['peak_rss_mb']:.0f} MB")
+
+    if baseline_path and os.path.exists(baseline_path) and not save_baseline:
+        with open(baseline_path, encoding='utf-8') as f:
+            results['comparison'] = compare_with_baseline(results, json.load(f), tolerance)
+        print("\nComparação com o baseline:")
+        for name, change in results['comparison'].items():
+            flag = "REGRESSÃO" if change['regression'] else "ok"
+            print(f"  {name:>15}: vazão {change['throughput_change']:+.1%}, memória {change['rss_change']:+.1%} [{flag}]")
+
+    for path in filter(None, (output_path, baseline_path if save_baseline else None)):
+        output_dir = os.path.dirname(path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Resultados salvos em: {path}")
+    return results
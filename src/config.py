@@ -6,6 +6,52 @@ PART_SIZE = 256  # Tamanho dos tiles
 THRESHOLD_PREDICTION = 0.3  # Limiar para binarização na predição
 BATCH_SIZE = 16  # Tamanho do lote para treinamento
 EPOCHS = 100  # Número de épocas para treinamento
+PREDICTION_BATCH_SIZE = 16  # Tamanho do lote para predição
+PREDICTION_MODEL_FORMAT = '.keras'  # Modelo usado na predição: '.keras', '.onnx' ou '.tflite' (exportados)
+EXPORT_FORMAT = 'onnx'  # Formato da exportação do modelo: 'onnx' ou 'tflite'
+EXPORT_INT8 = True  # Quantização int8 calibrada com os tiles de validação
+MODEL_SELECTION_METRIC = 'val_loss'  # Métrica de validação do registro usada para escolher o modelo (None = o mais recente)
+MODEL_SELECTION_TAG = None  # Rótulo exigido na escolha do modelo (ex.: 'producao'; None = qualquer)
+ENSEMBLE_SIZE = 1  # Número de modelos do registro promediados na predição (1 = modelo único)
+NUM_WORKERS = 4  # Processos/threads para recorte, leitura e gravação de imagens
+TILING_BACKEND = 'rasterio'  # Leitura no recorte: 'rasterio' (janelas, memória constante) ou 'cv2'
+USE_TILE_STORE = False  # Gravar as amostras em um único arquivo HDF5 em vez de arquivos JPEG/PNG
+USE_TILE_CACHE = True  # Recortar apenas imagens novas ou alteradas (cache por hash da imagem e parâmetros)
+MIN_VALID_FRACTION = 0.0  # Fração mínima de pixels com dados (nodata/alfa) para manter um tile ou janela (0 = descarta só tiles vazios)
+TILE_AUGMENTATIONS = ()  # Amostras extras no recorte: 'fliph', 'flipv', 'rot90', 'rot180', 'rot270'
+
+# Modo de desempenho (CPU): XLA, precisão mista e threads do TensorFlow
+JIT_COMPILE = False  # Compilar treino e inferência com XLA (jit_compile)
+MIXED_PRECISION = False  # True, False ou 'auto' (mixed_bfloat16 se a CPU suportar bfloat16)
+INTRA_OP_THREADS = 0  # Threads por operação (0 = padrão do TensorFlow)
+INTER_OP_THREADS = 0  # Operações em paralelo (0 = padrão do TensorFlow)
+ONEDNN_OPTS = True  # Otimizações oneDNN na CPU (TF_ENABLE_ONEDNN_OPTS)
+
+# Predição em janelas deslizantes (ortomosaicos georreferenciados)
+TILE_OVERLAP = 64  # Sobreposição (em pixels) entre janelas vizinhas
+BLEND_MODE = 'gaussian'  # Pesos nas emendas: 'gaussian', 'cosine' ou 'mean'
+PREDICTION_OUTPUT_MODE = 'probability'  # COG de saída: 'probability' (uint8 0-255), 'binary' (0/255) ou 'float32'
+
+# Predição de catálogos de ortomosaicos em jobs retomáveis
+CATALOG_BLOCK_SIZE = 4096  # Lado (pixels) dos blocos de cada job
+CATALOG_WORKERS = 2  # Jobs executados em paralelo (processos)
+CATALOG_BACKEND = 'local'  # Execução dos jobs: 'local' (pool de processos)
+CATALOG_VECTOR_FORMAT = '.gpkg'  # Formato dos arquivos vetoriais por raster
+
+# Vetorização das máscaras
+MERGE_TILE_POLYGONS = True  # Unir polígonos cortados pelas bordas dos tiles
+SIMPLIFY_TOLERANCE = 0.0  # Tolerância de simplificação (unidades do mapa, 0 desativa)
+MIN_POLYGON_AREA = 0.0  # Área mínima dos polígonos (unidades do mapa ao quadrado)
+
+# Instrumentação
+SHOW_PROGRESS = True  # Barras de progresso com vazão e ETA em cada etapa
+PROGRESS_INTERVAL = 1.0  # Intervalo mínimo (s) entre atualizações da barra de progresso
+WRITE_METRICS = False  # Gravar métricas por etapa e época em JSON lines (DIRS['metrics'])
+METRICS_INTERVAL = 30.0  # Intervalo (s) entre eventos de progresso no arquivo de métricas
+PROFILE_STAGES = False  # Gravar um perfil cProfile (.prof) de cada etapa em DIRS['profiles']
+
+# Benchmark
+BENCHMARK_TOLERANCE = 0.15  # Queda de vazão ou aumento de memória tolerado antes de sinalizar regressão
 
 # Diretórios do projeto
 DIRS = {
@@ -14,18 +60,42 @@ DIRS = {
     'raw_masks': 'D:/Projetos/bemagro/gihub/data/raw/mask',            # Máscaras originais
     'processed_images': 'D:/Projetos/bemagro/gihub/data/processed/image',  # Tiles de imagens
     'processed_masks': 'D:/Projetos/bemagro/gihub/data/processed/mask',   # Tiles de máscaras
+    'tile_georef': 'D:/Projetos/bemagro/gihub/data/processed/tile_georef.csv',  # Georreferenciamento de cada tile
+    'tile_store': 'D:/Projetos/bemagro/gihub/data/processed/tiles.h5',  # Arquivo HDF5 com tiles e máscaras
+    'tile_cache': 'D:/Projetos/bemagro/gihub/data/processed/tile_cache.json',  # Cache do recorte incremental
 
     # Diretórios para treinamento e validação
     'train_images': 'D:/Projetos/bemagro/gihub/data/train/image',  # Imagens de treino
     'train_masks': 'D:/Projetos/bemagro/gihub/data/train/mask',    # Máscaras de treino
     'val_images': 'D:/Projetos/bemagro/gihub/data/val/image',      # Imagens de validação
     'val_masks': 'D:/Projetos/bemagro/gihub/data/val/mask',        # Máscaras de validação
+    'tile_manifest': 'D:/Projetos/bemagro/gihub/data/tile_manifest.csv',  # Índice de tiles (origem, posição e divisão)
 
     # Diretórios para predição
     'pred_input': 'D:/Projetos/bemagro/gihub/data/predict/input',      # Entrada para predições
     'pred_output': 'D:/Projetos/bemagro/gihub/data/predict/output',    # Saída das predições
+    'pred_geotiff': 'D:/Projetos/bemagro/gihub/data/predict/output/predicted_Orthomosaico_roi.tif',  # Probabilidade georreferenciada do ortomosaico (COG)
+    'pred_binary': 'D:/Projetos/bemagro/gihub/data/predict/output/predicted_Orthomosaico_roi_binary.tif',  # Máscara binária com outro limiar (COG)
+
+    # Diretório dos modelos treinados
+    'models': 'D:/Projetos/bemagro/gihub/models',
+    'model_registry': 'D:/Projetos/bemagro/gihub/models/registry.json',  # Métricas, tamanho de entrada, limiar e rótulos de cada modelo
 
     # Diretórios georreferenciados
     'geo_image': 'D:/Projetos/bemagro/gihub/data/predict/geo/Orthomosaico_roi.tif',  # Imagem base para predições georreferenciadas
-    'shapefile_output': 'D:/Projetos/bemagro/gihub/data/shapefile/vegetacao.shp',   # Caminho do shapefile gerado
+    'shapefile_output': 'D:/Projetos/bemagro/gihub/data/shapefile/vegetacao.shp',   # Saída vetorial (.shp, .gpkg, .fgb ou .parquet)
+
+    # Catálogo de ortomosaicos (predição em jobs retomáveis)
+    'catalog_input': 'D:/Projetos/bemagro/gihub/data/catalog',                     # Ortomosaicos da safra
+    'catalog_output': 'D:/Projetos/bemagro/gihub/data/catalog_output',             # Predições e vetores por raster
+    'catalog_state': 'D:/Projetos/bemagro/gihub/data/catalog_output/jobs.sqlite',  # Estado dos jobs
+
+    # Métricas e perfis de execução
+    'metrics': 'D:/Projetos/bemagro/gihub/logs/metrics.jsonl',  # Métricas por etapa (JSON lines)
+    'profiles': 'D:/Projetos/bemagro/gihub/logs/profiles',      # Perfis cProfile por etapa
+
+    # Benchmark com dados sintéticos
+    'benchmark': 'D:/Projetos/bemagro/gihub/benchmark',                          # Dados sintéticos e saídas intermediárias
+    'benchmark_results': 'D:/Projetos/bemagro/gihub/benchmark/results.json',     # Resultados da última execução
+    'benchmark_baseline': 'D:/Projetos/bemagro/gihub/benchmark/baseline.json',   # Referência para detectar regressões
 }
@@ -0,0 +1,185 @@
+import os
+import cv2
+import numpy as np
+import tensorflow as tf
+from src.manifest import paired_tiles
+from src.runtime import load_runtime_predictor
+
+def _calibration_tiles(image_dir, img_size, max_tiles=200):
+    """
+    Lê tiles para calibração da quantização, com o mesmo pré-processamento da predição
+    (BGR, redimensionado e normalizado em float32).
+
+    Returns:
+        list: Tiles float32 de formato (img_size, img_size, 3).
+    """
+    tiles = []
+    for filename in sorted(os.listdir(image_dir)):
+        if len(tiles) >= max_tiles:
+            break
+        if not filename.lower().endswith(('.png', '.jpg', '.jpeg', '.tiff', '.tif')):
+            continue
+        image = cv2.imread(os.path.join(image_dir, filename), cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+        tiles.append(cv2.resize(image, (img_size, img_size)).astype(np.float32) / 255.0)
+    if not tiles:
+        raise ValueError(f"Nenhum tile de calibração encontrado em: {image_dir}")
+    return tiles
+
+def export_tflite(model_path, output_path, img_size, calibration_dir=None, max_calibration_tiles=200):
+    """
+    Exporta um modelo .keras para TFLite, com quantização int8 pós-treinamento opcional.
+
+    Com calibration_dir, pesos e ativações são quantizados em int8 usando tiles reais
+    para calibrar os intervalos; entrada e saída permanecem em float32.
+
+    Args:
+        model_path (str): Caminho do modelo .keras treinado.
+        output_path (str): Caminho do arquivo .tflite de saída.
+        img_size (int): Tamanho das imagens de entrada.
+        calibration_dir (str): Diretório de tiles para calibração (None exporta em float32).
+        max_calibration_tiles (int): Número máximo de tiles usados na calibração.
+
+    Returns:
+        str: Caminho do modelo exportado.
+    """
+    model = tf.keras.models.load_model(model_path, compile=False)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if calibration_dir:
+        tiles = _calibration_tiles(calibration_dir, img_size, max_calibration_tiles)
+
+        def representative_dataset():
+            for tile in tiles:
+                yield [tile[np.newaxis]]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+    print(f"Modelo TFLite salvo em: {output_path}")
+    return output_path
+
+def export_onnx(model_path, output_path, img_size, calibration_dir=None, max_calibration_tiles=200, opset=17):
+    """
+    Exporta um modelo .keras para ONNX, com quantização int8 estática opcional (formato QDQ).
+
+    Requer o pacote tf2onnx para a conversão; a quantização usa o onnxruntime.
+
+    Args:
+        model_path (str): Caminho do modelo .keras treinado.
+        output_path (str): Caminho do arquivo .onnx de saída.
+        img_size (int): Tamanho das imagens de entrada.
+        calibration_dir (str): Diretório de tiles para calibração (None exporta em float32).
+        max_calibration_tiles (int): Número máximo de tiles usados na calibração.
+        opset (int): Versão do opset ONNX.
+
+    Returns:
+        str: Caminho do modelo exportado.
+    """
+    try:
+        import tf2onnx
+    except ImportError as e:
+        raise ImportError("A exportação para ONNX requer o pacote tf2onnx (pip install tf2onnx).") from e
+
+    model = tf.keras.models.load_model(model_path, compile=False)
+    signature = (tf.TensorSpec((None, img_size, img_size, 3), tf.float32, name='input'),)
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    @tf.function(input_signature=signature)
+    def serving(batch):
+        return model(batch, training=False)
+
+    float_path = output_path if not calibration_dir else os.path.splitext(output_path)[0] + '_float32.onnx'
+    tf2onnx.convert.from_function(serving, input_signature=signature, opset=opset, output_path=float_path)
+
+    if calibration_dir:
+        from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+        tiles = _calibration_tiles(calibration_dir, img_size, max_calibration_tiles)
+
+        class TileCalibrationReader(CalibrationDataReader):
+            def __init__(self):
+                self.tiles = iter(tiles)
+
+            def get_next(self):
+                tile = next(self.tiles, None)
+                return None if tile is None else {'input': tile[np.newaxis]}
+
+        quantize_static(float_path, output_path, TileCalibrationReader(), quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QInt8, weight_type=QuantType.QInt8)
+
+    print(f"Modelo ONNX salvo em: {output_path}")
+    return output_path
+
+def compare_exported_model(model_path, exported_path, image_dir, mask_dir, img_size, threshold=0.3, batch_size=16,
+                           max_tiles=500):
+    """
+    Compara o modelo exportado com o modelo Keras em float32 sobre tiles de validação.
+
+    Args:
+        model_path (str): Caminho do modelo .keras de referência.
+        exported_path (str): Caminho do modelo exportado (.onnx ou .tflite).
+        image_dir (str): Diretório com as imagens de validação.
+        mask_dir (str): Diretório com as máscaras de validação.
+        img_size (int): Tamanho das imagens de entrada.
+        threshold (float): Limiar para binarizar as predições.
+        batch_size (int): Tamanho do lote.
+        max_tiles (int): Número máximo de tiles avaliados.
+
+    Returns:
+        dict: IoU do modelo float e do exportado em relação às máscaras, variação de IoU,
+        IoU entre as duas predições e tamanhos dos arquivos (bytes).
+    """
+    from src.predict import load_predictor
+
+    predict_float = load_predictor(model_path, img_size)
+    predict_exported = load_runtime_predictor(exported_path)
+
+    counts = {'float': [0, 0], 'exported': [0, 0], 'agreement': [0, 0]}
+
+    def accumulate(key, a, b):
+        counts[key][0] += np.logical_and(a, b).sum()
+        counts[key][1] += np.logical_or(a, b).sum()
+
+    pairs = paired_tiles(image_dir, mask_dir)[:max_tiles]
+    for start in range(0, len(pairs), batch_size):
+        images, truths = [], []
+        for image_path, mask_path in pairs[start:start + batch_size]:
+            image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+            mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+            if image is None or mask is None:
+                continue
+            images.append(cv2.resize(image, (img_size, img_size)).astype(np.float32) / 255.0)
+            truths.append(cv2.resize(mask, (img_size, img_size), interpolation=cv2.INTER_NEAREST) > 127)
+        if not images:
+            continue
+        batch, truth = np.stack(images), np.stack(truths)
+        float_mask = predict_float(batch)[..., 0] > threshold
+        exported_mask = predict_exported(batch)[..., 0] > threshold
+        accumulate('float', float_mask, truth)
+        accumulate('exported', exported_mask, truth)
+        accumulate('agreement', float_mask, exported_mask)
+
+    iou = {key: (inter / union if union else 1.0) for key, (inter, union) in counts.items()}
+    report = {
+        'iou_float': float(iou['float']),
+        'iou_exported': float(iou['exported']),
+        'iou_change': float(iou['exported'] - iou['float']),
+        'iou_agreement': float(iou['agreement']),
+        'size_float': os.path.getsize(model_path),
+        'size_exported': os.path.getsize(exported_path),
+    }
+    print(f"IoU float32: {report['iou_float']:.4f} | IoU exportado: {report['iou_exported']:.4f} "
+          f"(variação {report['iou_change']:+.4f}) | concordância entre modelos: {report['iou_agreement']:.4f}")
+    print(f"Tamanho: {report['size_float'] / 1e6:.1f} MB -> {report['size_exported'] / 1e6:.1f} MB")
+    return report
@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import cProfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Configuração global, definida pelo main.py a partir do config.py
+_SETTINGS = {
+    'metrics_path': None,      # Arquivo JSON lines de métricas (None desativa)
+    'metrics_interval': 30.0,  # Intervalo (s) entre eventos de progresso no arquivo de métricas
+    'profile_dir': None,       # Diretório dos perfis cProfile (None desativa)
+    'progress': True,          # Mostrar barras de progresso
+    'progress_interval': 1.0,  # Intervalo mínimo (s) entre atualizações da barra
+}
+_METRICS_LOCK = threading.Lock()
+
+def configure_instrumentation(metrics_path=None, metrics_interval=30.0, profile_dir=None, progress=True,
+                              progress_interval=1.0):
+    """
+    Define as opções de instrumentação usadas por todas as etapas.
+
+    Args:
+        metrics_path (str): Arquivo JSON lines onde gravar as métricas (None desativa).
+        metrics_interval (float): Intervalo (s) entre eventos de progresso no arquivo de métricas.
+        profile_dir (str): Diretório onde gravar um perfil cProfile (.prof) por etapa (None desativa).
+        progress (bool): Mostrar barras de progresso.
+        progress_interval (float): Intervalo mínimo (s) entre atualizações da barra.
+    """
+    _SETTINGS.update(metrics_path=metrics_path, metrics_interval=metrics_interval, profile_dir=profile_dir,
+                     progress=progress, progress_interval=progress_interval)
+
+def instrumentation_settings():
+    """
+    Retorna uma cópia da configuração atual, para repassar a processos de trabalho.
+
+    Returns:
+        dict: Argumentos aceitos por configure_instrumentation.
+    """
+    return dict(_SETTINGS)
+
+def log_metrics(event, **fields):
+    """
+    Acrescenta um registro ao arquivo de métricas JSON lines, se configurado.
+
+    Args:
+        event (str): Tipo do registro (ex.: 'stage', 'progress', 'epoch').
+        **fields: Valores serializáveis em JSON.
+    """
+    path = _SETTINGS['metrics_path']
+    if not path:
+        return
+    record = {'time': datetime.now().isoformat(timespec='seconds'), 'event': event, 'pid': os.getpid(), **fields}
+    with _METRICS_LOCK:
+        output_dir = os.path.dirname(path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+
+class Timers:
+    """
+    Acumula tempo e número de chamadas por operação (ex.: decode, resize, predict, write).
+
+    Seguro entre threads: com operações em paralelo, o tempo somado pode exceder o tempo de parede.
+    O conteúdo de as_dict() pode ser devolvido por processos do pool e combinado com merge().
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, calls=1):
+        with self._lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + calls
+
+    @contextmanager
+    def time(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start_time)
+
+    def iterate(self, iterable, name):
+        """
+        Percorre iterable somando em name o tempo de produção de cada item (ex.: leitura de tiles).
+        """
+        start_time = time.perf_counter()
+        for item in iterable:
+            self.add(name, time.perf_counter() - start_time)
+            yield item
+            start_time = time.perf_counter()
+
+    def as_dict(self):
+        with self._lock:
+            return {name: [self.seconds[name], self.calls[name]] for name in self.seconds}
+
+    def merge(self, timers):
+        for name, (seconds, calls) in timers.items():
+            self.add(name, seconds, calls)
+
+class Stage:
+    """
+    Instrumentação de uma etapa do pipeline, usada como bloco with.
+
+    Reúne temporizadores por operação, contadores, uma barra de progresso (tqdm, com
+    vazão e ETA, atualizada no máximo a cada progress_interval segundos) e, conforme a
+    configuração, grava eventos JSON lines e um perfil cProfile da thread principal.
+    Ao final, mostra uma linha de resumo com a vazão e o tempo de cada operação.
+
+    Args:
+        name (str): Nome da etapa (ex.: 'tiling', 'predict_images').
+        total (int): Total de unidades esperado, para o ETA (None se desconhecido).
+        unit (str): Unidade da barra de progresso (ex.: 'tiles', 'janelas').
+    """
+
+    def __init__(self, name, total=None, unit='tiles'):
+        self.name = name
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.timers = Timers()
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._bar = None
+        self._profiler = None
+
+    def __enter__(self):
+        from tqdm import tqdm
+
+        self.start_time = self._last_event = time.perf_counter()
+        self._bar = tqdm(total=self.total, desc=self.name, unit=f" {self.unit}", leave=False,
+                         disable=not _SETTINGS['progress'], mininterval=_SETTINGS['progress_interval'])
+        if _SETTINGS['profile_dir']:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self._profiler is not None:
+            self._profiler.disable()
+            os.makedirs(_SETTINGS['profile_dir'], exist_ok=True)
+            profile_path = os.path.join(_SETTINGS['profile_dir'],
+                                        f"{self.name}_{datetime.now():%Y%m%d_%H%M%S_%f}.prof")
+            self._profiler.dump_stats(profile_path)
+            print(f"Perfil de {self.name} salvo em: {profile_path}")
+        self._bar.close()
+        if exc_type is None:
+            self.report()
+        return False
+
+    def time(self, name):
+        """
+        Bloco with que soma o tempo gasto na operação name.
+        """
+        return self.timers.time(name)
+
+    def count(self, name, n=1):
+        """
+        Incrementa o contador name (ex.: tiles gravados, janelas ignoradas).
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def advance(self, n=1):
+        """
+        Registra n unidades concluídas, atualizando a barra e os eventos de progresso.
+        """
+        with self._lock:
+            self.done += n
+            self._bar.update(n)
+            now = time.perf_counter()
+            if not _SETTINGS['metrics_path'] or now - self._last_event < _SETTINGS['metrics_interval']:
+                return
+            self._last_event = now
+        elapsed = now - self.start_time
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if self.total and rate else None
+        log_metrics('progress', stage=self.name, done=self.done, total=self.total, unit=self.unit,
+                    rate=round(rate, 3), eta_s=round(eta, 1) if eta is not None else None)
+
+    def summary(self):
+        """
+        Returns:
+            dict: Tempo decorrido, unidades concluídas, vazão, contadores e tempo por operação.
+        """
+        elapsed = time.perf_counter() - self.start_time
+        return {
+            'stage': self.name,
+            'elapsed_s': round(elapsed, 3),
+            'done': self.done,
+            'unit': self.unit,
+            'rate': round(self.done / elapsed, 3) if elapsed > 0 else 0.0,
+            'counters': dict(self.counters),
+            'timers': {name: {'seconds': round(seconds, 3), 'calls': calls}
+                       for name, (seconds, calls) in self.timers.as_dict().items()},
+        }
+
+    def report(self):
+        """
+        Mostra o resumo da etapa e o grava no arquivo de métricas.
+        """
+        summary = self.summary()
+        elapsed = summary['elapsed_s']
+        parts = [f"{summary['done']} {self.unit} em {elapsed:.1f} s ({summary['rate']:.1f} {self.unit}/s)"]
+        parts += [f"{name} {count} ({count / elapsed:.1f}/s)" if elapsed > 0 else f"{name} {count}"
+                  for name, count in summary['counters'].items()]
+        parts += [f"{name} {timer['seconds']:.1f} s"
+                  for name, timer in sorted(summary['timers'].items(), key=lambda item: -item[1]['seconds'])]
+        print(f"[{self.name}] " + " | ".join(parts))
+        log_metrics('stage', **summary)
+        return summary
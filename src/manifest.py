@@ -0,0 +1,244 @@
+import os
+import csv
+import json
+import hashlib
+
+MANIFEST_FIELDS = ['stem', 'image', 'mask', 'source', 'x', 'y', 'split']
+GEOREF_FIELDS = ['stem', 'crs', 'a', 'b', 'c', 'd', 'e', 'f']
+TILE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff')
+AUGMENTATIONS = ('fliph', 'flipv', 'rot90', 'rot180', 'rot270')
+
+def base_tile_stem(stem):
+    """
+    Remove o sufixo de aumento de dados ("_fliph", "_rot90", ...) do nome de um tile.
+
+    Args:
+        stem (str): Nome do tile sem extensão.
+
+    Returns:
+        str: Nome do tile original ("<origem>_<x>_<y>").
+    """
+    base, _, suffix = stem.rpartition('_')
+    return base if base and suffix in AUGMENTATIONS else stem
+
+def parse_tile_name(stem):
+    """
+    Extrai a imagem de origem e a posição do tile a partir do nome gerado pelo recorte.
+
+    Args:
+        stem (str): Nome do tile sem extensão, no formato "<origem>_<x>_<y>", com um sufixo
+            opcional de aumento de dados ("<origem>_<x>_<y>_rot90").
+
+    Returns:
+        tuple: (origem, x, y). x e y são None se o nome não seguir o padrão.
+    """
+    parts = base_tile_stem(stem).rsplit('_', 2)
+    if len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
+        return parts[0], int(parts[1]), int(parts[2])
+    return stem, None, None
+
+def _scan_files(directory):
+    """
+    Lista os arquivos de um diretório em uma única passagem com os.scandir.
+
+    Returns:
+        dict: Nome sem extensão -> caminho completo.
+    """
+    files = {}
+    if not directory or not os.path.isdir(directory):
+        return files
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(TILE_EXTENSIONS):
+                files[os.path.splitext(entry.name)[0]] = entry.path
+    return files
+
+def build_tile_index(image_dir, mask_dir=None, split=None):
+    """
+    Cria o índice de tiles, pareando imagens e máscaras pelo nome sem extensão em O(n).
+
+    Args:
+        image_dir (str): Diretório contendo os tiles de imagem.
+        mask_dir (str): Diretório contendo os tiles de máscara (opcional).
+        split (str): Rótulo do conjunto ('train', 'val', ...) registrado em cada entrada.
+
+    Returns:
+        dict: Nome sem extensão -> entrada com as chaves de MANIFEST_FIELDS.
+    """
+    masks = _scan_files(mask_dir)
+    index = {}
+    for stem, image_path in _scan_files(image_dir).items():
+        source, x, y = parse_tile_name(stem)
+        index[stem] = {
+            'stem': stem,
+            'image': image_path,
+            'mask': masks.get(stem),
+            'source': source,
+            'x': x,
+            'y': y,
+            'split': split,
+        }
+    return index
+
+def save_tile_manifest(index, manifest_path):
+    """
+    Salva o índice de tiles em CSV.
+
+    Args:
+        index (dict): Índice gerado por build_tile_index.
+        manifest_path (str): Caminho do arquivo CSV.
+    """
+    manifest_dir = os.path.dirname(manifest_path)
+    if manifest_dir:
+        os.makedirs(manifest_dir, exist_ok=True)
+    with open(manifest_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        for entry in index.values():
+            writer.writerow({key: '' if entry.get(key) is None else entry[key] for key in MANIFEST_FIELDS})
+
+def load_tile_manifest(manifest_path):
+    """
+    Carrega um índice de tiles salvo por save_tile_manifest.
+
+    Args:
+        manifest_path (str): Caminho do arquivo CSV.
+
+    Returns:
+        dict: Nome sem extensão -> entrada com as chaves de MANIFEST_FIELDS.
+    """
+    index = {}
+    with open(manifest_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            entry = {key: (row.get(key) or None) for key in MANIFEST_FIELDS}
+            entry['x'] = int(entry['x']) if entry['x'] is not None else None
+            entry['y'] = int(entry['y']) if entry['y'] is not None else None
+            index[entry['stem']] = entry
+    return index
+
+def paired_tiles(image_dir, mask_dir, manifest_path=None, split=None):
+    """
+    Retorna os pares (imagem, máscara) de um conjunto, reaproveitando o manifesto quando existir.
+
+    Args:
+        image_dir (str): Diretório contendo os tiles de imagem.
+        mask_dir (str): Diretório contendo os tiles de máscara.
+        manifest_path (str): Manifesto salvo por split_train_val (opcional).
+        split (str): Conjunto a selecionar no manifesto ('train' ou 'val').
+
+    Returns:
+        list: Pares (caminho da imagem, caminho da máscara) ordenados pelo nome do tile.
+    """
+    if manifest_path and split and os.path.exists(manifest_path):
+        index = load_tile_manifest(manifest_path)
+        entries = [entry for entry in index.values() if entry['split'] == split]
+    else:
+        index = build_tile_index(image_dir, mask_dir)
+        entries = list(index.values())
+        for entry in entries:
+            if entry['mask'] is None:
+                print(f"Máscara correspondente não encontrada para: {os.path.basename(entry['image'])}")
+
+    entries = sorted((entry for entry in entries if entry['mask'] is not None), key=lambda e: e['stem'])
+    return [(entry['image'], entry['mask']) for entry in entries]
+
+def save_tile_georef(georefs, georef_path):
+    """
+    Salva o georreferenciamento de cada tile em CSV (coeficientes a-f do transform afim).
+
+    Args:
+        georefs (list): Tuplas (nome do tile, CRS, (a, b, c, d, e, f)).
+        georef_path (str): Caminho do arquivo CSV.
+    """
+    georef_dir = os.path.dirname(georef_path)
+    if georef_dir:
+        os.makedirs(georef_dir, exist_ok=True)
+    with open(georef_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(GEOREF_FIELDS)
+        for stem, crs, coefficients in georefs:
+            writer.writerow([stem, crs] + [repr(float(c)) for c in coefficients])
+
+def load_tile_georef(georef_path):
+    """
+    Carrega o georreferenciamento salvo por save_tile_georef.
+
+    Args:
+        georef_path (str): Caminho do arquivo CSV.
+
+    Returns:
+        dict: Nome do tile -> (CRS, (a, b, c, d, e, f)).
+    """
+    georefs = {}
+    with open(georef_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            georefs[row['stem']] = (row['crs'] or None, tuple(float(row[key]) for key in GEOREF_FIELDS[2:]))
+    return georefs
+
+def file_fingerprint(path, previous=None, chunk_size=1 << 20):
+    """
+    Calcula a impressão digital de um arquivo: tamanho, data de modificação e SHA-256 do conteúdo.
+
+    Se o tamanho e a data de modificação não mudaram em relação a previous, o hash
+    anterior é reaproveitado sem reler o arquivo.
+
+    Args:
+        path (str): Caminho do arquivo.
+        previous (dict): Impressão digital anterior do mesmo arquivo (opcional).
+        chunk_size (int): Tamanho dos blocos lidos no cálculo do hash (bytes).
+
+    Returns:
+        dict: {'size', 'mtime_ns', 'sha256'}.
+    """
+    stat = os.stat(path)
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+        digest = previous['sha256']
+    else:
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+
+def tiling_key(sha256, **params):
+    """
+    Gera a chave de cache de uma imagem recortada: hash do conteúdo combinado com os
+    parâmetros do recorte (tamanho dos tiles, limiar de binarização, ...).
+
+    Returns:
+        str: Chave hexadecimal SHA-256.
+    """
+    payload = json.dumps({'sha256': sha256, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def load_tile_cache(cache_path):
+    """
+    Carrega o manifesto de cache do recorte (vazio se o arquivo não existir).
+
+    Args:
+        cache_path (str): Caminho do arquivo JSON.
+
+    Returns:
+        dict: Seção ('tiles' ou 'samples') -> nome da imagem de origem -> entrada do cache.
+    """
+    if not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_tile_cache(cache, cache_path):
+    """
+    Salva o manifesto de cache do recorte, substituindo o arquivo anterior de forma atômica.
+
+    Args:
+        cache (dict): Cache no formato retornado por load_tile_cache.
+        cache_path (str): Caminho do arquivo JSON.
+    """
+    cache_dir = os.path.dirname(cache_path)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=1)
+    os.replace(tmp_path, cache_path)
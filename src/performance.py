@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+import numpy as np
+
+def cpu_supports_bfloat16():
+    """
+    Verifica se a CPU tem instruções nativas de bfloat16 (AVX512_BF16 ou AMX_BF16).
+
+    Returns:
+        bool: True se o bfloat16 é acelerado pela CPU.
+    """
+    flags = set()
+    if os.path.exists('/proc/cpuinfo'):
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    flags.update(line.split(':', 1)[1].split())
+                    break
+    else:
+        try:
+            import cpuinfo
+            flags.update(cpuinfo.get_cpu_info().get('flags', []))
+        except ImportError:
+            return False
+    return bool(flags & {'avx512_bf16', 'amx_bf16'})
+
+def configure_runtime(intra_op_threads=0, inter_op_threads=0, onednn=True):
+    """
+    Aplica as configurações de threads e oneDNN do TensorFlow.
+
+    A variável TF_ENABLE_ONEDNN_OPTS só tem efeito se definida antes da importação do
+    TensorFlow, e os números de threads só podem ser alterados antes da primeira operação.
+
+    Args:
+        intra_op_threads (int): Threads por operação (0 = padrão do TensorFlow).
+        inter_op_threads (int): Operações executadas em paralelo (0 = padrão do TensorFlow).
+        onednn (bool): Ativar as otimizações oneDNN na CPU.
+    """
+    if 'tensorflow' in sys.modules and os.environ.get('TF_ENABLE_ONEDNN_OPTS') not in (None, '1' if onednn else '0'):
+        print("Aviso: o TensorFlow já foi importado; a configuração do oneDNN será aplicada na próxima execução.")
+    os.environ['TF_ENABLE_ONEDNN_OPTS'] = '1' if onednn else '0'
+
+    import tensorflow as tf
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError:
+        print("Aviso: o runtime do TensorFlow já foi inicializado; os números de threads não foram alterados.")
+
+def resolve_mixed_precision(mixed_precision):
+    """
+    Decide se a política mixed_bfloat16 será usada.
+
+    Args:
+        mixed_precision (bool | str): True, False ou 'auto' (usa se a CPU suportar bfloat16).
+
+    Returns:
+        bool: True se o modelo deve rodar em mixed_bfloat16.
+    """
+    if mixed_precision == 'auto':
+        return cpu_supports_bfloat16()
+    return bool(mixed_precision)
+
+def benchmark_performance_modes(model_path, image_dir, mask_dir, img_size, batch_size=16, max_batches=20, threshold=0.3):
+    """
+    Compara a inferência em float32 (referência) com os modos XLA e XLA + mixed_bfloat16.
+
+    Para cada modo mede a vazão (tiles/s) e, sobre as mesmas imagens de validação,
+    a IoU em relação às máscaras e a maior diferença de probabilidade em relação à referência.
+    Cada formato de lote é executado uma vez antes da medição, para que a compilação
+    (inclusive a do último lote, menor) fique fora do tempo medido.
+
+    Args:
+        model_path (str): Caminho do modelo U-Net treinado.
+        image_dir (str): Diretório com as imagens de validação.
+        mask_dir (str): Diretório com as máscaras de validação.
+        img_size (int): Tamanho das imagens de entrada.
+        batch_size (int): Tamanho do lote.
+        max_batches (int): Número máximo de lotes avaliados.
+        threshold (float): Limiar para binarizar as predições.
+
+    Returns:
+        dict: Modo -> {'tiles_per_sec', 'speedup', 'iou', 'max_prob_diff'}.
+    """
+    from src.predict import load_inference_model, make_predict_fn
+    from src.utils import load_dataset
+
+    dataset, _ = load_dataset(image_dir, mask_dir, img_size, batch_size, shuffle=False)
+    batches = [(images.numpy(), masks.numpy()) for images, masks in dataset.take(max_batches)]
+    if not batches:
+        raise ValueError("Nenhuma amostra de validação encontrada para o benchmark.")
+
+    modes = {
+        'float32': {'jit_compile': False, 'mixed_precision': False},
+        'xla': {'jit_compile': True, 'mixed_precision': False},
+        'xla_bf16': {'jit_compile': True, 'mixed_precision': True},
+    }
+    results, reference = {}, None
+    for name, options in modes.items():
+        model = load_inference_model(model_path, img_size, mixed_precision=options['mixed_precision'])
+        predict_fn = make_predict_fn(model, img_size, jit_compile=options['jit_compile'], batch_size=batch_size)
+        for shape in {images.shape for images, _ in batches}:
+            predict_fn(np.zeros(shape, dtype=np.float32))  # Aquecimento (compilação de cada formato de lote)
+
+        start_time = time.perf_counter()
+        probabilities = [predict_fn(images)[..., 0].astype(np.float32) for images, _ in batches]
+        elapsed = time.perf_counter() - start_time
+
+        predicted = np.concatenate(probabilities) > threshold
+        truth = np.concatenate([masks[..., 0] for _, masks in batches]) > 0.5
+        union = np.logical_or(predicted, truth).sum()
+        iou = np.logical_and(predicted, truth).sum() / union if union else 1.0
+        if reference is None:
+            reference = probabilities
+
+        n_tiles = sum(len(images) for images, _ in batches)
+        results[name] = {
+            'tiles_per_sec': n_tiles / elapsed,
+            'iou': float(iou),
+            'max_prob_diff': float(max(np.abs(p - r).max() for p, r in zip(probabilities, reference))),
+        }
+
+    for name, result in results.items():
+        result['speedup'] = result['tiles_per_sec'] / results['float32']['tiles_per_sec']
+        print(f"{name:>9}: {result['tiles_per_sec']:.1f} tiles/s (x{result['speedup']:.2f}), "
+              f"IoU {result['iou']:.4f}, diferença máx. de probabilidade {result['max_prob_diff']:.4f}")
+    return results
@@ -1,25 +1,337 @@
-from tensorflow.keras.models import load_model
 import os
+import importlib.util
+import shutil
+import warnings
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
-import geopandas as gpd
-from shapely.geometry import Polygon
+import shapely
 import rasterio
+from rasterio.errors import NotGeoreferencedWarning
+from rasterio.features import rasterize
+from rasterio.io import MemoryFile
+from rasterio.shutil import copy as copy_dataset
+from rasterio.transform import Affine
+from rasterio.windows import Window
+from src.instrumentation import Stage
+from src.manifest import load_tile_georef, parse_tile_name
+from src.preprocessing import keep_tile, read_window_bgr, read_window_valid
+from src.runtime import is_runtime_model, load_runtime_predictor
 
-def predict_images(input_path, output_dir, model_path, img_size=256, threshold=0.3):
+# Motor de escrita vetorial (verificado sem importar o pyogrio; None = padrão do geopandas)
+VECTOR_ENGINE = 'pyogrio' if importlib.util.find_spec('pyogrio') else None
+
+# Formatos vetoriais suportados, pela extensão do arquivo de saída
+VECTOR_DRIVERS = {
+    '.shp': 'ESRI Shapefile',
+    '.gpkg': 'GPKG',
+    '.fgb': 'FlatGeobuf',
+    '.parquet': None,
+}
+
+# Opções de criação das predições gravadas como Cloud-Optimized GeoTIFF
+COG_OPTIONS = {'compress': 'DEFLATE', 'blocksize': 256, 'BIGTIFF': 'IF_SAFER'}
+
+# Reamostragem das overviews por tipo de saída da predição
+OVERVIEW_RESAMPLING = {'probability': 'AVERAGE', 'float32': 'AVERAGE', 'binary': 'MODE'}
+
+# Funções de predição carregadas por load_predictor, reaproveitadas entre rasters na mesma sessão
+_PREDICTORS = {}
+
+def quantize_probability(probability):
     """
-    Realiza a predição em imagens e salva as máscaras geradas.
+    Quantiza probabilidades em [0, 1] para uint8 (0-255), o formato gravado nas predições.
+
+    Args:
+        probability (np.ndarray): Probabilidades em float.
+
+    Returns:
+        np.ndarray: Probabilidades em uint8 (valor / 255 recupera a probabilidade).
+    """
+    return np.clip(np.rint(np.asarray(probability, dtype=np.float32) * 255), 0, 255).astype(np.uint8)
+
+def _write_cog(dataset, output_path, resampling):
+    """
+    Copia um dataset rasterio aberto (arquivo temporário ou em memória) para um
+    Cloud-Optimized GeoTIFF, com overviews internas, máscara, tags e escala preservadas.
+    """
+    copy_dataset(dataset, output_path, driver='COG', overview_resampling=resampling, **COG_OPTIONS)
+
+@contextmanager
+def _temporary_geotiff(output_path):
+    """
+    Caminho de um GeoTIFF temporário ao lado da saída, gravado em janelas antes da
+    conversão para COG (o driver COG não permite escrita por janelas) e removido ao final.
+    """
+    temp_path = f"{os.path.splitext(output_path)[0]}.tmp.tif"
+    try:
+        yield temp_path
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def load_inference_model(model_path, img_size, mixed_precision=False):
+    """
+    Carrega o modelo para inferência, opcionalmente em mixed_bfloat16.
+
+    Em mixed_bfloat16 a U-Net é reconstruída com a política de precisão mista
+    (saída sigmoide em float32) e recebe os pesos do modelo salvo.
+
     Args:
-        input_path (str): Caminho ou diretório contendo as imagens de entrada.
-        output_dir (str): Diretório onde as máscaras preditas serão salvas.
         model_path (str): Caminho do modelo U-Net treinado.
         img_size (int): Tamanho das imagens de entrada (assume quadradas).
-        threshold (float): Limiar para binarizar a máscara predita.
+        mixed_precision (bool): Executar em mixed_bfloat16.
+
+    Returns:
+        tf.keras.Model: Modelo pronto para inferência.
     """
-    os.makedirs(output_dir, exist_ok=True)
+    # O TensorFlow só é importado quando um modelo Keras é usado
+    import tensorflow as tf
+    from src.train import unet_model
 
     # Carregar o modelo treinado sem compilar automaticamente
-    model = load_model(model_path, compile=False)
+    model = tf.keras.models.load_model(model_path, compile=False)
+    if not mixed_precision or model.dtype_policy.name == 'mixed_bfloat16':
+        return model
+
+    previous_policy = tf.keras.mixed_precision.global_policy()
+    tf.keras.mixed_precision.set_global_policy('mixed_bfloat16')
+    try:
+        mixed_model = unet_model((img_size, img_size, 3))
+        mixed_model.set_weights(model.get_weights())
+    except ValueError:
+        print("Aviso: arquitetura do modelo diferente da U-Net padrão; mantendo float32.")
+        return model
+    finally:
+        tf.keras.mixed_precision.set_global_policy(previous_policy)
+    return mixed_model
+
+def make_predict_fn(model, img_size, jit_compile=False, batch_size=None):
+    """
+    Compila a chamada do modelo em um único tf.function, evitando o custo por chamada de model.predict.
+
+    Com uma lista de modelos (ensemble), todos são chamados sobre o mesmo lote no mesmo
+    tf.function e as probabilidades são promediadas: uma única passada por lote.
+
+    Com XLA e batch_size, a função é compilada para um lote fixo: lotes menores (último
+    lote, fim de faixa, janelas sem dados ignoradas) são completados com zeros e as saídas
+    recortadas, evitando uma recompilação a cada tamanho de lote novo.
+
+    Args:
+        model (tf.keras.Model | list): Modelo carregado ou lista de modelos do ensemble.
+        img_size (int): Tamanho das imagens de entrada (assume quadradas).
+        jit_compile (bool): Compilar a função com XLA.
+        batch_size (int): Tamanho fixo do lote compilado com XLA (None aceita qualquer tamanho).
+
+    Returns:
+        callable: Função que recebe um lote float32 (N, img_size, img_size, 3) e retorna as probabilidades.
+    """
+    import tensorflow as tf
+
+    ensemble = list(model) if isinstance(model, (list, tuple)) else [model]
+    fixed_size = batch_size if jit_compile and batch_size else None
+
+    @tf.function(input_signature=[tf.TensorSpec([fixed_size, img_size, img_size, 3], tf.float32)],
+                 jit_compile=jit_compile)
+    def predict_fn(batch):
+        outputs = [tf.cast(member(batch, training=False), tf.float32) for member in ensemble]
+        return outputs[0] if len(outputs) == 1 else tf.add_n(outputs) / len(outputs)
+
+    if fixed_size is None:
+        return lambda batch: predict_fn(tf.convert_to_tensor(batch)).numpy()
+
+    def predict_padded(batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        outputs = []
+        for start in range(0, len(batch), fixed_size):
+            chunk = batch[start:start + fixed_size]
+            padded = chunk
+            if len(chunk) < fixed_size:
+                padded = np.zeros((fixed_size,) + chunk.shape[1:], dtype=np.float32)
+                padded[:len(chunk)] = chunk
+            outputs.append(predict_fn(tf.convert_to_tensor(padded)).numpy()[:len(chunk)])
+        return np.concatenate(outputs)
+
+    return predict_padded
+
+def model_label(model_path):
+    """
+    Nome do modelo (ou dos modelos do ensemble) gravado nas tags das predições.
+    """
+    paths = [model_path] if isinstance(model_path, str) else model_path
+    return ','.join(os.path.basename(path) for path in paths)
+
+def load_predictor(model_path, img_size, jit_compile=False, mixed_precision=False, batch_size=None):
+    """
+    Carrega a função de predição adequada ao formato do modelo.
+
+    Modelos exportados (.onnx, .tflite) rodam no runtime leve, sem importar o
+    TensorFlow; modelos Keras (.keras) rodam em um tf.function compilado. Com uma
+    lista de caminhos, as probabilidades dos modelos são promediadas (ensemble).
+
+    As funções carregadas ficam em cache no processo (pelo caminho e data de
+    modificação dos arquivos), de modo que predizer vários rasters na mesma sessão
+    não recarrega nem recompila o modelo.
+
+    Args:
+        model_path (str | list): Caminho do modelo ou lista de caminhos do ensemble.
+        img_size (int): Tamanho das imagens de entrada (assume quadradas).
+        jit_compile (bool): Compilar a inferência com XLA (apenas modelos Keras).
+        mixed_precision (bool): Executar em mixed_bfloat16 (apenas modelos Keras).
+        batch_size (int): Tamanho fixo do lote com XLA (ver make_predict_fn).
+
+    Returns:
+        callable: Função que recebe um lote float32 (N, img_size, img_size, 3) e retorna as probabilidades.
+    """
+    paths = [model_path] if isinstance(model_path, str) else list(model_path)
+    key = (tuple((os.path.abspath(path), os.path.getmtime(path)) for path in paths), img_size, jit_compile,
+           mixed_precision, batch_size if jit_compile else None)
+    if key in _PREDICTORS:
+        return _PREDICTORS[key]
+
+    if not any(is_runtime_model(path) for path in paths):
+        models = [load_inference_model(path, img_size, mixed_precision) for path in paths]
+        predictor = make_predict_fn(models, img_size, jit_compile, batch_size)
+    elif len(paths) == 1:
+        predictor = load_runtime_predictor(paths[0])
+    else:
+        # Ensemble com modelos exportados: uma chamada por modelo e média das probabilidades
+        members = [load_predictor(path, img_size, jit_compile, mixed_precision, batch_size) for path in paths]
+
+        def predictor(batch):
+            return np.mean([member(batch) for member in members], axis=0)
+
+    _PREDICTORS[key] = predictor
+    return predictor
+
+def clear_predictor_cache():
+    """
+    Libera as funções de predição mantidas em cache por load_predictor.
+    """
+    _PREDICTORS.clear()
+
+def _prefetch(executor, fn, items, depth):
+    """
+    Aplica fn aos itens em um pool de threads mantendo no máximo depth resultados em andamento,
+    preservando a ordem de entrada.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def _load_for_prediction(filepath, img_size, stage):
+    """
+    Decodifica, redimensiona e normaliza uma imagem para predição.
+
+    Returns:
+        tuple: (caminho, tamanho original (altura, largura), imagem float32) ou None em caso de erro.
+    """
+    with stage.time('decode'):
+        image = cv2.imread(filepath, cv2.IMREAD_COLOR)
+    if image is None:
+        print(f"Erro ao carregar a imagem: {filepath}")
+        return None
+    original_size = image.shape[:2]
+    with stage.time('resize'):
+        image_resized = cv2.resize(image, (img_size, img_size)).astype(np.float32) / 255.0
+    return filepath, original_size, image_resized
+
+def _source_georef(filepath, georefs=None):
+    """
+    Obtém o CRS e o transform de uma imagem de entrada: do próprio arquivo ou, para tiles
+    sem georreferenciamento (JPEG), do CSV gravado no recorte.
+
+    Returns:
+        tuple: (CRS, Affine) ou (None, None) se a imagem não for georreferenciada.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', NotGeoreferencedWarning)
+        with rasterio.open(filepath) as src:
+            if src.crs is not None and not src.transform.is_identity:
+                return src.crs, src.transform
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    if georefs and stem in georefs:
+        crs, transform = georefs[stem]
+        return crs, Affine(*transform)
+    return None, None
+
+def _save_prediction(output_dir, filepath, original_size, probability, threshold, georefs, stage):
+    """
+    Restaura o tamanho original da probabilidade predita e a salva como COG uint8
+    georreferenciado (quando a entrada tiver georreferenciamento).
+    """
+    with stage.time('write'):
+        probability = cv2.resize(probability, (original_size[1], original_size[0]), interpolation=cv2.INTER_LINEAR)
+        crs, transform = _source_georef(filepath, georefs)
+        profile = {'driver': 'GTiff', 'height': original_size[0], 'width': original_size[1], 'count': 1, 'dtype': 'uint8'}
+        if transform is not None:
+            profile.update(crs=crs, transform=transform)
+        output_path = os.path.join(output_dir, f"predicted_{os.path.splitext(os.path.basename(filepath))[0]}.tif")
+        with warnings.catch_warnings(), MemoryFile() as memfile:
+            # Tiles sem georreferenciamento (JPEG/PNG) geram um COG em coordenadas de pixel
+            warnings.simplefilter('ignore', NotGeoreferencedWarning)
+            with memfile.open(**profile) as dataset:
+                dataset.write(quantize_probability(probability), 1)
+                dataset.scales = (1 / 255,)
+                dataset.update_tags(threshold=threshold, output_mode='probability')
+            with memfile.open() as dataset:
+                _write_cog(dataset, output_path, OVERVIEW_RESAMPLING['probability'])
+
+def _predict_batch(predict_fn, batch, writer, output_dir, threshold, georefs, stage):
+    """
+    Prediz um lote e agenda a gravação assíncrona das máscaras.
+
+    Returns:
+        list: Pares (future, caminho) das gravações agendadas.
+    """
+    with stage.time('predict'):
+        probabilities = predict_fn(np.stack([image for _, _, image in batch]))[..., 0]
+    stage.advance(len(batch))
+    return [
+        (writer.submit(_save_prediction, output_dir, filepath, original_size, probability, threshold, georefs, stage),
+         filepath)
+        for (filepath, original_size, _), probability in zip(batch, probabilities)
+    ]
+
+def predict_images(input_path, output_dir, model_path, img_size=256, threshold=0.3, batch_size=16, num_workers=4,
+                   jit_compile=False, mixed_precision=False, georef_path=None):
+    """
+    Realiza a predição em imagens e salva as probabilidades preditas.
+
+    A decodificação, o redimensionamento e a normalização rodam em um pool de threads,
+    as imagens são agrupadas em lotes para um único tf.function compilado e a gravação
+    das predições ocorre em paralelo com a predição do lote seguinte.
+
+    Cada predição é gravada como "predicted_<nome>.tif", um Cloud-Optimized GeoTIFF com
+    a probabilidade quantizada em uint8 (0-255) e o CRS/transform da imagem de entrada,
+    de modo que a binarização e a vetorização não exigem refazer a inferência.
+
+    Args:
+        input_path (str): Caminho ou diretório contendo as imagens de entrada.
+        output_dir (str): Diretório onde as predições serão salvas.
+        model_path (str | list): Caminho do modelo U-Net treinado (.keras, .onnx ou .tflite) ou lista de caminhos (ensemble).
+        img_size (int): Tamanho das imagens de entrada (assume quadradas).
+        threshold (float): Limiar de binarização sugerido, registrado nas tags do arquivo.
+        batch_size (int): Número de imagens por chamada ao modelo.
+        num_workers (int): Número de threads para leitura e gravação.
+        jit_compile (bool): Compilar a inferência com XLA.
+        mixed_precision (bool): Executar a inferência em mixed_bfloat16.
+        georef_path (str): CSV com o georreferenciamento dos tiles gerado no recorte (opcional),
+            usado para entradas sem georreferenciamento próprio (JPEG).
+
+    Returns:
+        int: Número de imagens processadas.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    predict_fn = load_predictor(model_path, img_size, jit_compile, mixed_precision, batch_size)
+    georefs = load_tile_georef(georef_path) if georef_path and os.path.exists(georef_path) else None
 
     # Verificar se o input é um diretório ou arquivo único
     if os.path.isfile(input_path):
@@ -28,70 +340,784 @@ def predict_images(input_path, output_dir, model_path, img_size=256, threshold=0
         image_paths = [os.path.join(input_path, f) for f in os.listdir(input_path)
                        if f.lower().endswith(('.png', '.jpg', '.jpeg', '.tiff', '.tif'))]
 
-    for filepath in image_paths:
-        try:
-            # Carregar e pré-processar a imagem
-            image = cv2.imread(filepath, cv2.IMREAD_COLOR)
-            if image is None:
-                print(f"Erro ao carregar a imagem: {filepath}")
+    processed = 0
+
+    with Stage('predict_images', total=len(image_paths), unit='tiles') as stage, \
+            ThreadPoolExecutor(max_workers=num_workers) as reader, \
+            ThreadPoolExecutor(max_workers=num_workers) as writer:
+        writes = []
+        loaded = _prefetch(reader, lambda path: _load_for_prediction(path, img_size, stage), image_paths, 2 * batch_size)
+
+        batch = []
+        for item in loaded:
+            if item is None:
+                continue
+            batch.append(item)
+            if len(batch) < batch_size:
                 continue
+            writes.extend(_predict_batch(predict_fn, batch, writer, output_dir, threshold, georefs, stage))
+            processed += len(batch)
+            batch = []
+        if batch:
+            writes.extend(_predict_batch(predict_fn, batch, writer, output_dir, threshold, georefs, stage))
+            processed += len(batch)
+
+        for future, filepath in writes:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Erro ao salvar a predição de {filepath}: {e}")
+
+    print(f"{processed} predições salvas em: {output_dir}")
+    return processed
+
+def _blend_weights(tile_size, mode='gaussian'):
+    """
+    Gera a matriz de pesos usada para combinar janelas sobrepostas.
+
+    Args:
+        tile_size (int): Tamanho da janela (altura e largura).
+        mode (str): 'gaussian', 'cosine' ou 'mean'.
+
+    Returns:
+        numpy.ndarray: Pesos float32 de formato (tile_size, tile_size).
+    """
+    if mode == 'mean':
+        return np.ones((tile_size, tile_size), dtype=np.float32)
+
+    coords = np.arange(tile_size, dtype=np.float32) + 0.5
+    if mode == 'gaussian':
+        sigma = tile_size / 4.0
+        weights_1d = np.exp(-0.5 * ((coords - tile_size / 2.0) / sigma) ** 2)
+    elif mode == 'cosine':
+        weights_1d = np.sin(np.pi * coords / tile_size) ** 2
+    else:
+        raise ValueError(f"Modo de blending desconhecido: {mode}")
+
+    # Peso mínimo nas bordas para que pixels cobertos por uma única janela não sejam descartados
+    weights = np.outer(weights_1d, weights_1d)
+    weights = np.maximum(weights / weights.max(), 1e-3)
+    return weights.astype(np.float32)
+
+def _window_offsets(length, tile_size, stride):
+    """
+    Calcula as posições iniciais das janelas ao longo de um eixo, garantindo cobertura até a borda.
+    """
+    if length <= tile_size:
+        return [0]
+    offsets = list(range(0, length - tile_size + 1, stride))
+    if offsets[-1] != length - tile_size:
+        offsets.append(length - tile_size)
+    return offsets
+
+def predict_geotiff_tiled(input_path, output_path, model_path, img_size=256, overlap=64,
+                          blend='gaussian', threshold=0.3, output_mode='probability', batch_size=16,
+                          jit_compile=False, mixed_precision=False, min_valid_fraction=0.0, window=None, cog=True,
+                          block_width=8192):
+    """
+    Realiza a predição de um ortomosaico georreferenciado em janelas deslizantes.
+
+    O raster é lido em janelas de tamanho nativo do modelo via rasterio, as predições
+    sobrepostas são combinadas com pesos nas emendas e o resultado é gravado em faixas
+    com o mesmo CRS e transform da entrada. As colunas são processadas em faixas de até
+    block_width pixels e, em cada uma, apenas img_size linhas ficam em memória por vez,
+    independentemente da largura do raster; as janelas que cruzam o limite entre duas
+    faixas são preditas nas duas. Ao final, o arquivo é convertido em Cloud-Optimized GeoTIFF
+    com overviews internas.
+
+    No modo 'probability' (padrão) a probabilidade é quantizada em uint8 (0-255, escala
+    1/255 registrada na banda), permitindo binarizar com outro limiar
+    (threshold_prediction) ou vetorizar sem refazer a inferência.
+
+    Janelas com fração de pixels válidos (máscara de nodata/alfa do raster) abaixo de
+    min_valid_fraction não passam pelo modelo. Pixels sem dados na entrada ou não cobertos
+    por nenhuma janela predita são gravados como nodata: máscara interna do GeoTIFF nos
+    modos 'probability' e 'binary' e NaN no modo 'float32'.
+
+    Args:
+        input_path (str): Caminho do raster georreferenciado de entrada.
+        output_path (str): Caminho do GeoTIFF de saída.
+        model_path (str | list): Caminho do modelo U-Net treinado (.keras, .onnx ou .tflite) ou lista de caminhos (ensemble).
+        img_size (int): Tamanho das janelas (tamanho de entrada do modelo).
+        overlap (int): Sobreposição em pixels entre janelas vizinhas.
+        blend (str): Pesos usados nas emendas: 'gaussian', 'cosine' ou 'mean'.
+        threshold (float): Limiar para binarizar a máscara (modo 'binary'); nos demais modos
+            fica registrado nas tags do arquivo.
+        output_mode (str): 'probability' grava a probabilidade em uint8 (0-255), 'binary' grava
+            a máscara uint8 (0/255) e 'float32' a probabilidade sem quantização.
+        batch_size (int): Número de janelas por chamada ao modelo.
+        jit_compile (bool): Compilar a inferência com XLA.
+        mixed_precision (bool): Executar a inferência em mixed_bfloat16.
+        min_valid_fraction (float): Fração mínima de pixels válidos para predizer uma janela.
+            Janelas sem nenhum pixel válido são sempre ignoradas.
+        window (rasterio.windows.Window): Região da entrada a predizer (padrão: o raster inteiro).
+            A saída cobre só a região, com o transform correspondente (jobs de src/scheduler.py).
+        cog (bool): Converter a saída em Cloud-Optimized GeoTIFF (False mantém o GeoTIFF em blocos).
+        block_width (int): Largura máxima, em pixels, das faixas de colunas acumuladas em memória.
 
-            original_size = image.shape[:2]  # Guardar o tamanho original (altura, largura)
-            image_resized = cv2.resize(image, (img_size, img_size))
-            image_normalized = image_resized / 255.0
-            image_input = np.expand_dims(image_normalized, axis=0)  # Adicionar dimensão do lote
+    Returns:
+        dict: Número de janelas preditas e ignoradas por falta de dados.
+    """
+    if not 0 <= overlap < img_size:
+        raise ValueError("A sobreposição deve estar entre 0 e img_size - 1.")
+    if output_mode not in OVERVIEW_RESAMPLING:
+        raise ValueError(f"Modo de saída desconhecido: {output_mode}")
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    predict_fn = load_predictor(model_path, img_size, jit_compile, mixed_precision, batch_size)
+    weights = _blend_weights(img_size, blend)
+    stride = img_size - overlap
+
+    with _temporary_geotiff(output_path) as temp_path:
+        tiled_path = temp_path if cog else output_path
+        with rasterio.open(input_path) as src:
+            window = window or Window(0, 0, src.width, src.height)
+            col_off, row_off = int(window.col_off), int(window.row_off)
+            height, width = int(window.height), int(window.width)
+            profile = {
+                'driver': 'GTiff',
+                'height': height,
+                'width': width,
+                'count': 1,
+                'dtype': 'float32' if output_mode == 'float32' else 'uint8',
+                'crs': src.crs,
+                'transform': src.window_transform(window),
+                'tiled': True,
+                'blockxsize': 256,
+                'blockysize': 256,
+                'compress': 'deflate',
+                'BIGTIFF': 'IF_SAFER',
+            }
+            if output_mode == 'float32':
+                profile['nodata'] = np.nan
+
+            x_offsets = _window_offsets(width, img_size, stride)
+            y_offsets = _window_offsets(height, img_size, stride)
+            n_windows, n_skipped = 0, 0
+
+            with rasterio.open(tiled_path, 'w', **profile) as dst, \
+                    Stage('predict_tiled', total=len(x_offsets) * len(y_offsets), unit='janelas') as stage:
+
+                def flush_rows(n_rows):
+                    # Grava as n_rows primeiras linhas do núcleo da faixa, que não receberão mais contribuições
+                    rows = min(n_rows, height - strip_y0)
+                    if rows <= 0:
+                        return
+                    core = slice(band_x0 - acc_x0, band_x1 - acc_x0)
+                    probability = prob_sum[:rows, core] / np.maximum(weight_sum[:rows, core], 1e-6)
+                    valid = valid_sum[:rows, core]
+                    window = Window(band_x0, strip_y0, band_x1 - band_x0, rows)
+                    with stage.time('write'):
+                        if output_mode == 'float32':
+                            dst.write(np.where(valid, probability, np.nan).astype(np.float32), 1, window=window)
+                            return
+                        if output_mode == 'binary':
+                            data = (probability > threshold).astype(np.uint8) * 255
+                        else:
+                            data = quantize_probability(probability)
+                        data[~valid] = 0
+                        dst.write(data, 1, window=window)
+                        dst.write_mask(valid.astype(np.uint8) * 255, window=window)
+
+                # Colunas processadas em faixas de até block_width pixels: cada faixa inclui as
+                # janelas vizinhas que a sobrepõem (preditas de novo), e a combinação é a mesma
+                # da largura inteira
+                for band_x0 in range(0, width, block_width):
+                    band_x1 = min(width, band_x0 + block_width)
+                    band_offsets = [x for x in x_offsets if x < band_x1 and x + img_size > band_x0]
+                    acc_x0 = band_offsets[0]
+                    acc_width = min(width, band_offsets[-1] + img_size) - acc_x0
+
+                    # Acumuladores de uma faixa: memória proporcional a img_size x (block_width + 2 img_size)
+                    prob_sum = np.zeros((img_size, acc_width), dtype=np.float32)
+                    weight_sum = np.zeros((img_size, acc_width), dtype=np.float32)
+                    valid_sum = np.zeros((img_size, acc_width), dtype=bool)
+                    strip_y0 = 0
+
+                    for y in y_offsets:
+                        shift = y - strip_y0
+                        if shift > 0:
+                            flush_rows(shift)
+                            prob_sum[:-shift] = prob_sum[shift:]
+                            weight_sum[:-shift] = weight_sum[shift:]
+                            valid_sum[:-shift] = valid_sum[shift:]
+                            prob_sum[-shift:] = 0
+                            weight_sum[-shift:] = 0
+                            valid_sum[-shift:] = False
+                            strip_y0 = y
+
+                        rows = min(img_size, height - y)
+                        for start in range(0, len(band_offsets), batch_size):
+                            # Janelas sem dados suficientes não passam pelo modelo
+                            batch_x, tiles, masks = [], [], []
+                            batch_offsets = band_offsets[start:start + batch_size]
+                            # Apenas as janelas que começam na faixa entram na contagem
+                            n_owned = sum(band_x0 <= x < band_x1 for x in batch_offsets)
+                            with stage.time('decode'):
+                                for x in batch_offsets:
+                                    valid = read_window_valid(src, col_off + x, row_off + y, img_size)
+                                    if not keep_tile(valid.mean(), min_valid_fraction):
+                                        n_skipped += band_x0 <= x < band_x1
+                                        continue
+                                    tile = read_window_bgr(src, col_off + x, row_off + y, img_size)
+                                    tile[~valid] = 0  # Mesmo preenchimento dos tiles de treino
+                                    batch_x.append(x)
+                                    tiles.append(tile)
+                                    masks.append(valid)
+                            n_windows += n_owned
+                            stage.advance(n_owned)
+                            n_ignored = n_owned - sum(band_x0 <= x < band_x1 for x in batch_x)
+                            if n_ignored:
+                                stage.count('ignoradas', n_ignored)
+                            if not batch_x:
+                                continue
+
+                            with stage.time('predict'):
+                                batch = np.stack(tiles).astype(np.float32) / 255.0
+                                predictions = predict_fn(batch)[..., 0]
+
+                            with stage.time('blend'):
+                                for x, prediction, valid in zip(batch_x, predictions, masks):
+                                    cols = min(img_size, width - x)
+                                    x0 = x - acc_x0
+                                    prob_sum[:rows, x0:x0 + cols] += prediction[:rows, :cols] * weights[:rows, :cols]
+                                    weight_sum[:rows, x0:x0 + cols] += weights[:rows, :cols]
+                                    valid_sum[:rows, x0:x0 + cols] |= valid[:rows, :cols]
+
+                    flush_rows(img_size)
+                dst.update_tags(threshold=threshold, output_mode=output_mode, model=model_label(model_path))
+                if output_mode == 'probability':
+                    dst.scales = (1 / 255,)
+
+        if cog:
+            with rasterio.open(temp_path) as dataset:
+                _write_cog(dataset, output_path, OVERVIEW_RESAMPLING[output_mode])
+
+    print(f"Predição georreferenciada salva em: {output_path}")
+    if n_skipped:
+        print(f"{n_skipped} de {n_windows} janelas ignoradas por falta de dados ({100 * n_skipped / n_windows:.1f}%).")
+    return {'windows': n_windows - n_skipped, 'skipped': n_skipped}
+
+def merge_prediction_parts(input_path, parts, output_path):
+    """
+    Une as predições parciais de um raster (jobs do agendador) em um único Cloud-Optimized GeoTIFF.
+
+    Cada parte cobre uma região da entrada com margem (halo) para dar contexto às janelas
+    da borda; apenas o núcleo da parte é copiado, em janelas, para a saída.
+
+    Args:
+        input_path (str): Raster de entrada predito (define dimensões, CRS e transform).
+        parts (list): Tuplas (caminho da parte, núcleo) com o núcleo como Window em
+            coordenadas da entrada.
+        output_path (str): Caminho do COG de saída.
+    """
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    with _temporary_geotiff(output_path) as temp_path:
+        with rasterio.open(input_path) as src, rasterio.open(parts[0][0]) as first:
+            transform = src.transform
+            profile = dict(first.profile, height=src.height, width=src.width, transform=transform)
+            output_mode = first.tags().get('output_mode', 'probability')
+            tags, scales = first.tags(), first.scales
+
+        with rasterio.open(temp_path, 'w', **profile) as dst:
+            for part_path, core in parts:
+                with rasterio.open(part_path) as part:
+                    # Posição do núcleo dentro da parte, a partir da origem da parte na entrada
+                    col, row = ~transform * (part.transform.c, part.transform.f)
+                    part_window = Window(core.col_off - round(col), core.row_off - round(row), core.width, core.height)
+                    dst.write(part.read(1, window=part_window), 1, window=core)
+                    if output_mode != 'float32':
+                        dst.write_mask(part.read_masks(1, window=part_window), window=core)
+            dst.update_tags(**tags)
+            dst.scales = scales
+
+        with rasterio.open(temp_path) as dataset:
+            _write_cog(dataset, output_path, OVERVIEW_RESAMPLING[output_mode])
+    print(f"Predição georreferenciada salva em: {output_path}")
+
+def threshold_prediction(input_path, output_path, threshold=0.3, window_size=4096):
+    """
+    Binariza uma predição de probabilidade com um novo limiar, sem refazer a inferência.
+
+    A probabilidade (uint8 0-255 ou float32) é lida em janelas e a máscara binária (0/255)
+    é gravada como Cloud-Optimized GeoTIFF, com o mesmo CRS, transform e máscara de nodata.
+
+    Args:
+        input_path (str): GeoTIFF de probabilidade gravado por predict_geotiff_tiled ou predict_images.
+        output_path (str): Caminho do GeoTIFF binário de saída.
+        threshold (float): Limiar de probabilidade (0 a 1).
+        window_size (int): Tamanho das janelas de leitura.
+
+    Returns:
+        str: Caminho do arquivo gravado.
+    """
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    with _temporary_geotiff(output_path) as temp_path:
+        with rasterio.open(input_path) as src:
+            profile = {
+                'driver': 'GTiff', 'height': src.height, 'width': src.width, 'count': 1, 'dtype': 'uint8',
+                'crs': src.crs, 'transform': src.transform, 'tiled': True, 'blockxsize': 256, 'blockysize': 256,
+                'compress': 'deflate', 'BIGTIFF': 'IF_SAFER',
+            }
+            # Limiar na escala armazenada, sem converter cada janela para float
+            cut = threshold * 255 if src.dtypes[0] == 'uint8' else threshold
+            with rasterio.open(temp_path, 'w', **profile) as dst, \
+                    Stage('threshold', total=len(range(0, src.height, window_size)), unit='faixas') as stage:
+                for y in range(0, src.height, window_size):
+                    for x in range(0, src.width, window_size):
+                        window = Window(x, y, min(window_size, src.width - x), min(window_size, src.height - y))
+                        with stage.time('decode'):
+                            data = src.read(1, window=window)
+                            valid = src.read_masks(1, window=window) > 0
+                        with stage.time('write'):
+                            dst.write(((data > cut) & valid).astype(np.uint8) * 255, 1, window=window)
+                            dst.write_mask(valid.astype(np.uint8) * 255, window=window)
+                    stage.advance()
+                dst.update_tags(**{**src.tags(), 'threshold': threshold, 'output_mode': 'binary'})
+
+        with rasterio.open(temp_path) as dataset:
+            _write_cog(dataset, output_path, OVERVIEW_RESAMPLING['binary'])
+
+    print(f"Máscara binária (limiar {threshold}) salva em: {output_path}")
+    return output_path
+
+def _mask_to_polygons(binary_image, transform):
+    """
+    Poligoniza uma máscara binária, preservando furos, com transformação vetorizada das coordenadas.
+
+    Os contornos externos e internos (RETR_CCOMP) de toda a máscara são convertidos em
+    um único array de pontos, transformados por uma única operação afim (centro do pixel)
+    e montados em lote com os construtores vetorizados do shapely 2.
+
+    Args:
+        binary_image (numpy.ndarray): Máscara binária uint8 (0/255).
+        transform (affine.Affine): Transform afim do pixel (0, 0) da máscara.
+
+    Returns:
+        numpy.ndarray: Array de shapely.Polygon.
+    """
+    contours, hierarchy = cv2.findContours(binary_image, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return np.empty(0, dtype=object)
+    hierarchy = hierarchy[0]
+
+    # Ordena os anéis por polígono: contorno externo seguido dos seus furos
+    rings, ring_polygon = [], []
+    n_polygons = 0
+    for i, contour in enumerate(contours):
+        if hierarchy[i][3] != -1 or len(contour) <= 2:
+            continue
+        rings.append(contour)
+        ring_polygon.append(n_polygons)
+        child = hierarchy[i][2]
+        while child != -1:
+            if len(contours[child]) > 2:
+                rings.append(contours[child])
+                ring_polygon.append(n_polygons)
+            child = hierarchy[child][0]
+        n_polygons += 1
+
+    if not rings:
+        return np.empty(0, dtype=object)
+
+    points = np.concatenate([ring.reshape(-1, 2) for ring in rings]).astype(np.float64) + 0.5
+    a, b, c, d, e, f = tuple(transform)[:6]
+    geo_points = np.column_stack((
+        a * points[:, 0] + b * points[:, 1] + c,
+        d * points[:, 0] + e * points[:, 1] + f,
+    ))
+    ring_ids = np.repeat(np.arange(len(rings)), [len(ring) for ring in rings])
+    linear_rings = shapely.linearrings(geo_points, indices=ring_ids)
+    return shapely.polygons(linear_rings, indices=np.asarray(ring_polygon))
+
+def _mask_transform(src, filename, geo_transform, georefs):
+    """
+    Define o transform de um arquivo de máscara.
+
+    Ordem de prioridade: georreferenciamento do próprio arquivo, georreferenciamento
+    do tile registrado no recorte, deslocamento do tile extraído do nome
+    ("<origem>_<x>_<y>") e, por fim, o transform da imagem georreferenciada completa.
+    """
+    if src.crs is not None and not src.transform.is_identity:
+        return src.transform
+
+    stem = os.path.splitext(filename)[0]
+    if stem.startswith('predicted_'):
+        stem = stem[len('predicted_'):]
+    if georefs and stem in georefs:
+        return Affine(*georefs[stem][1])
+
+    _, x, y = parse_tile_name(stem)
+    if x is not None:
+        return geo_transform * Affine.translation(x, y)
+    return geo_transform
+
+def _connected_groups(n_items, pairs):
+    """
+    Agrupa itens conectados por pares de índices (union-find).
+
+    Returns:
+        numpy.ndarray: Rótulo do grupo de cada item.
+    """
+    parent = np.arange(n_items)
 
-            # Fazer a predição
-            prediction = model.predict(image_input, verbose=0)
-            predicted_mask = (prediction[0, :, :, 0] > threshold).astype(np.uint8)
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
 
-            # Redimensionar a máscara para o tamanho original da imagem
-            predicted_mask_resized = cv2.resize(predicted_mask, (original_size[1], original_size[0]), interpolation=cv2.INTER_NEAREST)
+    for i, j in pairs:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+    return np.array([find(i) for i in range(n_items)])
 
-            # Salvar a máscara predita
-            filename = os.path.basename(filepath)
-            output_path = os.path.join(output_dir, f"predicted_{filename}")
-            cv2.imwrite(output_path, predicted_mask_resized * 255)
+def merge_tile_polygons(polygons, tile_ids, tile_boxes, pixel_size, simplify_tolerance=0.0, min_area=0.0):
+    """
+    Une os fragmentos de polígonos separados pelas bordas dos tiles.
+
+    Apenas os polígonos que tocam a borda do próprio tile são candidatos. Um índice
+    espacial STRtree encontra os vizinhos de tiles diferentes a até um pixel e meio
+    de distância (os contornos passam pelo centro dos pixels, deixando um pixel entre
+    tiles vizinhos, ou a diagonal de um pixel nos cantos), e cada grupo conectado é
+    dissolvido localmente, sem um unary_union global. O pixel entre os tiles é
+    preenchido apenas onde os pixels das bordas são vizinhos (ver _gap_fill), sem a
+    ida e volta de buffer positivo/negativo, que deixava lascas.
+
+    Args:
+        polygons (numpy.ndarray): Polígonos gerados por tile.
+        tile_ids (numpy.ndarray): Identificador do tile de cada polígono.
+        tile_boxes (numpy.ndarray): Extensão (centros dos pixels) do tile de cada polígono.
+        pixel_size (float): Tamanho do pixel em unidades do mapa.
+        simplify_tolerance (float): Tolerância de Douglas-Peucker em unidades do mapa (0 desativa).
+        min_area (float): Área mínima dos polígonos mantidos, em unidades do mapa ao quadrado.
+
+    Returns:
+        tuple: (polígonos resultantes, lista com os índices dos fragmentos de origem de cada resultado).
+    """
+    polygons = np.asarray(polygons, dtype=object)
+    tile_ids = np.asarray(tile_ids)
+    members = [np.array([i]) for i in range(len(polygons))]
+
+    if len(polygons):
+        on_edge = shapely.dwithin(polygons, shapely.boundary(tile_boxes), pixel_size * 0.01)
+        edge_idx = np.flatnonzero(on_edge)
+        tree = shapely.STRtree(polygons[edge_idx])
+        query_idx, tree_idx = tree.query(polygons[edge_idx], predicate='dwithin', distance=pixel_size * 1.5)
+        pairs = [(q, t) for q, t in zip(query_idx, tree_idx)
+                 if q < t and tile_ids[edge_idx[q]] != tile_ids[edge_idx[t]]]
 
-            print(f"Predição salva em: {output_path}")
-        except Exception as e:
-            print(f"Erro ao processar {filepath}: {e}")
+        if pairs:
+            groups = _connected_groups(len(edge_idx), pairs)
+            labels, counts = np.unique(groups, return_counts=True)
+            merged, merged_members = [], []
+            keep = np.ones(len(polygons), dtype=bool)
+            for label in labels[counts > 1]:
+                group = edge_idx[groups == label]
+                # Folga mínima: corrige anéis que se tocam em um vértice (pixels ligados na diagonal)
+                # sem separá-los, como faria um buffer(0)
+                fragments = shapely.buffer(polygons[group], pixel_size * 0.01, join_style='mitre')
+                fill = _gap_fill(polygons[group], fragments, tile_ids[group], tile_boxes[group], pixel_size)
+                parts = shapely.get_parts(shapely.union_all(np.concatenate([fragments, fill])))
+                merged.extend(parts)
+                merged_members.extend([group] * len(parts))
+                keep[group] = False
 
-def binary_to_georeferenced_shapefile(input_dir, geo_image_path, output_shapefile, threshold=128):
+            members = [members[i] for i in np.flatnonzero(keep)] + merged_members
+            polygons = np.concatenate([polygons[keep], np.array(merged, dtype=object)])
+
+    return _simplify_and_filter(polygons, members, simplify_tolerance, min_area)
+
+def _gap_fill(polygons, fragments, tile_ids, tile_boxes, pixel_size):
     """
-    Converte imagens binarizadas em shapefiles georreferenciados.
+    Preenchimento do pixel entre tiles vizinhos para um grupo de fragmentos.
+
+    Os trechos do contorno de cada fragmento sobre a borda do seu tile avançam meio
+    pixel (mais uma pequena folga, em quadrado) em direção ao tile vizinho, limitados
+    à faixa entre as extensões dos tiles e aos pontos a até um pixel da borda de um
+    fragmento de outro tile. As metades vindas dos dois lados se sobrepõem apenas
+    quando os pixels das bordas são vizinhos, inclusive na diagonal, reproduzindo a
+    conectividade da máscara inteira.
 
     Args:
-        input_dir (str): Diretório contendo as imagens binarizadas.
-        geo_image_path (str): Caminho para a imagem original georreferenciada.
-        output_shapefile (str): Caminho para salvar o shapefile gerado.
-        threshold (int): Limiar para considerar pixels como vegetação.
-    """
-    with rasterio.open(geo_image_path) as src:
-        transform = src.transform
-        crs = src.crs
-
-    polygons = []
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.tiff', '.tif')):
+        polygons (numpy.ndarray): Fragmentos originais do grupo.
+        fragments (numpy.ndarray): Os mesmos fragmentos corrigidos (válidos).
+        tile_ids (numpy.ndarray): Identificador do tile de cada fragmento.
+        tile_boxes (numpy.ndarray): Extensão (centros dos pixels) do tile de cada fragmento.
+        pixel_size (float): Tamanho do pixel em unidades do mapa.
+
+    Returns:
+        numpy.ndarray: Polígonos de preenchimento, cada um sobreposto ao fragmento de origem.
+    """
+    margin = pixel_size * 0.01
+    unique_ids, first = np.unique(tile_ids, return_index=True)
+    boxes = tile_boxes[first]
+    reach = shapely.buffer(boxes, pixel_size + margin, join_style='mitre')
+    gap = shapely.union_all([shapely.intersection(reach[i], reach[j])
+                             for i in range(len(boxes)) for j in range(i + 1, len(boxes))])
+    gap = shapely.intersection(gap, shapely.buffer(shapely.envelope(shapely.union_all(boxes)), margin,
+                                                   join_style='mitre'))
+
+    seams = shapely.intersection(shapely.boundary(polygons),
+                                 shapely.buffer(shapely.boundary(tile_boxes), margin, join_style='mitre'))
+    half = shapely.buffer(seams, pixel_size * 0.5 + margin, cap_style='square', join_style='mitre')
+    near = shapely.buffer(seams, pixel_size + margin, cap_style='square', join_style='mitre')
+    fill = []
+    for tile_id in unique_ids:
+        own = tile_ids == tile_id
+        region = shapely.intersection(shapely.intersection(shapely.union_all(half[own]), gap),
+                                      shapely.union_all(near[~own]))
+        parts = shapely.get_parts(region)
+        overlap = shapely.area(shapely.intersection(parts, shapely.union_all(fragments[own])))
+        fill.extend(parts[overlap > 0])
+    return np.array(fill, dtype=object)
+
+def _simplify_and_filter(polygons, members, simplify_tolerance=0.0, min_area=0.0):
+    """
+    Simplifica os polígonos (Douglas-Peucker) e remove os menores que a área mínima.
+
+    Returns:
+        tuple: (polígonos, fragmentos de origem) filtrados.
+    """
+    if simplify_tolerance > 0:
+        polygons = shapely.simplify(polygons, simplify_tolerance, preserve_topology=True)
+    if min_area > 0:
+        large = shapely.area(polygons) >= min_area
+        polygons = polygons[large]
+        members = [group for group, keep in zip(members, large) if keep]
+    return polygons, members
+
+def _polygon_means(polygons, values, transform):
+    """
+    Calcula o valor médio do raster (probabilidade predita) dentro de cada polígono.
+
+    Os polígonos são rasterizados uma única vez como rótulos e as médias saem de
+    um np.bincount vetorizado. Polígonos sem nenhum pixel recebem NaN.
+    """
+    if not len(polygons):
+        return np.empty(0, dtype=np.float64)
+    labels = rasterize(zip(polygons, range(1, len(polygons) + 1)), out_shape=values.shape,
+                       transform=transform, fill=0, dtype='int32')
+    sums = np.bincount(labels.ravel(), weights=values.ravel(), minlength=len(polygons) + 1)[1:]
+    counts = np.bincount(labels.ravel(), minlength=len(polygons) + 1)[1:]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+def _weighted_mean(values, weights):
+    """
+    Média ponderada ignorando valores NaN (NaN se nenhum valor for válido).
+    """
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.nan
+    return np.average(values[finite], weights=np.maximum(weights[finite], 1e-12))
+
+def _remove_vector_output(output_path):
+    """
+    Remove uma saída vetorial existente (incluindo arquivos auxiliares do shapefile
+    e o diretório de partes do GeoParquet).
+    """
+    base, ext = os.path.splitext(output_path)
+    if ext.lower() == '.parquet' and os.path.isdir(output_path):
+        shutil.rmtree(output_path)
+    elif ext.lower() == '.shp':
+        for sidecar in ('.shp', '.shx', '.dbf', '.prj', '.cpg'):
+            if os.path.exists(base + sidecar):
+                os.remove(base + sidecar)
+    elif os.path.exists(output_path):
+        os.remove(output_path)
+
+def _write_feature_chunk(gdf, output_path, chunk_index):
+    """
+    Grava um bloco de feições no arquivo vetorial, criando-o no primeiro bloco e
+    acrescentando nos seguintes. O formato é definido pela extensão:
+    .shp (Shapefile), .gpkg (GeoPackage), .fgb (FlatGeobuf) ou .parquet (GeoParquet,
+    gravado como um diretório com uma parte por bloco).
+    """
+    ext = os.path.splitext(output_path)[1].lower()
+    if ext not in VECTOR_DRIVERS:
+        raise ValueError(f"Formato vetorial não suportado: {ext}")
+
+    if ext == '.parquet':
+        os.makedirs(output_path, exist_ok=True)
+        gdf.to_parquet(os.path.join(output_path, f"part-{chunk_index:05d}.parquet"))
+    else:
+        gdf.to_file(output_path, driver=VECTOR_DRIVERS[ext], engine=VECTOR_ENGINE, append=chunk_index > 0)
+
+def _feature_frame(geometries, prob_mean, tile, crs):
+    """
+    Monta o GeoDataFrame de um bloco de feições com os atributos geométricos.
+    """
+    import geopandas as gpd
+
+    return gpd.GeoDataFrame({
+        'area': shapely.area(geometries),
+        'perimeter': shapely.length(geometries),
+        'prob_mean': prob_mean,
+        'tile': tile.astype(str),
+    }, geometry=geometries, crs=crs)
+
+def binary_to_georeferenced_shapefile(input_dir, geo_image_path, output_shapefile, threshold=128, georef_path=None,
+                                      window_size=4096, merge_tiles=True, simplify_tolerance=0.0, min_area=0.0,
+                                      chunk_size=10000):
+    """
+    Converte imagens binarizadas em arquivos vetoriais georreferenciados.
+
+    Cada máscara é lida em janelas com rasterio e poligonizada de forma vetorizada,
+    preservando furos e usando o deslocamento do tile de origem de cada arquivo.
+    As feições que não tocam a borda do tile são gravadas em blocos de chunk_size
+    feições (memória limitada e resultado parcial legível em caso de interrupção);
+    as que tocam a borda são unidas no final (ver merge_tile_polygons), agrupadas
+    pelo tamanho do pixel de cada arquivo.
+
+    Cada feição recebe os atributos area, perimeter, prob_mean (valor médio da
+    máscara/probabilidade em [0, 1]) e tile (tile de origem).
+
+    Predições georreferenciadas (COG de probabilidade gravado por predict_geotiff_tiled ou
+    predict_images) usam o próprio CRS e transform, sem reabrir a imagem original.
+
+    Args:
+        input_dir (str): Diretório ou arquivo com as imagens binarizadas ou de probabilidade.
+        geo_image_path (str): Imagem original georreferenciada, usada apenas para máscaras sem
+            georreferenciamento próprio (None se todas forem georreferenciadas).
+        output_shapefile (str): Caminho de saída (.shp, .gpkg, .fgb ou .parquet).
+        threshold (int): Limiar (escala 0-255) para considerar pixels como vegetação.
+        georef_path (str): CSV com o georreferenciamento dos tiles gerado no recorte (opcional).
+        window_size (int): Tamanho das janelas de leitura de máscaras grandes.
+        merge_tiles (bool): Unir os polígonos que cruzam as bordas dos tiles.
+        simplify_tolerance (float): Tolerância de simplificação em unidades do mapa (0 desativa).
+        min_area (float): Área mínima dos polígonos mantidos, em unidades do mapa ao quadrado.
+        chunk_size (int): Número de feições acumuladas antes de cada gravação.
+
+    Returns:
+        dict: Número de fragmentos poligonizados ('fragments') e de feições gravadas ('features').
+    """
+    transform, crs = Affine.identity(), None
+    if geo_image_path:
+        with rasterio.open(geo_image_path) as src:
+            transform = src.transform
+            crs = src.crs
+
+    georefs = load_tile_georef(georef_path) if georef_path and os.path.exists(georef_path) else None
+    if crs is None and georefs:
+        crs = next(iter(georefs.values()))[0]
+    output_dir = os.path.dirname(output_shapefile)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    _remove_vector_output(output_shapefile)
+
+    pending = []  # Feições prontas aguardando gravação
+    # Fragmentos na borda dos tiles, com o tamanho do pixel do arquivo de origem
+    edge = {'polygons': [], 'prob': [], 'tile': [], 'tile_id': [], 'pixel_size': [], 'box': []}
+    state = {'chunks': 0, 'features': 0, 'fragments': 0}
+    if os.path.isfile(input_dir):
+        input_dir, filenames = os.path.dirname(input_dir), [os.path.basename(input_dir)]
+    else:
+        filenames = [f for f in sorted(os.listdir(input_dir)) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.tiff', '.tif'))]
+    stage = Stage('vectorize', total=len(filenames), unit='arquivos')
+
+    def flush(force=False):
+        n_pending = sum(len(chunk['geometry']) for chunk in pending)
+        if not n_pending or (n_pending < chunk_size and not force):
+            return
+        with stage.time('write'):
+            chunk = {key: np.concatenate([c[key] for c in pending]) for key in ('geometry', 'prob_mean', 'tile')}
+            _write_feature_chunk(_feature_frame(chunk['geometry'], chunk['prob_mean'], chunk['tile'], crs),
+                                 output_shapefile, state['chunks'])
+        state['chunks'] += 1
+        state['features'] += n_pending
+        pending.clear()
+
+    with stage:
+        for filename in filenames:
             filepath = os.path.join(input_dir, filename)
-            binary_image = cv2.imread(filepath, cv2.IMREAD_GRAYSCALE)
-            if binary_image is None:
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore', NotGeoreferencedWarning)
+                    src = rasterio.open(filepath)
+            except rasterio.errors.RasterioIOError:
+                stage.advance()
                 continue
 
-            _, binary_image = cv2.threshold(binary_image, threshold, 255, cv2.THRESH_BINARY)
-            contours, _ = cv2.findContours(binary_image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-            for contour in contours:
-                coords = [(point[0][0], point[0][1]) for point in contour]
-                if len(coords) > 2:
-                    geo_coords = [
-                        rasterio.transform.xy(transform, y, x, offset='center')
-                        for x, y in coords
-                    ]
-                    polygons.append(Polygon(geo_coords))
-
-    if polygons:
-        gdf = gpd.GeoDataFrame({"geometry": polygons}, crs=crs)
-        gdf.to_file(output_shapefile)
-        print(f"Shapefile salvo em: {output_shapefile}")
+            with src:
+                stem = os.path.splitext(filename)[0]
+                if crs is None:
+                    crs = src.crs
+                mask_transform = _mask_transform(src, filename, transform, georefs)
+                pixel_size = max(abs(mask_transform.a), abs(mask_transform.e))
+                single_window = src.width <= window_size and src.height <= window_size
+                for y in range(0, src.height, window_size):
+                    for x in range(0, src.width, window_size):
+                        window = Window(x, y, min(window_size, src.width - x), min(window_size, src.height - y))
+                        with stage.time('decode'):
+                            data = src.read(1, window=window)
+                            values = data / 255.0 if data.dtype == np.uint8 else data.astype(np.float64)
+                            binary_image = (values > threshold / 255.0).astype(np.uint8) * 255
+                        window_transform = mask_transform * Affine.translation(x, y)
+                        with stage.time('polygonize'):
+                            polygons = _mask_to_polygons(binary_image, window_transform)
+                        if not len(polygons):
+                            continue
+                        state['fragments'] += len(polygons)
+                        with stage.time('polygonize'):
+                            prob = _polygon_means(polygons, values, window_transform)
+                        tile = np.full(len(polygons), stem if single_window else f"{stem}_w{x}_{y}", dtype=object)
+
+                        # Extensão dos centros dos pixels da janela, usada para detectar polígonos na borda
+                        x0, y0 = window_transform * (0.5, 0.5)
+                        x1, y1 = window_transform * (window.width - 0.5, window.height - 0.5)
+                        box = shapely.box(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+                        on_edge = (shapely.dwithin(polygons, shapely.boundary(box), pixel_size * 0.01)
+                                   if merge_tiles else np.zeros(len(polygons), dtype=bool))
+
+                        if on_edge.any():
+                            edge['polygons'].append(polygons[on_edge])
+                            edge['prob'].append(prob[on_edge])
+                            edge['tile'].append(tile[on_edge])
+                            edge['tile_id'].append(np.full(on_edge.sum(), len(edge['box'])))
+                            edge['pixel_size'].append(np.full(on_edge.sum(), pixel_size))
+                            edge['box'].append(box)
+
+                        interior = ~on_edge
+                        kept, members = _simplify_and_filter(polygons[interior], [[i] for i in range(interior.sum())],
+                                                             simplify_tolerance, min_area)
+                        kept_idx = np.array([group[0] for group in members], dtype=int)
+                        pending.append({'geometry': kept, 'prob_mean': prob[interior][kept_idx], 'tile': tile[interior][kept_idx]})
+                        flush()
+            stage.advance()
+
+        # Une os fragmentos que tocam as bordas dos tiles, separados pelo tamanho do pixel de cada arquivo
+        if edge['polygons']:
+            polygons = np.concatenate(edge['polygons'])
+            prob = np.concatenate(edge['prob'])
+            tile = np.concatenate(edge['tile'])
+            tile_ids = np.concatenate(edge['tile_id'])
+            pixel_sizes = np.concatenate(edge['pixel_size'])
+            boxes = np.array(edge['box'], dtype=object)[tile_ids]
+            areas = shapely.area(polygons)
+            for pixel_size in np.unique(pixel_sizes):
+                idx = np.flatnonzero(pixel_sizes == pixel_size)
+                with stage.time('merge'):
+                    merged, members = merge_tile_polygons(polygons[idx], tile_ids[idx], boxes[idx], pixel_size,
+                                                          simplify_tolerance=simplify_tolerance, min_area=min_area)
+                    members = [idx[group] for group in members]
+                    merged_prob = np.array([_weighted_mean(prob[group], areas[group]) for group in members])
+                    merged_tile = np.array([tile[group[np.argmax(areas[group])]] for group in members], dtype=object)
+                pending.append({'geometry': merged, 'prob_mean': merged_prob, 'tile': merged_tile})
+                flush()
+        flush(force=True)
+
+    print(f"Polígonos: {state['fragments']} fragmentos -> {state['features']} feições")
+    if state['features']:
+        print(f"Arquivo vetorial salvo em: {output_shapefile}")
+    return {'fragments': state['fragments'], 'features': state['features']}
@@ -3,6 +3,15 @@ import cv2
 import numpy as np
 import random
 import shutil  # Certifique-se de que esta linha está presente
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+import rasterio
+from rasterio.windows import Window
+from src.manifest import AUGMENTATIONS, base_tile_stem, build_tile_index, load_tile_manifest, save_tile_manifest, save_tile_georef
+from src.manifest import file_fingerprint, tiling_key, load_tile_cache, save_tile_cache
+from src.instrumentation import Stage, Timers
 
 def create_directory(directory):
     """
@@ -14,88 +23,749 @@ def create_directory(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def split_images(image_dir, output_dir, tile_size):
+def _write_tile(path, tile):
     """
-    Recorta imagens em tiles de tamanho especificado.
+    Codifica um tile conforme a extensão do arquivo e grava em disco.
+
+    Returns:
+        int: Número de bytes gravados.
+    """
+    ok, buffer = cv2.imencode(os.path.splitext(path)[1], tile)
+    if not ok:
+        raise IOError(f"Falha ao codificar o tile: {path}")
+    with open(path, 'wb') as f:
+        f.write(buffer.tobytes())
+    return buffer.size
+
+def read_window_bgr(src, x, y, tile_size, width=None):
+    """
+    Lê uma janela de um raster aberto com rasterio como imagem BGR uint8
+    (mesma ordem de canais do cv2). Regiões fora do raster são preenchidas com zeros.
 
     Args:
-        image_dir (str): Diretório com as imagens originais.
-        output_dir (str): Diretório de saída para os tiles.
+        src (rasterio.DatasetReader): Raster aberto.
+        x (int): Coluna inicial da janela.
+        y (int): Linha inicial da janela.
+        tile_size (int): Tamanho da janela (altura e largura).
+        width (int): Largura da janela, se diferente da altura (ex.: uma faixa de tiles).
+
+    Returns:
+        numpy.ndarray: Tile de formato (tile_size, width or tile_size, 3).
+    """
+    window = Window(x, y, width or tile_size, tile_size)
+    bands = [3, 2, 1] if src.count >= 3 else [1, 1, 1]
+    tile = src.read(bands, window=window, boundless=True, fill_value=0)
+    if tile.dtype == np.uint16:
+        tile = tile >> 8
+    return np.ascontiguousarray(np.transpose(tile, (1, 2, 0)).astype(np.uint8, copy=False))
+
+def read_window_valid(src, x, y, tile_size, width=None):
+    """
+    Lê a máscara de pixels válidos de uma janela (nodata, banda alfa ou máscara interna do raster).
+    Regiões fora do raster são inválidas.
+
+    Args:
+        src (rasterio.DatasetReader): Raster aberto.
+        x (int): Coluna inicial da janela.
+        y (int): Linha inicial da janela.
+        tile_size (int): Tamanho da janela (altura e largura).
+        width (int): Largura da janela, se diferente da altura.
+
+    Returns:
+        numpy.ndarray: Máscara booleana de formato (tile_size, width or tile_size).
+    """
+    return src.dataset_mask(window=Window(x, y, width or tile_size, tile_size), boundless=True) > 0
+
+def keep_tile(valid_fraction, min_valid_fraction):
+    """
+    Indica se um tile deve ser mantido: é preciso ter algum pixel válido e
+    pelo menos min_valid_fraction da área válida.
+
+    Args:
+        valid_fraction (float): Fração de pixels válidos do tile.
+        min_valid_fraction (float): Fração mínima exigida.
+
+    Returns:
+        bool: True se o tile deve ser mantido.
+    """
+    return valid_fraction > 0 and valid_fraction >= min_valid_fraction
+
+def _read_image_cv2(image_path):
+    """
+    Decodifica uma imagem com cv2 como BGR uint8, preservando a banda alfa (PNG/TIFF)
+    como máscara de pixels válidos.
+
+    Returns:
+        tuple: (imagem BGR, máscara booleana de pixels válidos ou None se não houver alfa),
+        ou None se a imagem não puder ser lida.
+    """
+    if not image_path.lower().endswith(('.png', '.tif', '.tiff')):
+        image = cv2.imread(image_path)
+        return None if image is None else (image, None)
+
+    image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return None
+    if image.dtype == np.uint16:
+        image = (image >> 8).astype(np.uint8)
+    if image.dtype != np.uint8 or (image.ndim == 3 and image.shape[2] not in (3, 4)):
+        image = cv2.imread(image_path)  # Formatos incomuns: conversão padrão do cv2
+        return None if image is None else (image, None)
+
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR), None
+    if image.shape[2] == 4:
+        valid = image[:, :, 3] > 0
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+        image[~valid] = 0
+        return image, valid
+    return image, None
+
+def tile_view(array, tile_size):
+    """
+    Divide uma imagem em uma grade de tiles sem copiar os dados (view com strides).
+    Apenas os tiles completos entram na grade.
+
+    Args:
+        array (numpy.ndarray): Imagem (H, W) ou (H, W, C).
+        tile_size (int): Tamanho dos tiles.
+
+    Returns:
+        numpy.ndarray: View somente leitura de formato (H // tile_size, W // tile_size, tile_size, tile_size[, C]).
+    """
+    rows, cols = array.shape[0] // tile_size, array.shape[1] // tile_size
+    row_stride, col_stride = array.strides[:2]
+    return np.lib.stride_tricks.as_strided(
+        array,
+        shape=(rows, cols, tile_size, tile_size) + array.shape[2:],
+        strides=(row_stride * tile_size, col_stride * tile_size, row_stride, col_stride) + array.strides[2:],
+        writeable=False)
+
+def _iter_tiles_cv2(image_path, tile_size, binarize_threshold=None, n_buffers=1):
+    """
+    Decodifica a imagem inteira com cv2 e gera os tiles (x, y, tile, máscara, transform, fração válida).
+
+    A máscara binária é calculada uma única vez para a imagem inteira e os tiles são
+    views da imagem e da máscara, sem cópia. Os tiles de borda são preenchidos com
+    zeros em um conjunto fixo de n_buffers buffers reutilizados em rodízio: quem
+    consome o iterador não deve manter mais de n_buffers tiles de borda pendentes.
+
+    O transform é None, pois o cv2 não preserva o georreferenciamento. A fração válida
+    considera a banda alfa (se houver) e o preenchimento das bordas. A máscara é None
+    se binarize_threshold for None.
+    """
+    decoded = _read_image_cv2(image_path)
+    if decoded is None:
+        return
+    image, valid = decoded
+    masks = _binary_mask(image, binarize_threshold) if binarize_threshold is not None else None
+
+    h, w, _ = image.shape
+    image_tiles = tile_view(image, tile_size)
+    mask_tiles = tile_view(masks, tile_size) if masks is not None else None
+    full_rows, full_cols = image_tiles.shape[:2]
+    image_buffers = [np.zeros((tile_size, tile_size, 3), dtype=np.uint8) for _ in range(n_buffers)]
+    mask_buffers = [np.zeros((tile_size, tile_size), dtype=np.uint8) for _ in range(n_buffers)] if masks is not None else None
+    n_padded = 0
+
+    for y in range(0, h, tile_size):
+        for x in range(0, w, tile_size):
+            row, col = y // tile_size, x // tile_size
+            if valid is None:
+                valid_fraction = min(tile_size, h - y) * min(tile_size, w - x) / (tile_size * tile_size)
+            else:
+                valid_fraction = np.count_nonzero(valid[y:y+tile_size, x:x+tile_size]) / (tile_size * tile_size)
+
+            if row < full_rows and col < full_cols:
+                tile = image_tiles[row, col]
+                mask_tile = mask_tiles[row, col] if masks is not None else None
+            else:
+                # Tile de borda: copia a parte existente em um buffer reutilizado, preenchido com zeros (preto)
+                rows, cols = min(tile_size, h - y), min(tile_size, w - x)
+                tile = image_buffers[n_padded % n_buffers]
+                tile.fill(0)
+                tile[:rows, :cols] = image[y:y+rows, x:x+cols]
+                mask_tile = None
+                if masks is not None:
+                    mask_tile = mask_buffers[n_padded % n_buffers]
+                    mask_tile.fill(0)
+                    mask_tile[:rows, :cols] = masks[y:y+rows, x:x+cols]
+                n_padded += 1
+
+            yield x, y, tile, mask_tile, None, valid_fraction
+
+def _iter_tiles_rasterio(image_path, tile_size, binarize_threshold=None, n_buffers=1, block_tiles=16):
+    """
+    Lê a imagem em blocos com rasterio e gera os tiles (x, y, tile, máscara, transform, fração válida).
+
+    Cada bloco tem a altura de um tile e a largura de até block_tiles tiles (a leitura
+    fora do raster preenche as bordas com zeros), de modo que a memória depende apenas
+    de tile_size e block_tiles, e não da largura do raster. A máscara binária é calculada
+    uma vez por bloco e os tiles são views do bloco, sem cópia. Pixels sem dados (nodata,
+    alfa ou fora do raster) são zerados. n_buffers é aceito por compatibilidade com
+    _iter_tiles_cv2; as views permanecem válidas enquanto forem referenciadas.
+    """
+    with rasterio.open(image_path) as src:
+        block_h, _ = src.block_shapes[0]
+        if tile_size % block_h:
+            print(f"Aviso: tiles de {tile_size} px não alinhados aos blocos de {block_h} linhas de {os.path.basename(image_path)}")
+        n_cols = -(-src.width // tile_size)
+
+        for y in range(0, src.height, tile_size):
+            for first_col in range(0, n_cols, block_tiles):
+                block_cols = min(block_tiles, n_cols - first_col)
+                x0, block_width = first_col * tile_size, block_cols * tile_size
+                block = read_window_bgr(src, x0, y, tile_size, block_width)
+                valid = read_window_valid(src, x0, y, tile_size, block_width)
+                block[~valid] = 0
+                valid_fractions = valid.reshape(tile_size, block_cols, tile_size).mean(axis=(0, 2))
+                image_tiles = tile_view(block, tile_size)[0]
+                mask_tiles = None
+                if binarize_threshold is not None:
+                    mask_tiles = tile_view(_binary_mask(block, binarize_threshold), tile_size)[0]
+
+                for col in range(block_cols):
+                    x = x0 + col * tile_size
+                    mask_tile = mask_tiles[col] if mask_tiles is not None else None
+                    yield (x, y, image_tiles[col], mask_tile, src.window_transform(Window(x, y, tile_size, tile_size)),
+                           valid_fractions[col])
+
+def _open_tiles(image_path, tile_size, backend='cv2', binarize_threshold=None, n_buffers=1):
+    """
+    Prepara a leitura dos tiles de uma imagem com o backend escolhido.
+
+    Args:
+        image_path (str): Caminho da imagem.
+        tile_size (int): Tamanho dos tiles.
+        backend (str): 'cv2' ou 'rasterio'.
+        binarize_threshold (int): Limiar das máscaras binárias (None para não gerar máscaras).
+        n_buffers (int): Buffers reutilizados para os tiles de borda (ver _iter_tiles_cv2).
+
+    Returns:
+        tuple: (iterador de (x, y, tile, máscara, transform, fração válida), CRS em texto)
+        ou None se a imagem não puder ser aberta.
+    """
+    if backend == 'rasterio':
+        try:
+            with rasterio.open(image_path) as src:
+                crs = src.crs.to_string() if src.crs else ''
+        except rasterio.errors.RasterioIOError:
+            return None
+        return _iter_tiles_rasterio(image_path, tile_size, binarize_threshold, n_buffers), crs
+    if backend == 'cv2':
+        return _iter_tiles_cv2(image_path, tile_size, binarize_threshold, n_buffers), ''
+    raise ValueError(f"Backend de recorte desconhecido: {backend}")
+
+def augment_tile(tile, augmentation):
+    """
+    Aplica uma transformação geométrica a um tile (imagem ou máscara).
+
+    Args:
+        tile (numpy.ndarray): Tile (H, W) ou (H, W, C).
+        augmentation (str): Uma das transformações de AUGMENTATIONS.
+
+    Returns:
+        numpy.ndarray: Tile transformado (contíguo, pronto para codificação).
+    """
+    if augmentation == 'fliph':
+        return np.ascontiguousarray(tile[:, ::-1])
+    if augmentation == 'flipv':
+        return np.ascontiguousarray(tile[::-1])
+    if augmentation in ('rot90', 'rot180', 'rot270'):
+        return np.ascontiguousarray(np.rot90(tile, int(augmentation[3:]) // 90))
+    raise ValueError(f"Aumento de dados desconhecido: {augmentation}")
+
+def _binary_mask(image, binarize_threshold):
+    """
+    Gera a máscara binária (0/255) de uma imagem BGR (inteira, faixa ou tile) a partir
+    do valor médio (tons de cinza).
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, mask = cv2.threshold(gray, binarize_threshold, 255, cv2.THRESH_BINARY)
+    return mask
+
+def _tile_image(image_path, output_image_dir, tile_size, output_mask_dir=None, binarize_threshold=128, io_workers=1, backend='cv2',
+                min_valid_fraction=0.0, augmentations=()):
+    """
+    Recorta uma imagem em tiles (e, opcionalmente, máscaras binárias) e grava os arquivos.
+
+    A codificação JPEG/PNG dos tiles é distribuída em um pool de threads, com um
+    número limitado de tiles pendentes para manter a memória constante.
+
+    Args:
+        image_path (str): Caminho da imagem original.
+        output_image_dir (str): Diretório de saída para os tiles das imagens.
         tile_size (int): Tamanho dos tiles (altura e largura).
+        output_mask_dir (str): Diretório de saída para as máscaras (None para não gerar máscaras).
+        binarize_threshold (int): Valor de limiar para binarização das máscaras.
+        io_workers (int): Número de threads para codificação e gravação.
+        backend (str): 'cv2' decodifica a imagem inteira; 'rasterio' lê blocos de uma linha de tiles
+            e largura limitada (memória independente do tamanho do raster).
+        min_valid_fraction (float): Fração mínima de pixels válidos (fora de nodata/alfa) para manter o tile.
+            Tiles sem nenhum pixel válido são sempre descartados.
+        augmentations (tuple): Transformações de AUGMENTATIONS aplicadas a cada tile mantido, gravadas
+            como amostras extras "<tile>_<transformação>" (sem georreferenciamento).
+
+    Returns:
+        tuple: (número de tiles, incluindo os aumentados, bytes gravados, georreferenciamento dos tiles,
+        tiles descartados, tempos por operação).
+        O georreferenciamento é uma lista de (nome do tile, CRS, transform), vazia no backend 'cv2'.
+        Os tempos (leitura, aumento e gravação) vêm de Timers.as_dict().
     """
-    create_directory(output_dir)
-    for filename in os.listdir(image_dir):
-        if filename.lower().endswith(('.jpg', '.png', '.tif', '.tiff')):
-            filepath = os.path.join(image_dir, filename)
-            image = cv2.imread(filepath)
-            if image is None:
-                print(f"Erro ao carregar a imagem: {filename}")
+    filename = os.path.basename(image_path)
+    name = os.path.splitext(filename)[0]
+    # Buffers de borda suficientes para os tiles ainda pendentes no pool de gravação
+    n_buffers = 4 * io_workers + 2 if io_workers > 1 else 1
+    opened = _open_tiles(image_path, tile_size, backend,
+                         binarize_threshold if output_mask_dir is not None else None, n_buffers)
+    if opened is None:
+        print(f"Erro ao carregar a imagem: {filename}")
+        return 0, 0, [], 0, {}
+    tiles, crs = opened
+
+    n_tiles, n_skipped, n_bytes, georefs = 0, 0, 0, []
+    timers = Timers()
+    executor = ThreadPoolExecutor(max_workers=io_workers) if io_workers > 1 else None
+    pending = deque()
+
+    def timed_write(path, tile):
+        with timers.time('write'):
+            return _write_tile(path, tile)
+
+    def write(path, tile):
+        nonlocal n_bytes
+        if executor is None:
+            n_bytes += timed_write(path, tile)
+            return
+        pending.append(executor.submit(timed_write, path, tile))
+        while len(pending) > 4 * io_workers:
+            n_bytes += pending.popleft().result()
+
+    try:
+        # O tempo de leitura inclui a decodificação e a geração das máscaras
+        for x, y, image_tile, mask_tile, transform, valid_fraction in timers.iterate(tiles, 'decode'):
+            if not keep_tile(valid_fraction, min_valid_fraction):
+                n_skipped += 1
                 continue
+            tile_name = f"{name}_{x}_{y}"
+            write(os.path.join(output_image_dir, f"{tile_name}.jpg"), image_tile)
+
+            if output_mask_dir is not None:
+                write(os.path.join(output_mask_dir, f"{tile_name}.png"), mask_tile)
+
+            if transform is not None:
+                georefs.append((tile_name, crs, tuple(transform)[:6]))
+            n_tiles += 1
+
+            # Amostras aumentadas a partir do tile já em memória, sem reler a imagem
+            for augmentation in augmentations:
+                with timers.time('augment'):
+                    augmented = augment_tile(image_tile, augmentation)
+                    augmented_mask = augment_tile(mask_tile, augmentation) if output_mask_dir is not None else None
+                write(os.path.join(output_image_dir, f"{tile_name}_{augmentation}.jpg"), augmented)
+                if output_mask_dir is not None:
+                    write(os.path.join(output_mask_dir, f"{tile_name}_{augmentation}.png"), augmented_mask)
+                n_tiles += 1
 
-            h, w, _ = image.shape
-            for y in range(0, h, tile_size):
-                for x in range(0, w, tile_size):
-                    tile = image[y:y+tile_size, x:x+tile_size]
-                    if tile.shape[0] < tile_size or tile.shape[1] < tile_size:
-                        # Preencher o tile com zeros (preto)
-                        tile_padded = np.zeros((tile_size, tile_size, 3), dtype=np.uint8)
-                        tile_padded[:tile.shape[0], :tile.shape[1], :] = tile
-                        tile = tile_padded
+        while pending:
+            n_bytes += pending.popleft().result()
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
-                    tile_name = f"{os.path.splitext(filename)[0]}_{x}_{y}.jpg"
-                    cv2.imwrite(os.path.join(output_dir, tile_name), tile)
-    print(f"Imagens recortadas com tiles de {tile_size}x{tile_size}!")
+    if n_tiles == 0 and n_skipped == 0:
+        print(f"Erro ao carregar a imagem: {filename}")
+    return n_tiles, n_bytes, georefs, n_skipped, timers.as_dict()
 
-def split_images_and_generate_masks(image_dir, output_image_dir, output_mask_dir, tile_size, binarize_threshold=128):
+def _remove_source_tiles(sources, output_image_dir, output_mask_dir=None, manifest_path=None):
     """
-    Recorta imagens e gera máscaras binárias automaticamente.
+    Remove os tiles gerados a partir das imagens de origem informadas, tanto nos diretórios
+    de saída do recorte quanto nos diretórios de treino/validação registrados no manifesto.
+
+    Args:
+        sources (set): Nomes (sem extensão) das imagens de origem.
+        output_image_dir (str): Diretório dos tiles de imagem.
+        output_mask_dir (str): Diretório dos tiles de máscara (opcional).
+        manifest_path (str): Manifesto de tiles de split_train_val (opcional).
+
+    Returns:
+        int: Número de tiles removidos.
+    """
+    if not sources:
+        return 0
+
+    removed = 0
+    for entry in build_tile_index(output_image_dir, output_mask_dir).values():
+        if entry['source'] in sources:
+            for path in (entry['image'], entry['mask']):
+                if path:
+                    os.remove(path)
+            removed += 1
+
+    if manifest_path and os.path.exists(manifest_path):
+        manifest = load_tile_manifest(manifest_path)
+        stale = [stem for stem, entry in manifest.items() if entry['source'] in sources]
+        for stem in stale:
+            for path in (manifest[stem]['image'], manifest[stem]['mask']):
+                if path and os.path.exists(path):
+                    os.remove(path)
+            del manifest[stem]
+        if stale:
+            save_tile_manifest(manifest, manifest_path)
+        removed += len(stale)
+    return removed
+
+def _plan_tiling(image_paths, cache, params, output_image_dir, manifest_path=None, hash_workers=4):
+    """
+    Compara as imagens de origem com o cache e decide quais precisam ser recortadas.
+
+    Uma imagem é reaproveitada se a chave (conteúdo + parâmetros) não mudou e seus tiles
+    ainda existem no diretório de saída ou no manifesto de treino/validação.
+
+    Returns:
+        tuple: (caminhos a recortar, entradas reaproveitadas, impressões digitais por nome de arquivo,
+        nomes das origens cujos tiles devem ser removidos).
+    """
+    filenames = [os.path.basename(path) for path in image_paths]
+    with ThreadPoolExecutor(max_workers=hash_workers) as executor:
+        fingerprints = dict(zip(filenames, executor.map(
+            lambda item: file_fingerprint(item[0], cache.get(item[1])), zip(image_paths, filenames))))
+
+    present = {entry['source'] for entry in build_tile_index(output_image_dir).values()}
+    if manifest_path and os.path.exists(manifest_path):
+        present.update(entry['source'] for entry in load_tile_manifest(manifest_path).values())
+
+    to_tile, reused, stale = [], {}, set()
+    for path, filename in zip(image_paths, filenames):
+        name = os.path.splitext(filename)[0]
+        key = tiling_key(fingerprints[filename]['sha256'], **params)
+        entry = cache.get(filename)
+        if entry and entry['key'] == key and name in present:
+            reused[filename] = entry
+            continue
+        if entry:
+            stale.add(name)  # Imagem ou parâmetros alterados: tiles antigos são substituídos
+        to_tile.append(path)
+
+    current = set(filenames)
+    stale.update(os.path.splitext(filename)[0] for filename in cache if filename not in current)
+    return to_tile, reused, fingerprints, stale
+
+def _record_tiling_result(stage, result):
+    """
+    Soma ao progresso do recorte os tiles e os tempos por operação de uma imagem.
+    """
+    tiles, _, _, skipped, timers = result
+    stage.count('tiles', tiles)
+    if skipped:
+        stage.count('descartados', skipped)
+    stage.timers.merge(timers)
+    stage.advance()
+
+def _run_tiling(image_dir, tile_size, output_image_dir, output_mask_dir=None, binarize_threshold=128, workers=1, io_workers=None,
+                backend='cv2', georef_path=None, cache_path=None, manifest_path=None, min_valid_fraction=0.0,
+                augmentations=()):
+    """
+    Executa o recorte de todas as imagens de um diretório, em série ou em um pool de processos.
+
+    Com cache_path, o recorte é incremental: cada imagem é identificada pelo SHA-256 do
+    conteúdo combinado com os parâmetros do recorte, e apenas imagens novas ou alteradas
+    são recortadas. Tiles de imagens removidas ou alteradas são apagados.
 
     Args:
         image_dir (str): Diretório com as imagens originais.
+        tile_size (int): Tamanho dos tiles (altura e largura).
         output_image_dir (str): Diretório de saída para os tiles das imagens.
-        output_mask_dir (str): Diretório de saída para os tiles das máscaras.
+        output_mask_dir (str): Diretório de saída para as máscaras (None para não gerar máscaras).
+        binarize_threshold (int): Valor de limiar para binarização das máscaras.
+        workers (int): Número de processos (1 executa em série no processo atual).
+        io_workers (int): Threads de codificação por imagem (padrão: 1 em série, 4 em paralelo).
+        backend (str): Leitura das imagens: 'cv2' ou 'rasterio' (janelas georreferenciadas).
+        georef_path (str): CSV onde salvar o georreferenciamento de cada tile (backend 'rasterio').
+        cache_path (str): Manifesto JSON do cache de recorte (None recorta todas as imagens).
+        manifest_path (str): Manifesto de tiles de split_train_val, usado para localizar e remover
+            tiles já movidos para treino/validação.
+        min_valid_fraction (float): Fração mínima de pixels válidos para manter um tile.
+        augmentations (tuple): Transformações de AUGMENTATIONS gravadas como amostras extras.
+
+    Returns:
+        dict: Resumo com imagens processadas, tiles gravados, tiles descartados por falta de dados,
+        bytes, tempo decorrido (s), imagens reaproveitadas do cache e tiles removidos.
+    """
+    unknown = set(augmentations) - set(AUGMENTATIONS)
+    if unknown:
+        raise ValueError(f"Aumento de dados desconhecido: {', '.join(sorted(unknown))}")
+
+    start_time = time.perf_counter()
+    image_paths = [os.path.join(image_dir, f) for f in sorted(os.listdir(image_dir))
+                   if f.lower().endswith(('.jpg', '.png', '.tif', '.tiff'))]
+    if io_workers is None:
+        io_workers = 1 if workers <= 1 else 4
+
+    section = 'samples' if output_mask_dir is not None else 'tiles'
+    cache, reused, removed = {}, {}, 0
+    if cache_path:
+        cache = load_tile_cache(cache_path)
+        params = {'tile_size': tile_size, 'backend': backend, 'min_valid_fraction': min_valid_fraction,
+                  'augmentations': sorted(augmentations),
+                  'binarize_threshold': binarize_threshold if output_mask_dir is not None else None}
+        image_paths, reused, fingerprints, stale = _plan_tiling(image_paths, cache.get(section, {}), params,
+                                                                output_image_dir, manifest_path)
+        removed = _remove_source_tiles(stale, output_image_dir, output_mask_dir, manifest_path)
+
+    task = partial(_tile_image, output_image_dir=output_image_dir, tile_size=tile_size,
+                   output_mask_dir=output_mask_dir, binarize_threshold=binarize_threshold,
+                   io_workers=io_workers, backend=backend, min_valid_fraction=min_valid_fraction,
+                   augmentations=tuple(augmentations))
+    results = []
+    with Stage('tiling', total=len(image_paths), unit='imagens') as stage:
+        if workers > 1 and len(image_paths) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(image_paths))) as executor:
+                for result in executor.map(task, image_paths):
+                    _record_tiling_result(stage, result)
+                    results.append(result)
+        else:
+            for path in image_paths:
+                results.append(task(path))
+                _record_tiling_result(stage, results[-1])
+
+    georefs = [tuple(georef) for entry in reused.values() for georef in entry['georefs']]
+    georefs += [georef for _, _, tile_georefs, _, _ in results for georef in tile_georefs]
+    if georef_path and georefs:
+        save_tile_georef(georefs, georef_path)
+
+    if cache_path:
+        entries = dict(reused)
+        for path, (tiles, _, tile_georefs, skipped, _) in zip(image_paths, results):
+            filename = os.path.basename(path)
+            if tiles or skipped:
+                entries[filename] = {**fingerprints[filename], 'key': tiling_key(fingerprints[filename]['sha256'], **params),
+                                     'tiles': tiles, 'georefs': [[stem, crs, list(t)] for stem, crs, t in tile_georefs]}
+        cache[section] = entries
+        save_tile_cache(cache, cache_path)
+
+    return {
+        'images': sum(1 for tiles, _, _, _, _ in results if tiles),
+        'tiles': sum(tiles for tiles, _, _, _, _ in results),
+        'skipped': sum(skipped for _, _, _, skipped, _ in results),
+        'bytes': sum(size for _, size, _, _, _ in results),
+        'elapsed': time.perf_counter() - start_time,
+        'cached': len(reused),
+        'removed': removed,
+    }
+
+def _append_rows(dataset, rows):
+    """
+    Acrescenta linhas ao final de um dataset HDF5 redimensionável.
+    """
+    start = dataset.shape[0]
+    dataset.resize(start + len(rows), axis=0)
+    dataset[start:] = rows
+
+def write_tile_store(image_dir, store_path, tile_size, binarize_threshold=128, backend='cv2', flush_size=256,
+                     min_valid_fraction=0.0):
+    """
+    Recorta imagens e grava tiles e máscaras em um único arquivo HDF5 compacto.
+
+    O arquivo contém os datasets:
+        images (N, tile_size, tile_size, 3) uint8: tiles BGR sem compressão com perdas.
+        masks (N, tile_size, ceil(tile_size / 8)) uint8: máscaras binárias compactadas em bits.
+        coords (N, 2) int32: posição (x, y) do tile na imagem de origem.
+        source (N,) int32: índice da imagem de origem no atributo 'sources'.
+        transforms (N, 6) float64: transform afim de cada tile (NaN no backend 'cv2').
+
+    Args:
+        image_dir (str): Diretório com as imagens originais.
+        store_path (str): Caminho do arquivo HDF5 de saída.
         tile_size (int): Tamanho dos tiles (altura e largura).
-        binarize_threshold (int): Valor de limiar para binarização (simula as máscaras).
+        binarize_threshold (int): Valor de limiar para binarização das máscaras.
+        backend (str): Leitura das imagens: 'cv2' ou 'rasterio'.
+        flush_size (int): Número de tiles acumulados em memória antes de cada gravação.
+        min_valid_fraction (float): Fração mínima de pixels válidos para manter um tile.
+
+    Returns:
+        dict: Resumo com imagens processadas, tiles gravados, tiles descartados por falta de dados,
+        bytes e tempo decorrido (s).
     """
-    create_directory(output_image_dir)
-    create_directory(output_mask_dir)
+    import h5py
 
-    for filename in os.listdir(image_dir):
-        if filename.lower().endswith(('.jpg', '.png', '.tif', '.tiff')):
-            image_path = os.path.join(image_dir, filename)
-            image = cv2.imread(image_path)
+    start_time = time.perf_counter()
+    store_dir = os.path.dirname(store_path)
+    if store_dir:
+        create_directory(store_dir)
 
-            if image is None:
-                print(f"Erro ao carregar a imagem: {filename}")
-                continue
+    image_paths = [os.path.join(image_dir, f) for f in sorted(os.listdir(image_dir))
+                   if f.lower().endswith(('.jpg', '.png', '.tif', '.tiff'))]
+    packed_width = (tile_size + 7) // 8
+    sources = []
+    n_skipped = 0
+
+    with h5py.File(store_path, 'w') as store:
+        images = store.create_dataset('images', shape=(0, tile_size, tile_size, 3), maxshape=(None, tile_size, tile_size, 3),
+                                      dtype='uint8', chunks=(1, tile_size, tile_size, 3))
+        masks = store.create_dataset('masks', shape=(0, tile_size, packed_width), maxshape=(None, tile_size, packed_width),
+                                     dtype='uint8', chunks=(64, tile_size, packed_width))
+        coords = store.create_dataset('coords', shape=(0, 2), maxshape=(None, 2), dtype='int32', chunks=(4096, 2))
+        source = store.create_dataset('source', shape=(0,), maxshape=(None,), dtype='int32', chunks=(4096,))
+        transforms = store.create_dataset('transforms', shape=(0, 6), maxshape=(None, 6), dtype='float64', chunks=(4096, 6))
 
-            h, w, _ = image.shape
+        # Blocos pré-alocados e reutilizados entre gravações
+        block_images = np.empty((flush_size, tile_size, tile_size, 3), dtype=np.uint8)
+        block_masks = np.empty((flush_size, tile_size, tile_size), dtype=np.uint8)
+        block_coords = np.empty((flush_size, 2), dtype=np.int32)
+        block_transforms = np.empty((flush_size, 6), dtype=np.float64)
+        datasets = (images, masks, coords, source, transforms)
 
-            for y in range(0, h, tile_size):
-                for x in range(0, w, tile_size):
-                    # Recorte da imagem
-                    image_tile = image[y:y+tile_size, x:x+tile_size]
+        with Stage('tile_store', total=len(image_paths), unit='imagens') as stage:
+            for image_path in image_paths:
+                opened = _open_tiles(image_path, tile_size, backend, binarize_threshold)
+                if opened is None:
+                    print(f"Erro ao carregar a imagem: {os.path.basename(image_path)}")
+                    stage.advance()
+                    continue
+                tiles, _ = opened
+                source_id = len(sources)
+                n_block, n_read, n_written = 0, 0, 0
 
-                    # Garantir que o tile tenha o tamanho correto
-                    if image_tile.shape[0] < tile_size or image_tile.shape[1] < tile_size:
-                        image_tile_padded = np.zeros((tile_size, tile_size, 3), dtype=np.uint8)
-                        image_tile_padded[:image_tile.shape[0], :image_tile.shape[1], :] = image_tile
-                        image_tile = image_tile_padded
+                for x, y, image_tile, mask_tile, transform, valid_fraction in stage.timers.iterate(tiles, 'decode'):
+                    n_read += 1
+                    if not keep_tile(valid_fraction, min_valid_fraction):
+                        n_skipped += 1
+                        continue
+                    block_images[n_block] = image_tile
+                    block_masks[n_block] = mask_tile
+                    block_coords[n_block] = (x, y)
+                    block_transforms[n_block] = tuple(transform)[:6] if transform is not None else (np.nan,) * 6
+                    n_block += 1
+                    n_written += 1
+                    if n_block == flush_size:
+                        with stage.time('write'):
+                            _flush_tile_store(n_block, source_id, block_images, block_masks, block_coords, block_transforms, datasets)
+                        n_block = 0
+                if n_block:
+                    with stage.time('write'):
+                        _flush_tile_store(n_block, source_id, block_images, block_masks, block_coords, block_transforms, datasets)
 
-                    # Gerar a máscara binária baseada em um canal ou valor médio
-                    gray_tile = cv2.cvtColor(image_tile, cv2.COLOR_BGR2GRAY)
-                    _, mask_tile = cv2.threshold(gray_tile, binarize_threshold, 255, cv2.THRESH_BINARY)
+                if n_written:
+                    sources.append(os.path.basename(image_path))
+                elif not n_read:
+                    print(f"Erro ao carregar a imagem: {os.path.basename(image_path)}")
+                stage.count('tiles', n_written)
+                stage.advance()
 
-                    # Salvar os tiles de imagem e máscara
-                    image_tile_name = f"{os.path.splitext(filename)[0]}_{x}_{y}.jpg"
-                    mask_tile_name = f"{os.path.splitext(filename)[0]}_{x}_{y}.png"
+        store.attrs['sources'] = sources
+        store.attrs['tile_size'] = tile_size
+        store.attrs['binarize_threshold'] = binarize_threshold
+        n_tiles = images.shape[0]
 
-                    cv2.imwrite(os.path.join(output_image_dir, image_tile_name), image_tile)
-                    cv2.imwrite(os.path.join(output_mask_dir, mask_tile_name), mask_tile)
+    summary = {
+        'images': len(sources),
+        'tiles': n_tiles,
+        'skipped': n_skipped,
+        'bytes': os.path.getsize(store_path),
+        'elapsed': time.perf_counter() - start_time,
+    }
+    return summary
 
-    print(f"Imagens e máscaras recortadas com tiles de {tile_size}x{tile_size}!")
+def _flush_tile_store(n_rows, source_id, block_images, block_masks, block_coords, block_transforms, datasets):
+    """
+    Grava no arquivo HDF5 as n_rows primeiras linhas dos blocos acumulados por write_tile_store.
+    """
+    images, masks, coords, source, transforms = datasets
+    _append_rows(images, block_images[:n_rows])
+    _append_rows(masks, np.packbits(block_masks[:n_rows] > 0, axis=-1))
+    _append_rows(coords, block_coords[:n_rows])
+    _append_rows(source, np.full(n_rows, source_id, dtype=np.int32))
+    _append_rows(transforms, block_transforms[:n_rows])
+
+def _print_tiling_summary(summary):
+    """
+    Mostra os tiles descartados por falta de dados e, com o cache, quantas imagens foram
+    reaproveitadas e quantos tiles obsoletos foram removidos.
+    """
+    if summary['skipped']:
+        total = summary['tiles'] + summary['skipped']
+        print(f"{summary['skipped']} de {total} tiles descartados por falta de dados "
+              f"({100 * summary['skipped'] / total:.1f}%).")
+    if summary.get('cached') or summary.get('removed'):
+        print(f"{summary['cached']} imagens sem alterações reaproveitadas do cache, "
+              f"{summary['removed']} tiles obsoletos removidos.")
 
-def split_train_val(source_image_dir, source_mask_dir, train_image_dir, train_mask_dir, val_image_dir, val_mask_dir, train_val_split=0.8):
+def split_images(image_dir, output_dir, tile_size, workers=1, backend='cv2', georef_path=None, cache_path=None,
+                 min_valid_fraction=0.0):
+    """
+    Recorta imagens em tiles de tamanho especificado.
+
+    Args:
+        image_dir (str): Diretório com as imagens originais.
+        output_dir (str): Diretório de saída para os tiles.
+        tile_size (int): Tamanho dos tiles (altura e largura).
+        workers (int): Número de processos usados para recortar imagens em paralelo.
+        backend (str): 'cv2' decodifica cada imagem inteira; 'rasterio' lê janelas com memória constante.
+        georef_path (str): CSV onde salvar o georreferenciamento de cada tile (backend 'rasterio').
+        cache_path (str): Manifesto JSON do cache; se informado, recorta apenas imagens novas ou alteradas.
+        min_valid_fraction (float): Fração mínima de pixels válidos (fora de nodata/alfa) para manter um tile.
+
+    Returns:
+        dict: Resumo com imagens processadas, tiles gravados, tiles descartados, bytes, tempo decorrido (s),
+        imagens reaproveitadas do cache e tiles removidos.
+    """
+    create_directory(output_dir)
+    summary = _run_tiling(image_dir, tile_size, output_dir, workers=workers, backend=backend, georef_path=georef_path,
+                          cache_path=cache_path, min_valid_fraction=min_valid_fraction)
+    print(f"Imagens recortadas com tiles de {tile_size}x{tile_size}! "
+          f"{summary['tiles']} tiles, {summary['bytes'] / 1e6:.1f} MB em {summary['elapsed']:.1f} s")
+    _print_tiling_summary(summary)
+    return summary
+
+def split_images_and_generate_masks(image_dir, output_image_dir, output_mask_dir, tile_size, binarize_threshold=128, workers=1,
+                                    backend='cv2', georef_path=None, store_path=None, cache_path=None, manifest_path=None,
+                                    min_valid_fraction=0.0, augmentations=()):
+    """
+    Recorta imagens e gera máscaras binárias automaticamente.
+
+    Args:
+        image_dir (str): Diretório com as imagens originais.
+        output_image_dir (str): Diretório de saída para os tiles das imagens.
+        output_mask_dir (str): Diretório de saída para os tiles das máscaras.
+        tile_size (int): Tamanho dos tiles (altura e largura).
+        binarize_threshold (int): Valor de limiar para binarização (simula as máscaras).
+        workers (int): Número de processos usados para recortar imagens em paralelo.
+        backend (str): 'cv2' decodifica cada imagem inteira; 'rasterio' lê janelas com memória constante.
+        georef_path (str): CSV onde salvar o georreferenciamento de cada tile (backend 'rasterio').
+        store_path (str): Se informado, grava todos os tiles em um único arquivo HDF5 (ver write_tile_store)
+            em vez de arquivos JPEG/PNG nos diretórios de saída.
+        cache_path (str): Manifesto JSON do cache; se informado, recorta apenas imagens novas ou alteradas
+            (não se aplica ao arquivo HDF5, que é sempre regravado).
+        manifest_path (str): Manifesto de tiles de split_train_val, para remover tiles obsoletos já
+            movidos para treino/validação.
+        min_valid_fraction (float): Fração mínima de pixels válidos (fora de nodata/alfa) para manter um tile.
+        augmentations (tuple): Transformações ('fliph', 'flipv', 'rot90', 'rot180', 'rot270') gravadas como
+            amostras extras no mesmo recorte (apenas para arquivos JPEG/PNG, não no arquivo HDF5).
+
+    Returns:
+        dict: Resumo com imagens processadas, tiles gravados, tiles descartados, bytes, tempo decorrido (s),
+        imagens reaproveitadas do cache e tiles removidos.
+    """
+    if store_path:
+        summary = write_tile_store(image_dir, store_path, tile_size, binarize_threshold, backend=backend,
+                                   min_valid_fraction=min_valid_fraction)
+        print(f"Tiles de {tile_size}x{tile_size} gravados em {store_path}! "
+              f"{summary['tiles']} tiles, {summary['bytes'] / 1e6:.1f} MB em {summary['elapsed']:.1f} s")
+        _print_tiling_summary(summary)
+        return summary
+
+    create_directory(output_image_dir)
+    create_directory(output_mask_dir)
+    summary = _run_tiling(image_dir, tile_size, output_image_dir, output_mask_dir, binarize_threshold, workers=workers,
+                          backend=backend, georef_path=georef_path, cache_path=cache_path, manifest_path=manifest_path,
+                          min_valid_fraction=min_valid_fraction, augmentations=augmentations)
+    print(f"Imagens e máscaras recortadas com tiles de {tile_size}x{tile_size}! "
+          f"{summary['tiles']} tiles, {summary['bytes'] / 1e6:.1f} MB em {summary['elapsed']:.1f} s")
+    _print_tiling_summary(summary)
+    return summary
+
+def split_train_val(source_image_dir, source_mask_dir, train_image_dir, train_mask_dir, val_image_dir, val_mask_dir, train_val_split=0.8, manifest_path=None):
     """
     Divide os dados em conjuntos de treinamento e validação.
 
@@ -107,32 +777,70 @@ def split_train_val(source_image_dir, source_mask_dir, train_image_dir, train_ma
         val_image_dir (str): Diretório para salvar as imagens de validação.
         val_mask_dir (str): Diretório para salvar as máscaras de validação.
         train_val_split (float): Proporção de dados para treino (ex: 0.8 = 80% treino, 20% validação).
+        manifest_path (str): Caminho do manifesto CSV com a divisão resultante (opcional).
     """
     create_directory(train_image_dir)
     create_directory(train_mask_dir)
     create_directory(val_image_dir)
     create_directory(val_mask_dir)
 
-    # Listar arquivos de imagens e máscaras
-    image_files = os.listdir(source_image_dir)
-    mask_files = os.listdir(source_mask_dir)
+    # Parear imagens e máscaras pelo nome sem extensão em uma única passagem
+    index = build_tile_index(source_image_dir, source_mask_dir)
+    paired_files = [entry for _, entry in sorted(index.items()) if entry['mask'] is not None]
+    unpaired = len(index) - len(paired_files)
+    if unpaired:
+        print(f"{unpaired} imagens sem máscara correspondente foram ignoradas.")
 
-    # Garantir correspondência entre imagens e máscaras
-    paired_files = [(img, mask) for img, mask in zip(image_files, mask_files) if img.split('.')[0] == mask.split('.')[0]]
-
-    # Embaralhar e dividir
-    random.shuffle(paired_files)
-    split_index = int(len(paired_files) * train_val_split)
-    train_files = paired_files[:split_index]
-    val_files = paired_files[split_index:]
+    # Embaralhar e dividir, mantendo cada tile e suas versões aumentadas no mesmo conjunto
+    groups = {}
+    for entry in paired_files:
+        groups.setdefault(base_tile_stem(entry['stem']), []).append(entry)
+    groups = list(groups.values())
+    random.shuffle(groups)
+    split_index = int(len(groups) * train_val_split)
+    train_files = [entry for group in groups[:split_index] for entry in group]
+    val_files = [entry for group in groups[split_index:] for entry in group]
 
     # Mover arquivos para os diretórios de treino e validação
-    for img, mask in train_files:
-        shutil.move(os.path.join(source_image_dir, img), os.path.join(train_image_dir, img))
-        shutil.move(os.path.join(source_mask_dir, mask), os.path.join(train_mask_dir, mask))
+    for split, files, image_dir, mask_dir in (('train', train_files, train_image_dir, train_mask_dir),
+                                              ('val', val_files, val_image_dir, val_mask_dir)):
+        for entry in files:
+            image_path = os.path.join(image_dir, os.path.basename(entry['image']))
+            mask_path = os.path.join(mask_dir, os.path.basename(entry['mask']))
+            shutil.move(entry['image'], image_path)
+            shutil.move(entry['mask'], mask_path)
+            entry.update(image=image_path, mask=mask_path, split=split)
 
-    for img, mask in val_files:
-        shutil.move(os.path.join(source_image_dir, img), os.path.join(val_image_dir, img))
-        shutil.move(os.path.join(source_mask_dir, mask), os.path.join(val_mask_dir, mask))
+    if manifest_path:
+        # Preserva as entradas de divisões anteriores que continuam no manifesto
+        manifest = load_tile_manifest(manifest_path) if os.path.exists(manifest_path) else {}
+        manifest.update({entry['stem']: entry for entry in train_files + val_files})
+        save_tile_manifest(manifest, manifest_path)
+        print(f"Manifesto de tiles salvo em: {manifest_path}")
 
     print(f"Dados divididos com sucesso! {len(train_files)} para treino, {len(val_files)} para validação.")
+
+def split_tile_store(store_path, train_val_split=0.8):
+    """
+    Divide os tiles de um arquivo HDF5 em treinamento e validação, gravando o dataset 'split'
+    (0 = treino, 1 = validação) no próprio arquivo.
+
+    Args:
+        store_path (str): Caminho do arquivo gerado por write_tile_store.
+        train_val_split (float): Proporção de dados para treino (ex: 0.8 = 80% treino, 20% validação).
+    """
+    import h5py
+
+    with h5py.File(store_path, 'a') as store:
+        n_tiles = store['images'].shape[0]
+        order = list(range(n_tiles))
+        random.shuffle(order)
+        split_index = int(n_tiles * train_val_split)
+
+        split = np.ones(n_tiles, dtype=np.uint8)
+        split[order[:split_index]] = 0
+        if 'split' in store:
+            del store['split']
+        store.create_dataset('split', data=split)
+
+    print(f"Dados divididos com sucesso! {split_index} para treino, {n_tiles - split_index} para validação.")
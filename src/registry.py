@@ -0,0 +1,179 @@
+import os
+import json
+from datetime import datetime
+
+def load_registry(registry_path):
+    """
+    Carrega o registro de modelos.
+
+    Args:
+        registry_path (str): Caminho do arquivo JSON do registro.
+
+    Returns:
+        dict: Registro com a lista 'models' (vazia se o arquivo não existir).
+    """
+    if not registry_path or not os.path.exists(registry_path):
+        return {'models': []}
+    with open(registry_path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_registry(registry, registry_path):
+    """
+    Salva o registro de modelos de forma atômica (arquivo temporário + os.replace).
+
+    Args:
+        registry (dict): Registro de modelos.
+        registry_path (str): Caminho do arquivo JSON do registro.
+    """
+    registry_dir = os.path.dirname(registry_path)
+    if registry_dir:
+        os.makedirs(registry_dir, exist_ok=True)
+    temp_path = f"{registry_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(registry, f, indent=2)
+    os.replace(temp_path, registry_path)
+
+def model_path(entry, registry_path):
+    """
+    Caminho absoluto do arquivo de um modelo registrado.
+
+    Os caminhos são gravados relativos à pasta do registro, para que a pasta de
+    modelos possa ser movida ou copiada para outra máquina.
+    """
+    if os.path.isabs(entry['path']):
+        return entry['path']
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(registry_path)), entry['path']))
+
+def register_model(registry_path, path, img_size, threshold, metrics=None, tags=(), parent=None, **info):
+    """
+    Registra (ou atualiza) um modelo salvo com suas métricas de validação e parâmetros de inferência.
+
+    Args:
+        registry_path (str): Caminho do arquivo JSON do registro.
+        path (str): Caminho do arquivo do modelo (.keras, .onnx ou .tflite).
+        img_size (int): Tamanho de entrada do modelo.
+        threshold (float): Limiar de binarização recomendado.
+        metrics (dict): Métricas de validação (ex.: {'val_loss': 0.12, 'val_accuracy': 0.93}).
+        tags (tuple): Rótulos livres para seleção (ex.: 'producao', 'soja').
+        parent (str): Nome do modelo de origem (modelos exportados herdam as métricas dele).
+        **info: Informações adicionais gravadas na entrada (ex.: épocas).
+
+    Returns:
+        dict: Entrada registrada.
+    """
+    registry = load_registry(registry_path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    entries = {entry['name']: entry for entry in registry['models']}
+    if parent and parent in entries and metrics is None:
+        metrics = entries[parent]['metrics']
+
+    registry_dir = os.path.dirname(os.path.abspath(registry_path))
+    entry = {
+        'name': name,
+        'path': os.path.relpath(os.path.abspath(path), registry_dir).replace(os.sep, '/'),
+        'format': os.path.splitext(path)[1].lower(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'img_size': int(img_size),
+        'threshold': float(threshold),
+        'metrics': {key: float(value) for key, value in (metrics or {}).items()},
+        'tags': sorted(set(tags)),
+        'parent': parent,
+        **info,
+    }
+    registry['models'] = [e for e in registry['models'] if e['name'] != name] + [entry]
+    save_registry(registry, registry_path)
+    print(f"Modelo registrado: {name}")
+    return entry
+
+def tag_model(registry_path, name, tags, remove=False):
+    """
+    Adiciona ou remove rótulos de um modelo registrado.
+
+    Args:
+        registry_path (str): Caminho do arquivo JSON do registro.
+        name (str): Nome do modelo.
+        tags (list): Rótulos a adicionar ou remover.
+        remove (bool): Remover os rótulos em vez de adicioná-los.
+
+    Returns:
+        dict: Entrada atualizada.
+    """
+    registry = load_registry(registry_path)
+    for entry in registry['models']:
+        if entry['name'] == name:
+            current = set(entry['tags'])
+            entry['tags'] = sorted(current - set(tags) if remove else current | set(tags))
+            save_registry(registry, registry_path)
+            return entry
+    raise ValueError(f"Modelo não registrado: {name}")
+
+def get_model(registry_path, name):
+    """
+    Busca um modelo registrado pelo nome (nome do arquivo sem extensão).
+
+    Returns:
+        dict: Entrada com o caminho absoluto em 'file', ou None se o modelo não estiver
+        registrado ou o arquivo não existir.
+    """
+    for entry in load_registry(registry_path)['models']:
+        if entry['name'] == name:
+            entry = dict(entry, file=model_path(entry, registry_path))
+            return entry if os.path.exists(entry['file']) else None
+    return None
+
+def _metric_key(metric, mode=None):
+    """
+    Chave de ordenação (melhor primeiro): métricas de perda são minimizadas e as demais maximizadas.
+    """
+    minimize = mode == 'min' or (mode is None and 'loss' in metric)
+
+    def key(entry):
+        value = entry['metrics'].get(metric)
+        if value is None:
+            return (1, 0.0)  # Modelos sem a métrica ficam por último
+        return (0, value if minimize else -value)
+
+    return key
+
+def select_models(registry_path, tag=None, metric=None, mode=None, model_format=None, count=1):
+    """
+    Seleciona os melhores modelos registrados por rótulo e métrica de validação.
+
+    Sem métrica, os modelos mais recentes vêm primeiro. Entradas cujo arquivo
+    não existe mais são ignoradas.
+
+    Args:
+        registry_path (str): Caminho do arquivo JSON do registro.
+        tag (str): Rótulo exigido (opcional).
+        metric (str): Métrica de validação usada para escolher os melhores (ex.: 'val_loss').
+        mode (str): 'min' ou 'max' (padrão: 'min' para perdas e 'max' para as demais).
+        model_format (str): Extensão exigida ('.keras', '.onnx' ou '.tflite').
+        count (int): Número de modelos retornados.
+
+    Returns:
+        list: Entradas selecionadas, cada uma com o caminho absoluto em 'file'.
+    """
+    entries = [dict(entry, file=model_path(entry, registry_path)) for entry in load_registry(registry_path)['models']]
+    entries = [entry for entry in entries if os.path.exists(entry['file'])]
+    if tag:
+        entries = [entry for entry in entries if tag in entry['tags']]
+    if model_format:
+        entries = [entry for entry in entries if entry['format'] == model_format]
+    entries.sort(key=lambda entry: entry['created'], reverse=True)
+    if metric:
+        entries.sort(key=_metric_key(metric, mode))  # Ordenação estável: empates ficam com o mais recente
+    return entries[:count]
+
+def print_registry(registry_path):
+    """
+    Mostra os modelos registrados com métricas, tamanho de entrada, limiar e rótulos.
+    """
+    entries = load_registry(registry_path)['models']
+    if not entries:
+        print(f"Nenhum modelo registrado em: {registry_path}")
+        return
+    for entry in sorted(entries, key=lambda e: e['created']):
+        metrics = ', '.join(f"{key} {value:.4f}" for key, value in sorted(entry['metrics'].items()))
+        tags = f" [{', '.join(entry['tags'])}]" if entry['tags'] else ""
+        print(f"{entry['name']}{tags}: {entry['format']}, {entry['img_size']} px, limiar {entry['threshold']}"
+              f"{', ' + metrics if metrics else ''}")
@@ -0,0 +1,100 @@
+import os
+import numpy as np
+
+# Extensões de modelos executados sem o TensorFlow completo
+RUNTIME_EXTENSIONS = ('.onnx', '.tflite')
+
+def is_runtime_model(model_path):
+    """
+    Indica se o modelo é um arquivo exportado (ONNX ou TFLite).
+
+    Args:
+        model_path (str): Caminho do modelo.
+
+    Returns:
+        bool: True para modelos .onnx ou .tflite.
+    """
+    return os.path.splitext(model_path)[1].lower() in RUNTIME_EXTENSIONS
+
+def _onnx_predictor(model_path, num_threads=0):
+    """
+    Cria a função de predição de um modelo ONNX com o onnxruntime (CPU).
+    """
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if num_threads:
+        options.intra_op_num_threads = num_threads
+    session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+
+    def predict_fn(batch):
+        return session.run(None, {input_name: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+
+    return predict_fn
+
+def _tflite_interpreter(model_path, num_threads=0):
+    """
+    Abre um modelo TFLite com o runtime leve disponível (ai_edge_litert ou tflite_runtime),
+    recorrendo ao tf.lite apenas se nenhum estiver instalado.
+    """
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=model_path, num_threads=num_threads or None)
+
+def _tflite_predictor(model_path, num_threads=0):
+    """
+    Cria a função de predição de um modelo TFLite, redimensionando a entrada do
+    interpretador quando o tamanho do lote muda.
+    """
+    interpreter = _tflite_interpreter(model_path, num_threads)
+    interpreter.allocate_tensors()
+    input_detail = interpreter.get_input_details()[0]
+    output_detail = interpreter.get_output_details()[0]
+
+    def quantize(batch):
+        scale, zero_point = input_detail['quantization']
+        if input_detail['dtype'] == np.float32 or not scale:
+            return batch.astype(input_detail['dtype'])
+        return np.clip(np.round(batch / scale + zero_point), -128, 127).astype(input_detail['dtype'])
+
+    def dequantize(output):
+        scale, zero_point = output_detail['quantization']
+        if output_detail['dtype'] == np.float32 or not scale:
+            return output.astype(np.float32)
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def predict_fn(batch):
+        if tuple(input_detail['shape']) != tuple(batch.shape):
+            interpreter.resize_tensor_input(input_detail['index'], batch.shape)
+            interpreter.allocate_tensors()
+            input_detail.update(interpreter.get_input_details()[0])
+        interpreter.set_tensor(input_detail['index'], quantize(np.asarray(batch, dtype=np.float32)))
+        interpreter.invoke()
+        return dequantize(interpreter.get_tensor(output_detail['index']))
+
+    return predict_fn
+
+def load_runtime_predictor(model_path, num_threads=0):
+    """
+    Carrega um modelo exportado (ONNX ou TFLite) sem importar o TensorFlow.
+
+    Args:
+        model_path (str): Caminho do modelo .onnx ou .tflite.
+        num_threads (int): Threads de inferência (0 = padrão do runtime).
+
+    Returns:
+        callable: Função que recebe um lote float32 (N, H, W, 3) em [0, 1] e retorna as probabilidades (N, H, W, 1).
+    """
+    ext = os.path.splitext(model_path)[1].lower()
+    if ext == '.onnx':
+        return _onnx_predictor(model_path, num_threads)
+    if ext == '.tflite':
+        return _tflite_predictor(model_path, num_threads)
+    raise ValueError(f"Formato de modelo não suportado pelo runtime: {ext}")
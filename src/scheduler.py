@@ -0,0 +1,388 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from src.instrumentation import Stage, configure_instrumentation, instrumentation_settings
+
+# Extensões dos rasters incluídos ao varrer um diretório do catálogo
+RASTER_EXTENSIONS = ('.tif', '.tiff')
+
+# Tabelas do arquivo de estado: um registro por raster e um por job (bloco do raster)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rasters (
+    path TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    output TEXT,
+    vector TEXT
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    raster TEXT NOT NULL,
+    core TEXT NOT NULL,
+    region TEXT NOT NULL,
+    part TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    elapsed_s REAL,
+    error TEXT
+);
+"""
+
+class JobState:
+    """
+    Estado persistente de um catálogo em SQLite: rasters, jobs e o andamento de cada um.
+
+    Rasters passam por 'pending' (jobs em andamento), 'merged' (partes unidas) e 'done'
+    (vetorizado); jobs por 'pending', 'failed' e 'done'. Cada conclusão é gravada assim
+    que o job termina, de modo que uma execução interrompida retoma apenas o que falta.
+
+    Args:
+        path (str): Caminho do arquivo SQLite.
+    """
+
+    def __init__(self, path):
+        state_dir = os.path.dirname(path)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.close()
+        return False
+
+    def sync_raster(self, path, key, jobs):
+        """
+        Registra um raster e seus jobs. Se o raster ou os parâmetros da predição mudaram
+        (chave diferente), o estado anterior é descartado e os jobs são recriados.
+
+        Args:
+            path (str): Raster de entrada.
+            key (str): Chave do raster (ver _raster_key).
+            jobs (list): Jobs planejados por plan_jobs.
+
+        Returns:
+            str: Situação do raster após o registro.
+        """
+        row = self.connection.execute("SELECT key, status FROM rasters WHERE path = ?", (path,)).fetchone()
+        if row is not None and row['key'] == key:
+            return row['status']
+        with self.connection:
+            self.connection.execute("DELETE FROM jobs WHERE raster = ?", (path,))
+            self.connection.execute("INSERT OR REPLACE INTO rasters (path, key, status) VALUES (?, ?, 'pending')",
+                                    (path, key))
+            self.connection.executemany(
+                "INSERT INTO jobs (id, raster, core, region, part, status) VALUES (?, ?, ?, ?, ?, 'pending')",
+                [(job['id'], path, json.dumps(job['core']), json.dumps(job['region']), job['part']) for job in jobs])
+        return 'pending'
+
+    def jobs(self, raster):
+        """
+        Returns:
+            list: Jobs do raster (dicts com id, core, region, part, status, attempts, ...).
+        """
+        rows = self.connection.execute("SELECT * FROM jobs WHERE raster = ? ORDER BY rowid", (raster,)).fetchall()
+        return [dict(row, core=json.loads(row['core']), region=json.loads(row['region'])) for row in rows]
+
+    def pending_jobs(self, raster):
+        """
+        Jobs ainda não concluídos; um job concluído cuja parte foi apagada volta a ser executado.
+        """
+        return [job for job in self.jobs(raster) if job['status'] != 'done' or not os.path.exists(job['part'])]
+
+    def finish_job(self, job_id, elapsed_s=None, error=None):
+        """
+        Registra o fim de um job, com sucesso ou com a mensagem de erro.
+        """
+        with self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, elapsed_s = ?, error = ? WHERE id = ?",
+                ('failed' if error else 'done', elapsed_s, error, job_id))
+
+    def raster_status(self, path):
+        row = self.connection.execute("SELECT status FROM rasters WHERE path = ?", (path,)).fetchone()
+        return row['status'] if row is not None else None
+
+    def set_raster_status(self, path, status, output=None, vector=None):
+        with self.connection:
+            self.connection.execute("UPDATE rasters SET status = ?, output = ?, vector = ? WHERE path = ?",
+                                    (status, output, vector, path))
+
+class LocalBackend:
+    """
+    Executa jobs em um pool local de processos.
+
+    Os processos são criados com spawn (o TensorFlow não é seguro após fork) e reaproveitados
+    entre jobs, mantendo o modelo carregado (cache de load_predictor). Outros backends (ex.:
+    vários nós) só precisam aceitar os mesmos argumentos e implementar run(fn, tasks).
+
+    Args:
+        workers (int): Número de processos.
+        initializer (callable): Função executada uma vez em cada processo.
+        initargs (tuple): Argumentos de initializer.
+    """
+
+    def __init__(self, workers=1, initializer=None, initargs=()):
+        self.workers = max(1, workers)
+        self.initializer = initializer
+        self.initargs = initargs
+
+    def run(self, fn, tasks):
+        """
+        Executa fn em cada tarefa, produzindo (tarefa, resultado, erro) à medida que terminam.
+        Um erro em uma tarefa (inclusive a queda de um processo) não interrompe as demais.
+        """
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks)), mp_context=context,
+                                 initializer=self.initializer, initargs=self.initargs) as executor:
+            futures = {executor.submit(fn, task): task for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as error:
+                    yield futures[future], None, error
+
+# Backends disponíveis para run_catalog, pelo nome
+BACKENDS = {'local': LocalBackend}
+
+def list_rasters(inputs):
+    """
+    Lista os rasters de um catálogo.
+
+    Cada raster recebe um nome: o caminho relativo à pasta comum das entradas, sem a
+    extensão (ex.: '2024/fazenda/orto'). Rasters de mesmo nome em subpastas diferentes
+    têm nomes distintos, usados nos jobs, nas partes e nas saídas.
+
+    Args:
+        inputs (list): Diretórios (varridos recursivamente), rasters ou arquivos .txt com
+            um caminho de raster por linha.
+
+    Returns:
+        list: Pares (caminho absoluto, nome) dos rasters, sem repetição.
+    """
+    paths, roots = [], []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, filenames in os.walk(item):
+                paths += [os.path.join(root, f) for f in sorted(filenames) if f.lower().endswith(RASTER_EXTENSIONS)]
+            roots.append(item)
+        elif item.lower().endswith('.txt'):
+            with open(item, encoding='utf-8') as f:
+                listed = [line.strip() for line in f if line.strip()]
+            paths += listed
+            roots += [os.path.dirname(path) for path in listed]
+        else:
+            paths.append(item)
+            roots.append(os.path.dirname(item))
+    paths = list(dict.fromkeys(os.path.abspath(path) for path in paths))
+    if not paths:
+        return []
+
+    try:
+        base = os.path.commonpath([os.path.abspath(root) for root in roots])
+    except ValueError:
+        base = None  # Unidades diferentes (Windows): o nome é o caminho completo sem a unidade
+    names = [os.path.relpath(path, base) if base else os.path.splitdrive(path)[1].lstrip(os.sep) for path in paths]
+    return [(path, os.path.splitext(name)[0]) for path, name in zip(paths, names)]
+
+def plan_jobs(raster_path, parts_dir, block_size, halo, name=None):
+    """
+    Divide um raster em jobs: blocos de block_size pixels (núcleo) lidos com uma margem de
+    halo pixels, para que as janelas na borda do bloco tenham o mesmo contexto da predição
+    do raster inteiro.
+
+    Args:
+        raster_path (str): Raster de entrada.
+        parts_dir (str): Pasta das predições parciais.
+        block_size (int): Lado dos blocos (pixels).
+        halo (int): Margem lida em volta de cada bloco (pixels).
+        name (str): Nome do raster no catálogo (ver list_rasters); padrão: nome do arquivo.
+
+    Returns:
+        list: Jobs com id, núcleo e região ([col, linha, largura, altura]) e caminho da parte.
+    """
+    import rasterio
+
+    with rasterio.open(raster_path) as src:
+        height, width = src.height, src.width
+    name = name or os.path.splitext(os.path.basename(raster_path))[0]
+    job_prefix = name.replace(os.sep, '/')
+    jobs = []
+    for row in range(0, height, block_size):
+        for col in range(0, width, block_size):
+            core = [col, row, min(block_size, width - col), min(block_size, height - row)]
+            x0, y0 = max(0, col - halo), max(0, row - halo)
+            x1, y1 = min(width, col + core[2] + halo), min(height, row + core[3] + halo)
+            jobs.append({
+                'id': f"{job_prefix}_{row}_{col}",
+                'core': core,
+                'region': [x0, y0, x1 - x0, y1 - y0],
+                'part': os.path.join(parts_dir, name, f"{row}_{col}.tif"),
+            })
+    return jobs
+
+def _raster_key(raster_path, params):
+    """
+    Chave de um raster no estado: tamanho e data de modificação do arquivo combinados com os
+    parâmetros que alteram a predição (modelos, tamanho das janelas, blocos, ...).
+    """
+    stat = os.stat(raster_path)
+    payload = json.dumps({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _init_worker(settings, runtime):
+    """
+    Inicializa um processo de trabalho: mesma instrumentação do processo principal, sem barras
+    de progresso, e threads do TensorFlow divididas entre os processos.
+    """
+    configure_instrumentation(**dict(settings, progress=False))
+    if runtime is not None:
+        from src.performance import configure_runtime
+
+        configure_runtime(*runtime)
+
+def _run_job(task):
+    """
+    Prediz a região de um job e grava a parte como GeoTIFF em blocos (sem conversão para COG).
+    """
+    from rasterio.windows import Window
+    from src.predict import predict_geotiff_tiled
+
+    start_time = time.perf_counter()
+    result = predict_geotiff_tiled(task['raster'], task['part'], task['model'], window=Window(*task['region']),
+                                   cog=False, **task['params'])
+    return dict(result, elapsed_s=time.perf_counter() - start_time)
+
+def run_catalog(inputs, output_dir, state_path, model_path, img_size=256, overlap=64, blend='gaussian', threshold=0.3,
+                output_mode='probability', batch_size=16, jit_compile=False, mixed_precision=False,
+                min_valid_fraction=0.0, block_size=4096, workers=1, backend='local', vectorize=True,
+                vector_format='.gpkg', simplify_tolerance=0.0, min_area=0.0, keep_parts=False, runtime=(0, 0, True)):
+    """
+    Prediz e vetoriza um catálogo de rasters em jobs retomáveis.
+
+    Cada raster é dividido em blocos (jobs) executados pelo backend escolhido; o andamento
+    fica no arquivo de estado SQLite, e uma nova execução com os mesmos parâmetros retoma
+    apenas os jobs pendentes ou com falha. Somente quando todos os jobs de um raster
+    terminam, as partes são unidas em predicted_<raster>.tif (COG) e vetorizadas em
+    <raster><vector_format>, na pasta de saída com as mesmas subpastas das entradas.
+
+    Args:
+        inputs (list): Diretórios, rasters ou listas .txt (ver list_rasters).
+        output_dir (str): Pasta das predições e arquivos vetoriais.
+        state_path (str): Arquivo SQLite com o estado dos jobs.
+        model_path (str | list): Caminho do modelo ou lista de caminhos (ensemble).
+        img_size (int): Tamanho das janelas (entrada do modelo).
+        overlap (int): Sobreposição em pixels entre janelas vizinhas.
+        blend (str): Pesos nas emendas: 'gaussian', 'cosine' ou 'mean'.
+        threshold (float): Limiar de probabilidade (modo 'binary' e vetorização).
+        output_mode (str): 'probability', 'binary' ou 'float32' (ver predict_geotiff_tiled).
+        batch_size (int): Janelas por chamada ao modelo.
+        jit_compile (bool): Compilar a inferência com XLA.
+        mixed_precision (bool): Executar a inferência em mixed_bfloat16.
+        min_valid_fraction (float): Fração mínima de pixels válidos para predizer uma janela.
+        block_size (int): Lado dos blocos de cada job (pixels).
+        workers (int): Processos (ou trabalhadores do backend) executando jobs em paralelo.
+        backend (str): Nome do backend em BACKENDS.
+        vectorize (bool): Gerar o arquivo vetorial de cada raster concluído.
+        vector_format (str): Extensão do arquivo vetorial (.shp, .gpkg, .fgb ou .parquet).
+        simplify_tolerance (float): Tolerância de simplificação das geometrias.
+        min_area (float): Área mínima das feições.
+        keep_parts (bool): Manter as predições parciais após a união.
+        runtime (tuple): (threads por operação, operações em paralelo, oneDNN) do TensorFlow em
+            cada processo; 0 threads por operação divide os núcleos entre os processos.
+
+    Returns:
+        dict: Número de rasters, rasters concluídos, jobs executados e jobs com falha.
+    """
+    from rasterio.windows import Window
+    from src.predict import binary_to_georeferenced_shapefile, merge_prediction_parts
+    from src.runtime import is_runtime_model
+
+    rasters = list_rasters(inputs)
+    model_paths = [model_path] if isinstance(model_path, str) else list(model_path)
+    params = {
+        'img_size': img_size, 'overlap': overlap, 'blend': blend, 'threshold': threshold,
+        'output_mode': output_mode, 'batch_size': batch_size, 'jit_compile': jit_compile,
+        'mixed_precision': mixed_precision, 'min_valid_fraction': min_valid_fraction,
+    }
+    # Parâmetros que alteram as partes gravadas: mudá-los refaz os jobs do raster
+    key_params = {key: params[key] for key in ('img_size', 'overlap', 'blend', 'threshold', 'output_mode',
+                                                'mixed_precision', 'min_valid_fraction')}
+    key_params.update(block_size=block_size,
+                      models=[[os.path.abspath(path), os.stat(path).st_mtime_ns] for path in model_paths])
+    halo = max(overlap, img_size // 2)
+    parts_dir = os.path.join(output_dir, 'parts')
+
+    # Modelos exportados rodam sem o TensorFlow; com Keras, os núcleos são divididos entre os processos
+    tf_runtime = None
+    if not all(is_runtime_model(path) for path in model_paths):
+        intra_op_threads = runtime[0] or max(1, (os.cpu_count() or 1) // max(1, workers))
+        tf_runtime = (intra_op_threads, runtime[1], runtime[2])
+
+    with JobState(state_path) as state:
+        tasks = []
+        for path, name in rasters:
+            jobs = plan_jobs(path, parts_dir, block_size, halo, name=name)
+            status = state.sync_raster(path, _raster_key(path, key_params), jobs)
+            if status == 'pending':
+                tasks += [{'id': job['id'], 'raster': path, 'region': job['region'], 'part': job['part'],
+                           'model': model_paths, 'params': params} for job in state.pending_jobs(path)]
+        print(f"{len(rasters)} rasters no catálogo, {len(tasks)} jobs pendentes.")
+
+        failed = 0
+        if tasks:
+            runner = BACKENDS[backend](workers, initializer=_init_worker,
+                                       initargs=(instrumentation_settings(), tf_runtime))
+            with Stage('catalog', total=len(tasks), unit='jobs') as stage:
+                for task, result, error in runner.run(_run_job, tasks):
+                    if error is not None:
+                        failed += 1
+                        print(f"Falha no job {task['id']}: {error!r}")
+                        state.finish_job(task['id'], error=repr(error))
+                        stage.count('falhas')
+                    else:
+                        state.finish_job(task['id'], elapsed_s=result['elapsed_s'])
+                        stage.count('janelas', result['windows'])
+                    stage.advance()
+
+        # As partes de um raster só são unidas quando todos os seus jobs terminaram
+        done = 0
+        for path, name in rasters:
+            status = state.raster_status(path)
+            if status != 'done' and state.pending_jobs(path):
+                continue
+            subdir, stem = os.path.split(name)
+            output_path = os.path.join(output_dir, subdir, f"predicted_{stem}.tif")
+            if status == 'pending':
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                parts = [(job['part'], Window(*job['core'])) for job in state.jobs(path)]
+                merge_prediction_parts(path, parts, output_path)
+                state.set_raster_status(path, 'merged', output=output_path)
+                status = 'merged'
+            if status == 'merged':
+                vector_path = os.path.join(output_dir, subdir, f"{stem}{vector_format}") if vectorize else None
+                if vectorize:
+                    binary_to_georeferenced_shapefile(output_path, None, vector_path, threshold=round(threshold * 255),
+                                                      simplify_tolerance=simplify_tolerance, min_area=min_area)
+                state.set_raster_status(path, 'done', output=output_path, vector=vector_path)
+                if not keep_parts:
+                    shutil.rmtree(os.path.join(parts_dir, name), ignore_errors=True)
+            done += 1
+
+    # Remove as subpastas de partes que ficaram vazias (e a própria pasta de partes)
+    for root, _, _ in os.walk(parts_dir, topdown=False):
+        if not os.listdir(root):
+            os.rmdir(root)
+    print(f"{done} de {len(rasters)} rasters concluídos.")
+    if failed:
+        print(f"{failed} jobs com falha; execute novamente para retomar os jobs pendentes.")
+    return {'rasters': len(rasters), 'done': done, 'jobs': len(tasks), 'failed': failed}
@@ -1,52 +1,145 @@
 import tensorflow as tf
 from tensorflow.keras import layers, models
-from tqdm import tqdm
-from src.utils import load_data
-from src.config import BATCH_SIZE
+from src.instrumentation import log_metrics
+from src.registry import register_model
+from src.utils import load_dataset, load_tile_store_dataset
+from src.config import BATCH_SIZE, DIRS
 
 import os
+import time
+import shutil
 from datetime import datetime
 
-def train_unet(image_dir_train, mask_dir_train, image_dir_val, mask_dir_val, img_size, epochs):
+
+class EpochTimingLogger(tf.keras.callbacks.Callback):
+    """
+    Mede, a cada época, o tempo gasto esperando dados de entrada, computando os passos
+    de treino e executando a validação. Os tempos são adicionados aos logs da época
+    (time_input, time_compute, time_val), impressos ao final de cada época e gravados
+    no arquivo de métricas, se configurado.
+    """
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start = time.perf_counter()
+        self.last_batch_end = self.epoch_start
+        self.time_input = 0.0
+        self.time_compute = 0.0
+        self.time_val = 0.0
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self.batch_start = time.perf_counter()
+        self.time_input += self.batch_start - self.last_batch_end
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.last_batch_end = time.perf_counter()
+        self.time_compute += self.last_batch_end - self.batch_start
+
+    def on_test_begin(self, logs=None):
+        self.val_start = time.perf_counter()
+
+    def on_test_end(self, logs=None):
+        self.time_val += time.perf_counter() - self.val_start
+
+    def on_epoch_end(self, epoch, logs=None):
+        total = time.perf_counter() - self.epoch_start
+        if logs is not None:
+            logs.update(time_input=self.time_input, time_compute=self.time_compute, time_val=self.time_val)
+        print(f"Época {epoch + 1}: {total:.1f} s (entrada {self.time_input:.1f} s, "
+              f"cômputo {self.time_compute:.1f} s, validação {self.time_val:.1f} s)")
+        log_metrics('epoch', stage='train', epoch=epoch + 1, elapsed_s=round(total, 3),
+                    **{key: float(value) for key, value in (logs or {}).items()})
+
+
+def train_unet(image_dir_train, mask_dir_train, image_dir_val, mask_dir_val, img_size, epochs, manifest_path=None, store_path=None,
+               models_dir=None, jit_compile=False, mixed_precision=False, registry_path=None, threshold=0.3, tags=(),
+               resume=None):
     print("\n--- Carregando os dados de treino e validação ---")
-    images_train, masks_train = load_data(image_dir_train, mask_dir_train, img_size)
-    images_val, masks_val = load_data(image_dir_val, mask_dir_val, img_size)
+    if store_path:
+        # Tiles lidos do arquivo HDF5 gerado no pré-processamento, sem decodificação de imagens
+        train_dataset, _ = load_tile_store_dataset(store_path, img_size, BATCH_SIZE, split='train', shuffle=True)
+        val_dataset, _ = load_tile_store_dataset(store_path, img_size, BATCH_SIZE, split='val', shuffle=False)
+    else:
+        train_dataset, _ = load_dataset(image_dir_train, mask_dir_train, img_size, BATCH_SIZE, shuffle=True,
+                                        manifest_path=manifest_path, split='train')
+        val_dataset, _ = load_dataset(image_dir_val, mask_dir_val, img_size, BATCH_SIZE, shuffle=False,
+                                      manifest_path=manifest_path, split='val')
 
     print("\n--- Criando o modelo U-Net ---")
-    model = unet_model((img_size, img_size, 3))
-    model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+    if mixed_precision:
+        # Pesos em float32 e cômputo em bfloat16; a saída sigmoide permanece em float32
+        tf.keras.mixed_precision.set_global_policy('mixed_bfloat16')
+    try:
+        model = unet_model((img_size, img_size, 3))
+    finally:
+        tf.keras.mixed_precision.set_global_policy('float32')
+    model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'], jit_compile=jit_compile)
+    print(f"Precisão: {model.dtype_policy.name}, XLA: {'ativado' if jit_compile else 'desativado'}")
+
+    # Diretório para salvar os modelos
+    models_dir = models_dir or DIRS['models']
+    os.makedirs(models_dir, exist_ok=True)
+
+    # Nome do arquivo com timestamp (o da execução interrompida, ao retomar)
+    timestamp = resume or datetime.now().strftime("%Y%m%d_%H%M%S")
+    model_path = os.path.join(models_dir, f"unet_model_{timestamp}.keras")
+    best_model_path = os.path.join(models_dir, f"unet_model_{timestamp}_best.keras")
+
+    # Backup próprio da execução, para que treinos simultâneos não restaurem o estado um do outro
+    backup_dir = os.path.join(models_dir, 'backup', timestamp)
+    if resume and not os.path.isdir(backup_dir):
+        raise ValueError(f"Nenhum backup de treinamento encontrado em {backup_dir}.")
+    print(f"Backup do treinamento em: {backup_dir} (para retomar se interrompido: --resume {timestamp})")
+
+    # Ao retomar, o melhor modelo já salvo só é substituído por um de menor perda de validação
+    best_val_loss = None
+    if resume and os.path.exists(best_model_path):
+        best_model = tf.keras.models.load_model(best_model_path)
+        best_val_loss = best_model.evaluate(val_dataset, verbose=0, return_dict=True)['loss']
+        del best_model
+        print(f"Melhor modelo existente: {best_model_path} (val_loss {best_val_loss:.5f})")
 
     callbacks = [
+        EpochTimingLogger(),
         tf.keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=5, verbose=1),
-        tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True, verbose=1)
+        tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True, verbose=1),
+        # Melhor modelo segundo a perda de validação
+        tf.keras.callbacks.ModelCheckpoint(best_model_path, monitor='val_loss', save_best_only=True, verbose=1,
+                                           initial_value_threshold=best_val_loss),
+        # Estado do treinamento a cada época: uma execução interrompida retoma da última época concluída
+        tf.keras.callbacks.BackupAndRestore(backup_dir),
     ]
 
     print("\n--- Iniciando o treinamento ---")
-    for epoch in range(epochs):
-        print(f"\n--- Epoch {epoch + 1}/{epochs} ---")
-        model.fit(
-            images_train, masks_train,
-            validation_data=(images_val, masks_val),
-            batch_size=BATCH_SIZE,
-            epochs=1,
-            verbose=1,
-            callbacks=callbacks
-        )
+    history = model.fit(
+        train_dataset,
+        validation_data=val_dataset,
+        epochs=epochs,
+        verbose=1,
+        callbacks=callbacks
+    )
+    print(f"Treinamento concluído após {len(history.epoch)} épocas.")
+
+    # O backup só serve para retomar uma execução interrompida
+    shutil.rmtree(backup_dir, ignore_errors=True)
+    try:
+        os.rmdir(os.path.dirname(backup_dir))
+    except OSError:
+        pass  # Backups de outras execuções em andamento ou interrompidas
 
     print("\n--- Salvando o modelo treinado ---")
 
-    # Diretório para salvar os modelos
-    models_dir = os.path.join("D:\\Projetos\\bemagro\\gihub", "models")
-    os.makedirs(models_dir, exist_ok=True)
-
-    # Nome do arquivo com timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    model_path = os.path.join(models_dir, f"unet_model_{timestamp}.keras")
-
     # Salvar no formato recomendado pelo Keras
     model.save(model_path)
     print(f"Modelo treinado e salvo em: {model_path}")
 
+    if registry_path:
+        # Métricas de validação dos pesos salvos, para a seleção do modelo na predição
+        metrics = model.evaluate(val_dataset, verbose=0, return_dict=True)
+        register_model(registry_path, model_path, img_size, threshold,
+                       metrics={f"val_{key}": value for key, value in metrics.items()}, tags=tags,
+                       epochs=len(history.epoch))
+    return model_path
+
 
 def unet_model(input_size=(256, 256, 3)):
     inputs = layers.Input(input_size)
@@ -72,6 +165,7 @@ def unet_model(input_size=(256, 256, 3)):
     c4 = layers.Conv2D(64, (3, 3), activation='relu', padding='same')(u2)
     c4 = layers.Conv2D(64, (3, 3), activation='relu', padding='same')(c4)
 
-    outputs = layers.Conv2D(1, (1, 1), activation='sigmoid')(c4)
+    # Saída em float32 mesmo com política de precisão mista, para estabilidade da sigmoide e da perda
+    outputs = layers.Conv2D(1, (1, 1), activation='sigmoid', dtype='float32')(c4)
 
     return models.Model(inputs, outputs)
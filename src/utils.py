@@ -1,6 +1,10 @@
 import os
 import cv2
 import numpy as np
+import h5py
+import tensorflow as tf
+from src.instrumentation import Stage
+from src.manifest import paired_tiles
 
 def create_directory(directory):
     """
@@ -12,7 +16,7 @@ def create_directory(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def load_data(image_dir, mask_dir, img_size):
+def load_data(image_dir, mask_dir, img_size, manifest_path=None, split=None):
     """
     Carrega imagens e máscaras, redimensiona e normaliza os dados.
 
@@ -20,50 +24,170 @@ def load_data(image_dir, mask_dir, img_size):
         image_dir (str): Diretório contendo as imagens.
         mask_dir (str): Diretório contendo as máscaras.
         img_size (int): Tamanho das imagens de saída (assume quadradas).
+        manifest_path (str): Manifesto de tiles a reutilizar em vez de listar os diretórios (opcional).
+        split (str): Conjunto a selecionar no manifesto ('train' ou 'val').
 
     Returns:
         tuple: Arrays numpy contendo as imagens e as máscaras.
     """
     images, masks = [], []
-    image_files = sorted(os.listdir(image_dir))
-    mask_files = sorted(os.listdir(mask_dir))
+    pairs = paired_tiles(image_dir, mask_dir, manifest_path, split)
+
+    with Stage('load_data', total=len(pairs), unit='tiles') as stage:
+        for img_path, mask_path in pairs:
+            with stage.time('decode'):
+                image = cv2.imread(img_path, cv2.IMREAD_COLOR)
+                mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+            stage.advance()
+
+            if image is None or mask is None:
+                print(f"Erro ao carregar imagem ou máscara para: {os.path.basename(img_path)}")
+                continue
+
+            # Redimensionar
+            with stage.time('resize'):
+                image = cv2.resize(image, (img_size, img_size))
+                mask = cv2.resize(mask, (img_size, img_size))
+
+            images.append(image)
+            masks.append(mask)
+
+    # Normalizar os valores (float32, sem cópias intermediárias em float64)
+    images = np.asarray(images, dtype=np.float32) / np.float32(255.0)
+    masks = np.asarray(masks, dtype=np.float32) / np.float32(255.0)
+    masks = np.expand_dims(masks, axis=-1)
 
-    for img_file in image_files:
-        img_name, _ = os.path.splitext(img_file)  # Nome base da imagem
-        # Encontrar a máscara correspondente, ignorando a extensão
-        mask_file = next((m for m in mask_files if os.path.splitext(m)[0] == img_name), None)
+    print(f"Total de imagens carregadas: {len(images)}")
+    print(f"Total de máscaras carregadas: {len(masks)}")
 
-        if not mask_file:
-            print(f"Máscara correspondente não encontrada para: {img_file}")
-            continue
+    return images, masks
 
-        img_path = os.path.join(image_dir, img_file)
-        mask_path = os.path.join(mask_dir, mask_file)
+def _decode_pair(image_path, mask_path, img_size):
+    """
+    Lê e decodifica um par imagem/máscara mantendo os dados em uint8.
+    A imagem é convertida para BGR, a mesma ordem de canais do cv2 usada na predição.
+    """
+    image = tf.io.decode_image(tf.io.read_file(image_path), channels=3, expand_animations=False)
+    image = tf.reverse(image, axis=[-1])
+    image = tf.image.resize(image, (img_size, img_size), method='bilinear')
+    image = tf.cast(tf.round(image), tf.uint8)
 
-        image = cv2.imread(img_path, cv2.IMREAD_COLOR)
-        mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+    mask = tf.io.decode_image(tf.io.read_file(mask_path), channels=1, expand_animations=False)
+    mask = tf.image.resize(mask, (img_size, img_size), method='nearest')
+    mask = tf.cast(mask, tf.uint8)
+    return image, mask
 
-        if image is None or mask is None:
-            print(f"Erro ao carregar imagem ou máscara para: {img_file}")
-            continue
+def _normalize_batch(images, masks):
+    """
+    Converte um lote uint8 para float32 no intervalo [0, 1].
+    """
+    return tf.cast(images, tf.float32) / 255.0, tf.cast(masks, tf.float32) / 255.0
 
-        # Redimensionar
-        image = cv2.resize(image, (img_size, img_size))
-        mask = cv2.resize(mask, (img_size, img_size))
+def load_dataset(image_dir, mask_dir, img_size, batch_size, shuffle=True, manifest_path=None, split=None):
+    """
+    Cria um tf.data.Dataset que lê imagens e máscaras do disco sob demanda.
 
-        images.append(image)
-        masks.append(mask)
+    A decodificação roda em paralelo, os exemplos permanecem em uint8 até a
+    formação do lote e apenas os lotes são normalizados para float32.
+    Sem nenhum par imagem/máscara, levanta ValueError indicando os diretórios.
 
-    # Normalizar os valores
-    images = np.array(images) / 255.0
-    masks = np.array(masks) / 255.0
-    masks = np.expand_dims(masks, axis=-1)
+    Args:
+        image_dir (str): Diretório contendo as imagens.
+        mask_dir (str): Diretório contendo as máscaras.
+        img_size (int): Tamanho das imagens de saída (assume quadradas).
+        batch_size (int): Tamanho do lote.
+        shuffle (bool): Embaralhar os exemplos a cada época.
+        manifest_path (str): Manifesto de tiles a reutilizar em vez de listar os diretórios (opcional).
+        split (str): Conjunto a selecionar no manifesto ('train' ou 'val').
 
-    print(f"Total de imagens carregadas: {len(images)}")
-    print(f"Total de máscaras carregadas: {len(masks)}")
+    Returns:
+        tuple: (tf.data.Dataset com lotes (imagens, máscaras), número de pares encontrados).
+    """
+    pairs = paired_tiles(image_dir, mask_dir, manifest_path, split)
+    image_paths = [img_path for img_path, _ in pairs]
+    mask_paths = [mask_path for _, mask_path in pairs]
+
+    print(f"Total de pares imagem/máscara: {len(image_paths)}")
+    if not pairs:
+        source = f"{image_dir} e {mask_dir}"
+        if manifest_path and split and os.path.exists(manifest_path):
+            source += f" (manifesto {manifest_path}, conjunto '{split}')"
+        raise ValueError(f"Nenhum par imagem/máscara encontrado em {source}.")
+
+    dataset = tf.data.Dataset.from_tensor_slices((image_paths, mask_paths))
+    if shuffle:
+        # Embaralha apenas os caminhos, que ocupam pouca memória
+        dataset = dataset.shuffle(len(image_paths), reshuffle_each_iteration=True)
+    dataset = dataset.map(lambda i, m: _decode_pair(i, m, img_size), num_parallel_calls=tf.data.AUTOTUNE)
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.map(_normalize_batch, num_parallel_calls=tf.data.AUTOTUNE)
+    dataset = dataset.prefetch(tf.data.AUTOTUNE)
+
+    return dataset, len(image_paths)
+
+
+def load_tile_store_dataset(store_path, img_size, batch_size, split='train', shuffle=True):
+    """
+    Cria um tf.data.Dataset que lê lotes diretamente do arquivo HDF5 gerado por write_tile_store.
 
-    return np.array(images), np.array(masks)
+    Os lotes são fatiados do arquivo sem nenhuma decodificação de imagem; as máscaras
+    compactadas em bits são expandidas e os dados convertidos para float32 apenas no lote.
+    Com split 'train' ou 'val' em um arquivo ainda não dividido por split_tile_store,
+    levanta ValueError.
 
+    Args:
+        store_path (str): Caminho do arquivo HDF5.
+        img_size (int): Tamanho das imagens de saída (assume quadradas).
+        batch_size (int): Tamanho do lote.
+        split (str): 'train', 'val' ou None para todos os tiles (usa o dataset 'split' do arquivo).
+        shuffle (bool): Embaralhar os exemplos a cada época.
+
+    Returns:
+        tuple: (tf.data.Dataset com lotes (imagens, máscaras), número de tiles selecionados).
+    """
+    with h5py.File(store_path, 'r') as store:
+        tile_size = int(store.attrs['tile_size'])
+        if split is not None and 'split' not in store:
+            # Sem a divisão, treino e validação receberiam os mesmos tiles
+            raise ValueError(f"O arquivo {store_path} não tem a divisão treino/validação; "
+                             f"execute split_tile_store antes de carregar o split '{split}'.")
+        if split is None:
+            indices = np.arange(store['images'].shape[0])
+        else:
+            indices = np.flatnonzero(store['split'][:] == (0 if split == 'train' else 1))
+
+    print(f"Total de tiles no arquivo ({split or 'todos'}): {len(indices)}")
+
+    def generate_batches():
+        order = np.random.permutation(indices) if shuffle else indices
+        with h5py.File(store_path, 'r') as store:
+            images, masks = store['images'], store['masks']
+            for start in range(0, len(order), batch_size):
+                # O h5py exige índices crescentes na seleção
+                batch = np.sort(order[start:start + batch_size])
+                packed = masks[batch]
+                yield images[batch], np.unpackbits(packed, axis=-1, count=tile_size)[..., np.newaxis]
+
+    dataset = tf.data.Dataset.from_generator(
+        generate_batches,
+        output_signature=(
+            tf.TensorSpec((None, tile_size, tile_size, 3), tf.uint8),
+            tf.TensorSpec((None, tile_size, tile_size, 1), tf.uint8),
+        ),
+    )
+
+    def normalize(images, masks):
+        images = tf.cast(images, tf.float32) / 255.0
+        masks = tf.cast(masks, tf.float32)
+        if tile_size != img_size:
+            images = tf.image.resize(images, (img_size, img_size), method='bilinear')
+            masks = tf.image.resize(masks, (img_size, img_size), method='nearest')
+        return images, masks
+
+    dataset = dataset.map(normalize, num_parallel_calls=tf.data.AUTOTUNE)
+    dataset = dataset.prefetch(tf.data.AUTOTUNE)
+
+    return dataset, len(indices)
 
 def normalize_image(image):
     """
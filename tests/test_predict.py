@@ -0,0 +1,123 @@
+import numpy as np
+import onnx
+import pytest
+import rasterio
+from onnx import TensorProto, helper
+from rasterio.transform import from_origin
+import src.predict as predict
+from src.predict import predict_geotiff_tiled, threshold_prediction
+
+@pytest.fixture
+def model_path(tmp_path):
+    """
+    Modelo ONNX mínimo (média dos canais), executado pelo onnxruntime sem o TensorFlow.
+    """
+    graph = helper.make_graph(
+        [helper.make_node('ReduceMean', ['input'], ['output'], axes=[3], keepdims=1)], 'media',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, [None, 64, 64, 3])],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, [None, 64, 64, 1])])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    path = tmp_path / 'media.onnx'
+    onnx.save(model, path)
+    return str(path)
+
+@pytest.fixture
+def raster_path(tmp_path):
+    """
+    Raster georreferenciado com ruído e uma faixa sem dados (nodata = 0) à esquerda.
+    """
+    rng = np.random.default_rng(0)
+    image = rng.integers(1, 256, size=(3, 150, 310), dtype=np.uint8)
+    image[:, :, :90] = 0
+    path = tmp_path / 'orto.tif'
+    with rasterio.open(path, 'w', driver='GTiff', height=150, width=310, count=3, dtype='uint8', nodata=0,
+                       crs='EPSG:31983', transform=from_origin(500000.0, 7500000.0, 0.5, 0.5)) as dst:
+        dst.write(image)
+    return str(path)
+
+@pytest.mark.parametrize('output_mode', ['probability', 'float32'])
+def test_column_bands_match_full_width(raster_path, model_path, tmp_path, output_mode):
+    outputs = {}
+    for block_width in (8192, 70):
+        path = tmp_path / f'pred_{block_width}.tif'
+        stats = predict_geotiff_tiled(raster_path, str(path), model_path, img_size=64, overlap=16,
+                                      output_mode=output_mode, batch_size=4, block_width=block_width)
+        with rasterio.open(path) as src:
+            outputs[block_width] = (src.read(1), src.read_masks(1), stats)
+    np.testing.assert_array_equal(outputs[70][0], outputs[8192][0])
+    np.testing.assert_array_equal(outputs[70][1], outputs[8192][1])
+    assert outputs[70][2] == outputs[8192][2]
+
+def test_windows_without_enough_data_are_skipped(tmp_path, monkeypatch):
+    """
+    Janelas abaixo de min_valid_fraction não chegam ao modelo e são gravadas como 0 (nodata),
+    sem alterar a combinação das janelas vizinhas inteiramente válidas.
+    """
+    rng = np.random.default_rng(1)
+    image = rng.integers(1, 256, size=(3, 100, 256), dtype=np.uint8)
+    image[:, :, :136] = 0  # Sem dados: janelas em x = 0, 48 e 96 (válidas 0, 0 e 37,5%)
+    path = tmp_path / 'orto.tif'
+    with rasterio.open(path, 'w', driver='GTiff', height=100, width=256, count=3, dtype='uint8', nodata=0,
+                       crs='EPSG:31983', transform=from_origin(500000.0, 7500000.0, 0.5, 0.5)) as dst:
+        dst.write(image)
+
+    batches = []
+
+    def stub_predictor(batch):
+        batches.append(batch)
+        return batch.mean(axis=-1, keepdims=True)
+
+    monkeypatch.setattr(predict, 'load_predictor', lambda *args, **kwargs: stub_predictor)
+    outputs = {}
+    for fraction in (0.0, 0.5):
+        batches.clear()
+        output_path = tmp_path / f'pred_{fraction}.tif'
+        stats = predict_geotiff_tiled(str(path), str(output_path), 'stub.keras', img_size=64, overlap=16,
+                                      batch_size=4, min_valid_fraction=fraction)
+        valid_fractions = [tile.any(axis=-1).mean() for batch in batches for tile in batch]
+        with rasterio.open(output_path) as src:
+            outputs[fraction] = src.read(1), src.read_masks(1)
+        assert min(valid_fractions) >= fraction
+
+    # 2 linhas de 5 janelas: sem dados (x = 0, 48) e, com 0.5, também a parcialmente válida (x = 96)
+    assert stats == {'windows': 4, 'skipped': 6}
+    data, mask = outputs[0.5]
+    assert not data[:, :144].any() and not mask[:, :144].any()
+    assert mask[:, 144:].all()
+
+    # Fora do alcance da janela ignorada (x >= 96 + 64), a combinação é a mesma
+    reference, reference_mask = outputs[0.0]
+    assert not reference[:, :136].any() and reference_mask[:, 136:].all()
+    np.testing.assert_array_equal(data[:, 160:], reference[:, 160:])
+
+def test_quantized_probability_round_trip(raster_path, model_path, tmp_path):
+    """
+    Probabilidade -> COG uint8 -> threshold_prediction: georreferência preservada e erro de
+    quantização de no máximo meio passo (0,5/255).
+    """
+    probability_path, float_path = tmp_path / 'prob.tif', tmp_path / 'prob_float.tif'
+    for path, output_mode in ((probability_path, 'probability'), (float_path, 'float32')):
+        predict_geotiff_tiled(raster_path, str(path), model_path, img_size=64, overlap=16, output_mode=output_mode)
+    binary_path = threshold_prediction(str(probability_path), str(tmp_path / 'binary.tif'), threshold=0.5,
+                                       window_size=100)
+
+    with rasterio.open(raster_path) as raster, rasterio.open(probability_path) as quantized, \
+            rasterio.open(float_path) as reference, rasterio.open(binary_path) as binary:
+        for dataset in (quantized, binary):
+            assert (dataset.crs, dataset.transform) == (raster.crs, raster.transform)
+            assert dataset.overviews(1)
+        assert quantized.dtypes[0] == 'uint8' and quantized.scales == (1 / 255,)
+        probability = reference.read(1)
+        stored, mask = quantized.read(1), quantized.read_masks(1)
+        binary_data, binary_mask = binary.read(1), binary.read_masks(1)
+
+    valid = ~np.isnan(probability)
+    assert np.array_equal(mask > 0, valid) and np.array_equal(binary_mask, mask)
+    assert np.abs(stored[valid] / 255 - probability[valid]).max() <= 0.5 / 255 + 1e-6
+
+    # A binarização só pode divergir do limiar aplicado à probabilidade original a menos de um passo do limiar
+    expected = valid & (probability > 0.5)
+    differs = (binary_data > 0) != expected
+    assert not binary_data[~valid].any()
+    assert np.all(np.abs(probability[differs] - 0.5) <= 1 / 255)
@@ -0,0 +1,83 @@
+import argparse
+import pytest
+import main
+from src.registry import load_registry, register_model, save_registry, select_models
+
+@pytest.fixture
+def registry_path(tmp_path):
+    """
+    Registro com quatro modelos ONNX (arquivos vazios), em ordem de criação:
+    a (val_loss 0.30), b (0.20, rótulo 'producao'), c (0.20, empate com b, mais recente) e d (sem métricas).
+    """
+    path = tmp_path / 'models' / 'registry.json'
+    models = {
+        'a': ({'val_loss': 0.30, 'val_accuracy': 0.90}, (), 256, 0.3),
+        'b': ({'val_loss': 0.20, 'val_accuracy': 0.80}, ('producao',), 256, 0.4),
+        'c': ({'val_loss': 0.20, 'val_accuracy': 0.95}, ('producao',), 256, 0.6),
+        'd': (None, (), 128, 0.3),
+    }
+    for name, (metrics, tags, img_size, threshold) in models.items():
+        model_file = tmp_path / 'models' / f'{name}.onnx'
+        model_file.parent.mkdir(exist_ok=True)
+        model_file.touch()
+        register_model(str(path), str(model_file), img_size, threshold, metrics=metrics, tags=tags)
+
+    # Datas de criação distintas (o registro grava a hora com resolução de segundos)
+    registry = load_registry(str(path))
+    for day, entry in enumerate(registry['models'], start=1):
+        entry['created'] = f'2025-01-0{day}T12:00:00'
+    save_registry(registry, str(path))
+    return str(path)
+
+def _names(entries):
+    return [entry['name'] for entry in entries]
+
+def test_select_models_orders_by_metric(registry_path):
+    assert _names(select_models(registry_path, metric='val_loss', count=4)) == ['c', 'b', 'a', 'd']
+    assert _names(select_models(registry_path, metric='val_accuracy', count=4)) == ['c', 'a', 'b', 'd']
+    assert _names(select_models(registry_path, metric='val_accuracy', mode='min', count=4)) == ['b', 'a', 'c', 'd']
+    # Sem métrica, os mais recentes primeiro
+    assert _names(select_models(registry_path, count=4)) == ['d', 'c', 'b', 'a']
+
+def test_select_models_ties_prefer_most_recent(registry_path):
+    registry = load_registry(registry_path)
+    for entry in registry['models']:
+        if entry['name'] == 'b':
+            entry['created'] = '2025-02-01T12:00:00'
+    save_registry(registry, registry_path)
+    assert _names(select_models(registry_path, metric='val_loss', count=2)) == ['b', 'c']
+
+def test_select_models_filters(registry_path, tmp_path):
+    assert select_models(registry_path, tag='desconhecido', metric='val_loss') == []
+    assert _names(select_models(registry_path, tag='producao', metric='val_loss', count=4)) == ['c', 'b']
+    assert select_models(registry_path, model_format='.keras') == []
+    # Modelos cujo arquivo foi apagado não são selecionados
+    (tmp_path / 'models' / 'c.onnx').unlink()
+    assert _names(select_models(registry_path, metric='val_loss', count=2)) == ['b', 'a']
+
+def _args(**kwargs):
+    defaults = {'model': None, 'tag': None, 'select_metric': 'val_loss', 'ensemble': 1, 'img_size': None,
+                'threshold': None}
+    return argparse.Namespace(**{**defaults, **kwargs})
+
+def test_ensemble_uses_n_best_models(registry_path, tmp_path, monkeypatch):
+    monkeypatch.setitem(main.DIRS, 'model_registry', registry_path)
+    monkeypatch.setattr(main, 'PREDICTION_MODEL_FORMAT', '.onnx')
+    models = tmp_path / 'models'
+
+    model_path, img_size, threshold = main._prediction_models(_args(ensemble=2))
+    assert model_path == [str(models / 'c.onnx'), str(models / 'b.onnx')]
+    assert (img_size, threshold) == (256, pytest.approx(0.5))  # Limiar médio do ensemble
+
+    model_path, img_size, threshold = main._prediction_models(_args())
+    assert (model_path, img_size, threshold) == (str(models / 'c.onnx'), 256, 0.6)
+
+    # Tamanhos de entrada diferentes exigem --img-size
+    assert main._prediction_models(_args(ensemble=4)) is None
+    assert main._prediction_models(_args(ensemble=4, img_size=256))[1] == 256
+
+def test_unknown_tag_selects_no_model(registry_path, monkeypatch):
+    monkeypatch.setitem(main.DIRS, 'model_registry', registry_path)
+    monkeypatch.setattr(main, 'PREDICTION_MODEL_FORMAT', '.onnx')
+    # Com rótulo, não recorre ao arquivo mais recente da pasta de modelos
+    assert main._prediction_models(_args(tag='desconhecido', ensemble=3)) is None
@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import numpy as np
+import onnx
+import pytest
+import rasterio
+from onnx import TensorProto, helper
+from rasterio.transform import from_origin
+from src.scheduler import list_rasters, run_catalog
+
+@pytest.fixture
+def catalog_dir(tmp_path):
+    """
+    Catálogo com dois rasters de mesmo nome (orto.tif) em subpastas diferentes.
+    """
+    rng = np.random.default_rng(0)
+    for i, folder in enumerate(('fazenda_a', 'fazenda_b')):
+        image = (rng.random((3, 200, 230)) * 60).astype(np.uint8)
+        image[:, 40 + 60 * i:100 + 60 * i, 30:150] = 230
+        (tmp_path / 'catalog' / folder).mkdir(parents=True)
+        with rasterio.open(tmp_path / 'catalog' / folder / 'orto.tif', 'w', driver='GTiff', height=200, width=230,
+                           count=3, dtype='uint8', crs='EPSG:31983',
+                           transform=from_origin(500000.0 + 1000 * i, 7500000.0, 0.5, 0.5)) as dst:
+            dst.write(image)
+    return tmp_path / 'catalog'
+
+@pytest.fixture
+def model_path(tmp_path):
+    """
+    Modelo ONNX mínimo (média dos canais), executado pelo onnxruntime sem o TensorFlow.
+    """
+    graph = helper.make_graph(
+        [helper.make_node('ReduceMean', ['input'], ['output'], axes=[3], keepdims=1)], 'media',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, [None, 64, 64, 3])],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, [None, 64, 64, 1])])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    path = tmp_path / 'media.onnx'
+    onnx.save(model, path)
+    return str(path)
+
+def test_list_rasters_keeps_subfolders(catalog_dir):
+    names = sorted(name for _, name in list_rasters([str(catalog_dir)]))
+    assert names == [os.path.join('fazenda_a', 'orto'), os.path.join('fazenda_b', 'orto')]
+
+def test_same_named_rasters_in_subfolders(catalog_dir, model_path, tmp_path):
+    output_dir, state_path = tmp_path / 'output', tmp_path / 'state.sqlite'
+    result = run_catalog([str(catalog_dir)], str(output_dir), str(state_path), model_path, img_size=64, overlap=16,
+                         threshold=0.5, block_size=128, workers=1)
+    assert result == {'rasters': 2, 'done': 2, 'jobs': 8, 'failed': 0}
+
+    with sqlite3.connect(state_path) as connection:
+        job_ids = [row[0] for row in connection.execute("SELECT id FROM jobs")]
+    assert len(job_ids) == len(set(job_ids)) == 8
+
+    for i, folder in enumerate(('fazenda_a', 'fazenda_b')):
+        with rasterio.open(output_dir / folder / 'predicted_orto.tif') as src, \
+                rasterio.open(catalog_dir / folder / 'orto.tif') as raster:
+            assert src.transform == raster.transform
+            bright = src.read(1) > 127
+        assert bright[45 + 60 * i:95 + 60 * i, 35:145].all()
+        assert not bright[:, 160:].any()
+        assert (output_dir / folder / 'orto.gpkg').exists()
+    assert not (output_dir / 'parts').exists()
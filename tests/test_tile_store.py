@@ -0,0 +1,32 @@
+import h5py
+import numpy as np
+import pytest
+from src.preprocessing import split_tile_store
+from src.utils import load_tile_store_dataset
+
+@pytest.fixture
+def store_path(tmp_path):
+    """
+    Arquivo HDF5 mínimo no formato de write_tile_store, ainda sem o dataset 'split'.
+    """
+    path = tmp_path / 'tiles.h5'
+    with h5py.File(path, 'w') as store:
+        store.attrs['tile_size'] = 16
+        store.create_dataset('images', data=np.zeros((10, 16, 16, 3), dtype=np.uint8))
+        store.create_dataset('masks', data=np.zeros((10, 16, 2), dtype=np.uint8))
+    return str(path)
+
+@pytest.mark.parametrize('split', ['train', 'val'])
+def test_unsplit_store_requires_split_tile_store(store_path, split):
+    with pytest.raises(ValueError, match='split_tile_store'):
+        load_tile_store_dataset(store_path, 16, 4, split=split)
+
+def test_split_store_selects_disjoint_tiles(store_path):
+    _, n_all = load_tile_store_dataset(store_path, 16, 4, split=None)
+    assert n_all == 10
+
+    split_tile_store(store_path, train_val_split=0.8)
+    _, n_train = load_tile_store_dataset(store_path, 16, 4, split='train')
+    dataset, n_val = load_tile_store_dataset(store_path, 16, 4, split='val', shuffle=False)
+    assert (n_train, n_val) == (8, 2)
+    assert sum(images.shape[0] for images, _ in dataset) == 2
@@ -0,0 +1,171 @@
+import os
+import cv2
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+import src.preprocessing as preprocessing
+from src.preprocessing import split_images, split_images_and_generate_masks
+
+TILE_SIZE = 128
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    """
+    Duas imagens sintéticas com dimensões que não são múltiplas do tamanho do tile (tiles de borda com preenchimento).
+    """
+    rng = np.random.default_rng(0)
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    for name, (height, width) in {'campo_a': (300, 260), 'campo_b': (200, 390)}.items():
+        image = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        cv2.rectangle(image, (20, 30), (150, 120), (40, 200, 90), -1)  # Região contínua acima do limiar
+        cv2.imwrite(str(raw / f"{name}.png"), image)
+    return raw
+
+def _reference_tiles(image_dir, tile_size, binarize_threshold=128):
+    """
+    Implementação original do recorte (antes do processamento paralelo), com os tiles
+    codificados em memória: {nome do arquivo: bytes}.
+    """
+    images, masks = {}, {}
+    for filename in sorted(os.listdir(image_dir)):
+        image = cv2.imread(os.path.join(image_dir, filename))
+        h, w, _ = image.shape
+        for y in range(0, h, tile_size):
+            for x in range(0, w, tile_size):
+                tile = image[y:y + tile_size, x:x + tile_size]
+                if tile.shape[0] < tile_size or tile.shape[1] < tile_size:
+                    tile_padded = np.zeros((tile_size, tile_size, 3), dtype=np.uint8)
+                    tile_padded[:tile.shape[0], :tile.shape[1], :] = tile
+                    tile = tile_padded
+                gray_tile = cv2.cvtColor(tile, cv2.COLOR_BGR2GRAY)
+                _, mask_tile = cv2.threshold(gray_tile, binarize_threshold, 255, cv2.THRESH_BINARY)
+                stem = f"{os.path.splitext(filename)[0]}_{x}_{y}"
+                images[f"{stem}.jpg"] = cv2.imencode('.jpg', tile)[1].tobytes()
+                masks[f"{stem}.png"] = cv2.imencode('.png', mask_tile)[1].tobytes()
+    return images, masks
+
+def _read_dir(directory):
+    return {name: (directory / name).read_bytes() for name in sorted(os.listdir(directory))}
+
+@pytest.mark.parametrize('backend', ['cv2', 'rasterio'])
+@pytest.mark.parametrize('workers', [1, 3])
+def test_split_images_matches_reference(raw_dir, tmp_path, workers, backend):
+    output = tmp_path / 'tiles'
+    split_images(str(raw_dir), str(output), TILE_SIZE, workers=workers, backend=backend)
+    images, _ = _reference_tiles(raw_dir, TILE_SIZE)
+    assert _read_dir(output) == images
+
+@pytest.mark.parametrize('backend', ['cv2', 'rasterio'])
+@pytest.mark.parametrize('workers', [1, 3])
+def test_split_images_and_generate_masks_matches_reference(raw_dir, tmp_path, workers, backend):
+    output_images, output_masks = tmp_path / 'images', tmp_path / 'masks'
+    split_images_and_generate_masks(str(raw_dir), str(output_images), str(output_masks), TILE_SIZE,
+                                    binarize_threshold=128, workers=workers, backend=backend)
+    images, masks = _reference_tiles(raw_dir, TILE_SIZE, 128)
+    assert _read_dir(output_images) == images
+    assert _read_dir(output_masks) == masks
+
+def test_augmented_tiles_are_transforms_of_the_original(raw_dir, tmp_path):
+    output_images, output_masks = tmp_path / 'images', tmp_path / 'masks'
+    split_images_and_generate_masks(str(raw_dir), str(output_images), str(output_masks), TILE_SIZE,
+                                    augmentations=('fliph', 'rot90'))
+    _, masks = _reference_tiles(raw_dir, TILE_SIZE)
+    for name in masks:
+        stem = os.path.splitext(name)[0]
+        mask = cv2.imread(str(output_masks / name), cv2.IMREAD_GRAYSCALE)
+        assert np.array_equal(cv2.imread(str(output_masks / f"{stem}_fliph.png"), cv2.IMREAD_GRAYSCALE), mask[:, ::-1])
+        assert np.array_equal(cv2.imread(str(output_masks / f"{stem}_rot90.png"), cv2.IMREAD_GRAYSCALE), np.rot90(mask))
+
+def test_rasterio_blocks_are_bounded_and_match_full_width(tmp_path, monkeypatch):
+    """
+    Blocos de largura limitada geram os mesmos tiles que a leitura da linha inteira, sem ler
+    mais que block_tiles tiles por vez.
+    """
+    rng = np.random.default_rng(2)
+    image = rng.integers(1, 256, (3, 300, 1100), dtype=np.uint8)
+    image[:, 150:, 700:] = 0  # Região sem dados
+    path = tmp_path / 'largo.tif'
+    with rasterio.open(path, 'w', driver='GTiff', height=300, width=1100, count=3, dtype='uint8', nodata=0,
+                       crs='EPSG:31983', transform=from_origin(500000.0, 7500000.0, 0.5, 0.5)) as dst:
+        dst.write(image)
+
+    widths = []
+    read_window_bgr = preprocessing.read_window_bgr
+    monkeypatch.setattr(preprocessing, 'read_window_bgr',
+                        lambda src, x, y, height, width: widths.append(width) or read_window_bgr(src, x, y, height, width))
+    blocks = list(preprocessing._iter_tiles_rasterio(str(path), TILE_SIZE, binarize_threshold=128, block_tiles=4))
+    assert max(widths) == 4 * TILE_SIZE
+    full = list(preprocessing._iter_tiles_rasterio(str(path), TILE_SIZE, binarize_threshold=128, block_tiles=100))
+
+    assert len(blocks) == len(full) == 3 * 9
+    for (x, y, tile, mask, transform, valid), expected in zip(blocks, full):
+        assert (x, y, transform, valid) == (expected[0], expected[1], expected[4], expected[5])
+        assert np.array_equal(tile, expected[2]) and np.array_equal(mask, expected[3])
+
+def _tile_with_cache(raw_dir, tmp_path, binarize_threshold=128):
+    return split_images_and_generate_masks(str(raw_dir), str(tmp_path / 'images'), str(tmp_path / 'masks'), TILE_SIZE,
+                                           binarize_threshold=binarize_threshold,
+                                           cache_path=str(tmp_path / 'tile_cache.json'))
+
+def _assert_matches_reference(raw_dir, tmp_path, binarize_threshold=128):
+    images, masks = _reference_tiles(raw_dir, TILE_SIZE, binarize_threshold)
+    assert _read_dir(tmp_path / 'images') == images
+    assert _read_dir(tmp_path / 'masks') == masks
+
+def _mtimes(directory):
+    return {name: os.stat(directory / name).st_mtime_ns for name in os.listdir(directory)}
+
+def test_tile_cache_reuses_unchanged_images(raw_dir, tmp_path):
+    first = _tile_with_cache(raw_dir, tmp_path)
+    assert (first['images'], first['cached'], first['removed']) == (2, 0, 0)
+    mtimes = _mtimes(tmp_path / 'images')
+
+    second = _tile_with_cache(raw_dir, tmp_path)
+    assert (second['images'], second['tiles'], second['cached'], second['removed']) == (0, 0, 2, 0)
+    assert _mtimes(tmp_path / 'images') == mtimes
+    _assert_matches_reference(raw_dir, tmp_path)
+
+def test_tile_cache_adds_new_image(raw_dir, tmp_path):
+    _tile_with_cache(raw_dir, tmp_path)
+    mtimes = _mtimes(tmp_path / 'images')
+    image = np.random.default_rng(1).integers(0, 256, (140, 140, 3), dtype=np.uint8)
+    cv2.imwrite(str(raw_dir / 'campo_c.png'), image)
+
+    summary = _tile_with_cache(raw_dir, tmp_path)
+    assert (summary['images'], summary['tiles'], summary['cached'], summary['removed']) == (1, 4, 2, 0)
+    assert {name: mtime for name, mtime in _mtimes(tmp_path / 'images').items() if name in mtimes} == mtimes
+    _assert_matches_reference(raw_dir, tmp_path)
+
+def test_tile_cache_retiles_modified_image(raw_dir, tmp_path):
+    _tile_with_cache(raw_dir, tmp_path)
+    mtimes = _mtimes(tmp_path / 'images')
+    # Imagem menor: tiles que deixam de existir precisam ser apagados
+    image = np.random.default_rng(1).integers(0, 256, (200, 200, 3), dtype=np.uint8)
+    cv2.imwrite(str(raw_dir / 'campo_a.png'), image)
+
+    summary = _tile_with_cache(raw_dir, tmp_path)
+    assert (summary['images'], summary['tiles'], summary['cached'], summary['removed']) == (1, 4, 1, 9)
+    unchanged = {name: mtime for name, mtime in mtimes.items() if name.startswith('campo_b_')}
+    assert {name: _mtimes(tmp_path / 'images')[name] for name in unchanged} == unchanged
+    _assert_matches_reference(raw_dir, tmp_path)
+
+def test_tile_cache_removing_image_deletes_only_its_tiles(raw_dir, tmp_path):
+    # Nome que começa com o de outra imagem: os tiles de campo_a_1 não podem ser confundidos com os de campo_a
+    cv2.imwrite(str(raw_dir / 'campo_a_1.png'), np.random.default_rng(1).integers(0, 256, (140, 140, 3), dtype=np.uint8))
+    _tile_with_cache(raw_dir, tmp_path)
+    mtimes = _mtimes(tmp_path / 'images')
+    (raw_dir / 'campo_a.png').unlink()
+
+    summary = _tile_with_cache(raw_dir, tmp_path)
+    assert (summary['images'], summary['tiles'], summary['cached'], summary['removed']) == (0, 0, 2, 9)
+    assert _mtimes(tmp_path / 'images') == {name: mtime for name, mtime in mtimes.items()
+                                            if name.startswith(('campo_a_1_', 'campo_b_'))}
+    _assert_matches_reference(raw_dir, tmp_path)
+
+def test_tile_cache_parameter_change_retiles_everything(raw_dir, tmp_path):
+    _tile_with_cache(raw_dir, tmp_path)
+    summary = _tile_with_cache(raw_dir, tmp_path, binarize_threshold=100)
+    assert (summary['images'], summary['cached'], summary['removed']) == (2, 0, 17)
+    _assert_matches_reference(raw_dir, tmp_path, binarize_threshold=100)
@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+import pytest
+import rasterio
+import geopandas as gpd
+from rasterio.transform import from_origin
+from src.predict import binary_to_georeferenced_shapefile
+
+PIXEL_SIZE = 0.5
+
+@pytest.fixture
+def mask_path(tmp_path):
+    """
+    Máscara sintética georreferenciada com manchas que cruzam as bordas das janelas,
+    incluindo ligações diagonais de um pixel e furos.
+    """
+    rng = np.random.default_rng(1)
+    mask = np.zeros((300, 340), dtype=np.uint8)
+    for _ in range(60):
+        center = (int(rng.integers(0, 340)), int(rng.integers(0, 300)))
+        axes = (int(rng.integers(3, 30)), int(rng.integers(3, 30)))
+        cv2.ellipse(mask, center, axes, float(rng.uniform(0, 180)), 0, 360, 255, -1)
+    for _ in range(15):
+        cv2.circle(mask, (int(rng.integers(0, 340)), int(rng.integers(0, 300))), int(rng.integers(2, 6)), 0, -1)
+    for i in range(20):
+        mask[100 + i, 60 + i] = 255  # Linha diagonal cruzando a borda das janelas em x = 64
+    path = tmp_path / 'mask.tif'
+    with rasterio.open(path, 'w', driver='GTiff', height=mask.shape[0], width=mask.shape[1], count=1, dtype='uint8',
+                       crs='EPSG:31983', transform=from_origin(500000.0, 7500000.0, PIXEL_SIZE, PIXEL_SIZE)) as dst:
+        dst.write(mask, 1)
+    return path
+
+def test_tiled_vectorization_matches_whole_mask(mask_path, tmp_path):
+    whole_path, tiled_path = tmp_path / 'whole.gpkg', tmp_path / 'tiled.gpkg'
+    binary_to_georeferenced_shapefile(str(mask_path), None, str(whole_path), window_size=4096)
+    binary_to_georeferenced_shapefile(str(mask_path), None, str(tiled_path), window_size=64)
+    whole, tiled = gpd.read_file(whole_path), gpd.read_file(tiled_path)
+
+    assert len(tiled) == len(whole)
+    assert tiled.area.min() >= PIXEL_SIZE ** 2 * 0.5  # Sem lascas da união
+    assert abs(tiled.area.sum() - whole.area.sum()) < 0.01 * whole.area.sum()
+
+def test_files_with_different_pixel_sizes(mask_path, tmp_path):
+    """
+    Cada arquivo é unido com o tamanho do próprio pixel, não o do último arquivo lido.
+    """
+    input_dir = tmp_path / 'masks'
+    input_dir.mkdir()
+    with rasterio.open(mask_path) as src:
+        mask, profile = src.read(1), src.profile
+    expected = 0
+    for name, pixel_size in (('a.tif', PIXEL_SIZE), ('b.tif', 5.0)):
+        profile.update(transform=from_origin(600000.0, 7400000.0, pixel_size, pixel_size))
+        with rasterio.open(input_dir / name, 'w', **profile) as dst:
+            dst.write(mask, 1)
+        expected += binary_to_georeferenced_shapefile(str(input_dir / name), None, str(tmp_path / 'whole.gpkg'),
+                                                      window_size=4096)['features']
+
+    result = binary_to_georeferenced_shapefile(str(input_dir), None, str(tmp_path / 'tiled.gpkg'), window_size=64)
+    assert result['features'] == expected
+    assert len(gpd.read_file(tmp_path / 'tiled.gpkg')) == expected